@@ -1,23 +1,24 @@
 from rest_framework import serializers
+from cyclesafe_backend.profiling import ProfiledSerializerMixin
 from .models import BlogSubmission, Like, Comment
 
 
 # ✅ Comment Serializer
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Comment
         fields = "__all__"
 
 
 # ✅ Like Serializer
-class LikeSerializer(serializers.ModelSerializer):
+class LikeSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Like
         fields = "__all__"
 
 
 # ✅ Full Blog Serializer (used in main blog listing & details)
-class BlogSubmissionSerializer(serializers.ModelSerializer):
+class BlogSubmissionSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     likes_count = serializers.IntegerField(source="likes.count", read_only=True)
     comments_count = serializers.IntegerField(source="comments.count", read_only=True)
     comments = CommentSerializer(many=True, read_only=True)
@@ -52,7 +53,7 @@ class BlogSubmissionSerializer(serializers.ModelSerializer):
 
 
 # ✅ NEW: Compact Blog Summary Serializer (for sidebar / homepage previews)
-class BlogSummarySerializer(serializers.ModelSerializer):
+class BlogSummarySerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     """
     This lightweight serializer is ideal for "Latest Blogs" sections,
     homepage cards, or lists — excludes heavy fields like 'content' and 'comments'.
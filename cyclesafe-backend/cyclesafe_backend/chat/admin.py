@@ -0,0 +1,22 @@
+from django.contrib import admin
+from .models import Lesson, SearchQueryCount, TopicSummary
+
+
+class LessonInline(admin.StackedInline):
+    model = Lesson
+    extra = 0
+
+
+@admin.register(TopicSummary)
+class TopicSummaryAdmin(admin.ModelAdmin):
+    list_display = ("query", "source", "hits", "updated_at")
+    list_filter = ("source",)
+    search_fields = ("query", "key", "summary")
+    inlines = [LessonInline]
+
+
+@admin.register(SearchQueryCount)
+class SearchQueryCountAdmin(admin.ModelAdmin):
+    list_display = ("query", "day", "count")
+    list_filter = ("day",)
+    search_fields = ("query",)
@@ -0,0 +1,108 @@
+# chat/analytics.py
+"""
+Search query counts, for finding the hot queries to keep warm.
+
+search_view adds one to a Redis hash per answered query (keyed like its
+cache entry, by the lowercased query); chat.tasks.flush_search_counts moves
+the hash into SearchQueryCount rows (one per query per day) every few
+minutes, and chat.tasks.prewarm_searches regenerates the top queries
+shortly before their cached answers go stale. While Redis is down counts
+are held in process (up to MAX_LOCAL_QUERIES) and pushed once it is back.
+"""
+import threading
+from collections import Counter
+from datetime import timedelta
+
+import redis
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from cyclesafe_backend import redis_client
+
+from .models import SearchQueryCount
+
+COUNTS_KEY = "search:counts"
+FLUSHING_KEY = "search:counts:flushing"
+MAX_LOCAL_QUERIES = 10_000
+
+_local = Counter()
+_lock = threading.Lock()
+
+
+def record(query):
+    """Count one search for `query`."""
+    query = query.lower()[:255]
+    client = redis_client.get_redis()
+    if client is not None:
+        with _lock:
+            pending = dict(_local)
+            _local.clear()
+        pending[query] = pending.get(query, 0) + 1
+        try:
+            pipe = client.pipeline(transaction=False)
+            for q, n in pending.items():
+                pipe.hincrby(COUNTS_KEY, q, n)
+            pipe.execute()
+            return
+        except redis.RedisError as e:
+            redis_client.mark_down(e)
+        with _lock:
+            _local.update(pending)
+        return
+
+    with _lock:
+        if query in _local or len(_local) < MAX_LOCAL_QUERIES:
+            _local[query] += 1
+
+
+def _save(counts, day):
+    """Add `counts` (query -> n) to the day's rows."""
+    with transaction.atomic():
+        rows = list(SearchQueryCount.objects.select_for_update().filter(day=day, query__in=list(counts)))
+        for row in rows:
+            row.count += counts[row.query]
+        SearchQueryCount.objects.bulk_update(rows, ["count"])
+        existing = {row.query for row in rows}
+        SearchQueryCount.objects.bulk_create(
+            [SearchQueryCount(day=day, query=q, count=n) for q, n in counts.items() if q not in existing]
+        )
+
+
+def flush():
+    """
+    Move the Redis counts into SearchQueryCount. The hash is renamed first,
+    so searches keep counting into a fresh one meanwhile; a batch left over
+    by a failed flush is saved on the next run. Returns how many searches.
+    """
+    client = redis_client.get_redis()
+    if client is None:
+        return 0
+    day = timezone.localdate()
+    total = 0
+    try:
+        if not client.exists(FLUSHING_KEY):
+            try:
+                client.rename(COUNTS_KEY, FLUSHING_KEY)
+            except redis.ResponseError:
+                return 0  # nothing searched since the last flush
+        counts = {q.decode(): int(n) for q, n in client.hgetall(FLUSHING_KEY).items()}
+        if counts:
+            _save(counts, day)
+            total = sum(counts.values())
+        client.delete(FLUSHING_KEY)
+    except redis.RedisError as e:
+        redis_client.mark_down(e)
+    return total
+
+
+def top(k, days=7):
+    """The `k` most searched queries of the last `days` days, most searched first."""
+    since = timezone.localdate() - timedelta(days=days - 1)
+    return list(
+        SearchQueryCount.objects.filter(day__gte=since)
+        .values("query")
+        .annotate(total=Sum("count"))
+        .order_by("-total", "query")
+        .values_list("query", flat=True)[:k]
+    )
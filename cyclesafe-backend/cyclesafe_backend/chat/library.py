@@ -0,0 +1,72 @@
+# chat/library.py
+"""
+The lesson library behind search_view.
+
+Answers are stored per topic (TopicSummary + Lessons) under the normalized
+query, so "Period pains?" and "pain during my period" read the same row
+through its unique index. search_view reads the library before calling the
+LLM and writes complete live answers back; `manage.py generate_lessons`
+fills it in advance for the most asked topics.
+"""
+from django.db import transaction
+from django.db.models import F
+
+from .models import Lesson, TopicSummary
+from .semantic import normalize
+
+# Topics generated in advance when nothing has been searched yet, most asked first
+SEED_TOPICS = [
+    "period pain", "menstrual cycle", "period hygiene", "pads", "tampons", "menstrual cup",
+    "cramps", "puberty", "heavy flow", "irregular periods", "first period", "pain relief",
+    "period care at school", "menstrual health", "reproductive health", "sanitation and washing",
+]
+
+CARD_FIELDS = ("title", "snippet", "source", "url")
+
+
+def lookup(query):
+    """The stored {"summary", "results"} answer for `query`, or None."""
+    key = normalize(query)
+    topic = TopicSummary.objects.prefetch_related("lessons").filter(key=key).first() if key else None
+    if topic is None:
+        return None
+    TopicSummary.objects.filter(pk=topic.pk).update(hits=F("hits") + 1)
+    return {
+        "summary": topic.summary,
+        "results": [
+            {**{f: getattr(lesson, f) for f in CARD_FIELDS}, "type": "educational", "published": None}
+            for lesson in topic.lessons.all()
+        ],
+    }
+
+
+@transaction.atomic
+def store(query, summary, results, source="live"):
+    """Save (or replace) the answer for `query`'s topic."""
+    key = normalize(query)
+    if not key:
+        return None
+    topic, _ = TopicSummary.objects.update_or_create(
+        key=key, defaults={"query": query[:255], "summary": summary, "source": source},
+    )
+    topic.lessons.all().delete()
+    Lesson.objects.bulk_create([
+        Lesson(topic=topic, position=i, **{f: card[f] for f in CARD_FIELDS})
+        for i, card in enumerate(results)
+    ])
+    return topic
+
+
+def top_topics(limit):
+    """Up to `limit` topics to generate: the most searched live ones, then seed topics."""
+    topics = list(
+        TopicSummary.objects.filter(source="live").order_by("-hits").values_list("query", flat=True)[:limit]
+    )
+    known = {normalize(q) for q in topics}
+    for topic in SEED_TOPICS:
+        if len(topics) >= limit:
+            break
+        if normalize(topic) not in known:
+            topics.append(topic)
+            known.add(normalize(topic))
+    return topics
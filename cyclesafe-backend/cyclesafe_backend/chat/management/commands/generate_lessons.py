@@ -0,0 +1,46 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from chat import library
+from chat.models import TopicSummary
+from chat.semantic import normalize
+from chat.views import SUMMARY_UNAVAILABLE, generate_cards, generate_summary
+
+
+class Command(BaseCommand):
+    help = "Generate the lesson library for the top search topics, so searches for them skip the LLM."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=len(library.SEED_TOPICS), help="Number of topics.")
+        parser.add_argument("--concurrency", type=int, default=4, help="Topics generated at once.")
+        parser.add_argument(
+            "--refresh", action="store_true",
+            help="Regenerate topics even if they are already in the library.",
+        )
+
+    def handle(self, *args, **options):
+        topics = library.top_topics(options["top"])
+        if not options["refresh"]:
+            stored = set(TopicSummary.objects.filter(key__in=[normalize(t) for t in topics]).values_list("key", flat=True))
+            topics = [t for t in topics if normalize(t) not in stored]
+
+        generated = failed = 0
+        for topic, summary, cards in asyncio.run(self._generate(topics, options["concurrency"])):
+            if summary == SUMMARY_UNAVAILABLE or not cards:
+                failed += 1
+                self.stderr.write(f"⚠️ Could not generate lessons for {topic!r}")
+                continue
+            library.store(topic, summary, cards, source="batch")
+            generated += 1
+        self.stdout.write(self.style.SUCCESS(f"✅ Generated {generated} topics ({failed} failed)."))
+
+    async def _generate(self, topics, concurrency):
+        limit = asyncio.Semaphore(max(concurrency, 1))
+
+        async def one(topic):
+            async with limit:
+                summary, cards = await asyncio.gather(generate_summary(topic), generate_cards(topic))
+                return topic, summary, cards
+
+        return await asyncio.gather(*(one(t) for t in topics))
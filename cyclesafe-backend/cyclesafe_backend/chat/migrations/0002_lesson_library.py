@@ -0,0 +1,52 @@
+# Generated by Django 5.2.6 on 2026-10-18 21:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TopicSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, unique=True)),
+                ('query', models.CharField(max_length=255)),
+                ('summary', models.TextField()),
+                ('source', models.CharField(choices=[('batch', 'Generated in advance'), ('live', 'Generated for a search')], default='live', max_length=10)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'topic summaries',
+            },
+        ),
+        migrations.CreateModel(
+            name='Lesson',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('snippet', models.TextField()),
+                ('source', models.CharField(max_length=100)),
+                ('url', models.URLField(max_length=500)),
+                ('topic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lessons', to='chat.topicsummary')),
+            ],
+            options={
+                'ordering': ['position'],
+            },
+        ),
+        migrations.DeleteModel(
+            name='ChatLog',
+        ),
+        migrations.AddConstraint(
+            model_name='lesson',
+            constraint=models.UniqueConstraint(fields=('topic', 'position'), name='unique_lesson_position'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-18 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0002_lesson_library'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchQueryCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(max_length=255)),
+                ('day', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='chat_search_day_56137a_idx')],
+                'constraints': [models.UniqueConstraint(fields=('query', 'day'), name='unique_query_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Topics are keyed by the normalized query, which used to drop before / after;
+# re-key the topics whose query has them so "pain before period" no longer
+# answers "period pain". normalize() is frozen here as of this migration.
+
+import logging
+import re
+
+from django.db import migrations
+
+logger = logging.getLogger(__name__)
+
+KEPT_WORDS = re.compile(r"\b(after|before)\b", re.IGNORECASE)
+
+STOPWORDS = frozenset("""
+a about am an and any are as at be can could do does during for from get give has have
+how i im in is it its me my of on or please should so tell than that the their them there
+these they this to what when where which while who why will with would versus vs you your
+""".split())
+
+_SUFFIXES = (("ies", "y"), ("sses", "ss"), ("ing", ""), ("edly", ""), ("ed", ""), ("ly", ""), ("es", "e"), ("s", ""))
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def stem(word):
+    if word.endswith(("ss", "us", "is")):
+        return word
+    for suffix, replacement in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)] + replacement
+    return word
+
+
+def normalize(query):
+    words = _WORD.findall(query.lower().replace("’", "'").replace("'", ""))
+    return " ".join(sorted({stem(w) for w in words if w not in STOPWORDS}))
+
+
+def rekey_topics(apps, schema_editor):
+    TopicSummary = apps.get_model("chat", "TopicSummary")
+    rekeyed = deleted = 0
+    for topic in TopicSummary.objects.filter(query__iregex=r"(after|before)"):
+        if not KEPT_WORDS.search(topic.query):
+            continue
+        key = normalize(topic.query)
+        if TopicSummary.objects.filter(key=key).exclude(pk=topic.pk).exists():
+            logger.info("Deleting topic %s (%r): %r already has an answer", topic.pk, topic.query, key)
+            topic.delete()  # the rephrased topic already has its own answer
+            deleted += 1
+        else:
+            TopicSummary.objects.filter(pk=topic.pk).update(key=key)
+            rekeyed += 1
+    logger.info("Re-keyed %d before/after topics, deleted %d duplicates", rekeyed, deleted)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_search_query_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(rekey_topics, migrations.RunPython.noop),
+    ]
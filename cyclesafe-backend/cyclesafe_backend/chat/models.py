@@ -0,0 +1,59 @@
+from django.db import models
+
+
+class TopicSummary(models.Model):
+    """
+    A stored search answer: the summary of one topic and its Lessons, looked
+    up by the normalized query (chat.semantic.normalize). Filled in advance by
+    `manage.py generate_lessons` and by search_view for topics it had to
+    generate live, so the LLM only sees topics nobody has asked about yet.
+    """
+    SOURCE_CHOICES = [
+        ('batch', 'Generated in advance'),
+        ('live', 'Generated for a search'),
+    ]
+
+    key = models.CharField(max_length=255, unique=True)  # normalized query
+    query = models.CharField(max_length=255)  # as first asked, used in lesson titles
+    summary = models.TextField()
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES, default='live')
+    hits = models.PositiveIntegerField(default=0)  # searches answered from the library
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "topic summaries"
+
+    def __str__(self):
+        return f"{self.query} ({self.source}, {self.hits} hits)"
+
+
+class Lesson(models.Model):
+    """One educational card of a TopicSummary, in display order."""
+    topic = models.ForeignKey(TopicSummary, on_delete=models.CASCADE, related_name="lessons")
+    position = models.PositiveSmallIntegerField()
+    title = models.CharField(max_length=255)
+    snippet = models.TextField()
+    source = models.CharField(max_length=100)
+    url = models.URLField(max_length=500)
+
+    class Meta:
+        ordering = ["position"]
+        constraints = [models.UniqueConstraint(fields=["topic", "position"], name="unique_lesson_position")]
+
+    def __str__(self):
+        return self.title
+
+
+class SearchQueryCount(models.Model):
+    """How many times a query was searched on one day, flushed from Redis by chat/analytics.py."""
+    query = models.CharField(max_length=255)  # lowercased, as in the search: cache key
+    day = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["query", "day"], name="unique_query_day")]
+        indexes = [models.Index(fields=["day"])]
+
+    def __str__(self):
+        return f"{self.query} ({self.day}: {self.count})"
@@ -0,0 +1,173 @@
+# chat/semantic.py
+"""
+Near-duplicate lookup for search_view.
+
+"period pain", "Pain during my period?" and "period pains" should share one
+cached answer. Queries are normalized (lowercase, punctuation and stopwords
+dropped, light suffix stemming, word order ignored; "pain before period"
+and "pain after period" stay apart) and turned into hashed
+word + character-trigram vectors, so no model has to be downloaded. A
+bounded in-process index of recently answered queries maps a new query to
+the cache key of the closest one when their cosine similarity reaches
+SEARCH_SEMANTIC_THRESHOLD. The answers themselves stay in the shared Django
+cache; the index only holds vectors and keys, evicted by TTL then LRU.
+"""
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from cyclesafe_backend import metrics
+
+DIM = 1024  # hashed feature space; 4 KB per indexed query
+TRIGRAM_WEIGHT = 0.5  # character trigrams catch typos and word forms the stemmer misses
+
+# Words that change the question (before / after, not / without) are kept
+STOPWORDS = frozenset("""
+a about am an and any are as at be can could do does during for from get give has have
+how i im in is it its me my of on or please should so tell than that the their them there
+these they this to what when where which while who why will with would versus vs you your
+""".split())
+
+_SUFFIXES = (("ies", "y"), ("sses", "ss"), ("ing", ""), ("edly", ""), ("ed", ""), ("ly", ""), ("es", "e"), ("s", ""))
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def stem(word: str) -> str:
+    """Strip one common English suffix, keeping at least three letters."""
+    if word.endswith(("ss", "us", "is")):
+        return word
+    for suffix, replacement in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)] + replacement
+    return word
+
+
+def normalize(query: str) -> str:
+    """Order-insensitive normal form of a query: sorted unique stems, stopwords dropped."""
+    words = _WORD.findall(query.lower().replace("’", "'").replace("'", ""))
+    return " ".join(sorted({stem(w) for w in words if w not in STOPWORDS}))
+
+
+def _add(vector, feature, weight):
+    h = zlib.crc32(feature.encode())
+    vector[h % DIM] += weight if h & 0x80000000 else -weight  # signed hashing keeps collisions unbiased
+
+
+def vectorize(normalized: str):
+    """Unit-length float32 vector of a normalized query."""
+    vector = np.zeros(DIM, dtype=np.float32)
+    for word in normalized.split():
+        _add(vector, "w:" + word, 1.0)
+        padded = f"#{word}#"
+        for i in range(len(padded) - 2):
+            _add(vector, "c:" + padded[i:i + 3], TRIGRAM_WEIGHT)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticIndex:
+    """
+    Fixed-size index of normalized queries -> cache keys. Vectors live in one
+    preallocated matrix, so a lookup is a single matrix-vector product.
+    """
+
+    def __init__(self, capacity, ttl, threshold):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._vectors = np.zeros((capacity, DIM), dtype=np.float32)
+        self._expires = np.zeros(capacity)  # 0 = free row
+        self._rows = [None] * capacity  # row -> normalized query
+        self._entries = OrderedDict()  # normalized query -> (row, cache key), least recently used first
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, query):
+        """Cache key of the closest live entry to `query`, or None below the threshold."""
+        normalized = normalize(query)
+        if not normalized or not self._entries:
+            return None
+        vector = vectorize(normalized)
+        with self._lock:
+            scores = self._vectors @ vector
+            scores[self._expires <= time.monotonic()] = -1.0
+            row = int(np.argmax(scores))
+            if scores[row] < self.threshold:
+                return None
+            self._entries.move_to_end(self._rows[row])
+            return self._entries[self._rows[row]][1]
+
+    def add(self, query, key):
+        """Index `query` as answered under cache key `key`."""
+        normalized = normalize(query)
+        if not normalized:
+            return
+        with self._lock:
+            if normalized in self._entries:
+                row = self._entries.pop(normalized)[0]
+            else:
+                row = self._free_row()
+            self._vectors[row] = vectorize(normalized)
+            self._expires[row] = time.monotonic() + self.ttl
+            self._rows[row] = normalized
+            self._entries[normalized] = (row, key)
+
+    def discard(self, key):
+        """Drop the entries pointing at `key` (its cached answer is gone)."""
+        with self._lock:
+            for normalized in [n for n, (_, k) in self._entries.items() if k == key]:
+                self._release(self._entries.pop(normalized)[0])
+
+    def _free_row(self):
+        row = int(np.argmin(self._expires))
+        if self._expires[row] > time.monotonic():
+            # No free or expired row: evict the least recently used entry
+            row = self._entries.popitem(last=False)[1][0]
+            metrics.incr("search.semantic.evictions")
+        elif self._rows[row] is not None:
+            self._entries.pop(self._rows[row], None)
+        self._release(row)
+        return row
+
+    def _release(self, row):
+        self._vectors[row] = 0
+        self._expires[row] = 0
+        self._rows[row] = None
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def index():
+    """The worker's SemanticIndex, built from settings on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SemanticIndex(
+                    settings.SEARCH_SEMANTIC_CACHE_SIZE, settings.SEARCH_CACHE_TTL, settings.SEARCH_SEMANTIC_THRESHOLD,
+                )
+    return _index
+
+
+def reset():
+    """Forget the index (used by tests and after settings change)."""
+    global _index
+    _index = None
+
+
+def stats():
+    """Index size and hit rate, merged into /api/metrics/."""
+    hits, misses = metrics.get("search.semantic.hits"), metrics.get("search.semantic.misses")
+    return {
+        "search.semantic.size": len(_index) if _index is not None else 0,
+        "search.semantic.hit_rate_pct": round(100 * hits / (hits + misses)) if hits + misses else 0,
+    }
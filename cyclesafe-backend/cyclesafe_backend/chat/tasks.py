@@ -0,0 +1,71 @@
+# chat/tasks.py
+"""
+Background refresh of stale search answers (see search_view), and keeping
+the most searched queries warm (chat/analytics.py).
+"""
+import asyncio
+import logging
+import time
+
+from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+
+from cyclesafe_backend import queues, singleflight
+
+from . import analytics, library
+from .views import failed_answer, generate_answer, store_answer
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, ignore_result=True)
+def refresh_search(self, query, cache_key, token):
+    """
+    Re-cache a stale search answer: from the lesson library when the topic is
+    stored there, otherwise regenerated by the LLM. `token` holds the refresh
+    lock taken by search_view; it is released here whatever happens.
+    """
+    try:
+        stored = library.lookup(query) if settings.SEARCH_LIBRARY else None
+        if stored:
+            store_answer(cache_key, {"query": query, "allowed": True, **stored}, to_library=False)
+            return f"✅ Refreshed {cache_key} from the lesson library"
+
+        response_data, complete = asyncio.run(generate_answer(query))
+        if not complete or failed_answer(response_data):
+            logger.warning("Refresh of %s got a partial or failed answer; keeping the stale one", cache_key)
+            return f"❌ Partial answer for {cache_key}"
+        store_answer(cache_key, response_data)
+        return f"✅ Refreshed {cache_key}"
+    finally:
+        singleflight.release(f"refresh:{cache_key}", token)
+
+
+@shared_task(bind=True, ignore_result=True)
+def flush_search_counts(self):
+    """Move the search counts buffered in Redis into SearchQueryCount rows."""
+    return f"✅ Flushed {analytics.flush()} searches."
+
+
+@shared_task(bind=True, ignore_result=True)
+def prewarm_searches(self):
+    """
+    Refresh the SEARCH_PREWARM_TOP most searched queries whose cached answer
+    is gone or goes stale within SEARCH_PREWARM_LEAD seconds, so users keep
+    getting warm answers and the regeneration runs here instead of on
+    someone's request. Shares the refresh lock with search_view.
+    """
+    queued = 0
+    for query in analytics.top(settings.SEARCH_PREWARM_TOP, settings.SEARCH_PREWARM_DAYS):
+        cache_key = f"search:{query}"
+        entry = cache.get(cache_key)
+        if entry is not None and entry.get("fresh_until", 0) - time.time() > settings.SEARCH_PREWARM_LEAD:
+            continue
+        token = singleflight.acquire(f"refresh:{cache_key}", settings.SEARCH_REFRESH_LOCK_TTL)
+        if token is None:
+            continue  # already being refreshed
+        refresh_search.apply_async((query, cache_key, token), **queues.options("bulk"))
+        queued += 1
+    logger.info("Queued %d search refreshes", queued)
+    return f"✅ Queued {queued} search refreshes."
@@ -1,3 +1,359 @@
-from django.test import TestCase
+import asyncio
+import time
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from chat import analytics, library, semantic
+from chat.models import SearchQueryCount, TopicSummary
+from chat.tasks import flush_search_counts, prewarm_searches, refresh_search
+from chat.views import SUMMARY_UNAVAILABLE
+from cyclesafe_backend import singleflight
+from cyclesafe_backend import metrics
+
+
+async def fake_acomplete(route, messages, **kwargs):
+    if route == "chat.summary":
+        await asyncio.sleep(0.3)
+        return "Periods are a normal part of growing up."
+    await asyncio.sleep(0.3)
+    return "Lesson one --- Lesson two"
+
+
+async def slow_cards(route, messages, **kwargs):
+    if route == "chat.cards":
+        await asyncio.sleep(5)
+    return "Periods are a normal part of growing up."
+
+
+@override_settings(SEARCH_DEADLINE=1)
+class SearchViewTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        semantic.reset()
+
+    def tearDown(self):
+        cache.clear()
+        semantic.reset()
+
+    @mock.patch("chat.views.llm.acomplete", side_effect=fake_acomplete)
+    async def test_calls_run_concurrently(self, _):
+        started = time.monotonic()
+        response = await self.async_client.get("/api/search/", {"q": "period pain"})
+        elapsed = time.monotonic() - started
+
+        data = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(elapsed, 0.55)  # ~0.3s, not 0.3s + 0.3s
+        self.assertEqual(len(data["results"]), 2)
+        self.assertNotIn("partial", data)
+        self.assertIsNotNone(await cache.aget("search:period pain"))
+
+    @mock.patch("chat.views.llm.acomplete", side_effect=slow_cards)
+    async def test_late_call_gives_partial_uncached_response(self, _):
+        response = await self.async_client.get("/api/search/", {"q": "period pain"})
+
+        data = response.json()
+        self.assertTrue(data["partial"])
+        self.assertEqual(data["summary"], "Periods are a normal part of growing up.")
+        self.assertEqual(data["results"], [])
+        self.assertIsNone(await cache.aget("search:period pain"))
+
+    async def test_off_topic_query_rejected(self):
+        response = await self.async_client.get("/api/search/", {"q": "football scores"})
+        self.assertEqual(response.status_code, 403)
+
+    @mock.patch("chat.views.llm.acomplete", side_effect=fake_acomplete)
+    async def test_rephrased_query_reuses_cached_answer(self, acomplete):
+        await self.async_client.get("/api/search/", {"q": "period pain"})
+        self.assertEqual(acomplete.call_count, 2)
+
+        for rephrased in ("Pain during my period?", "Period pains"):
+            data = (await self.async_client.get("/api/search/", {"q": rephrased})).json()
+            self.assertTrue(data["cached"])
+            self.assertEqual((data["query"], data["similar_to"]), (rephrased, "period pain"))
+        self.assertEqual(acomplete.call_count, 2)
+
+        await self.async_client.get("/api/search/", {"q": "period pain relief"})  # a different question
+        self.assertEqual(acomplete.call_count, 4)
+
+    @override_settings(SEARCH_LIBRARY=False)
+    @mock.patch("chat.views.llm.acomplete", side_effect=fake_acomplete)
+    async def test_expired_answer_is_dropped_from_index(self, acomplete):
+        await self.async_client.get("/api/search/", {"q": "period pain"})
+        await cache.adelete("search:period pain")
+
+        data = (await self.async_client.get("/api/search/", {"q": "Period pains"})).json()
+        self.assertNotIn("cached", data)
+        self.assertEqual(acomplete.call_count, 4)
+
+    @mock.patch("chat.views.llm.acomplete", side_effect=fake_acomplete)
+    async def test_new_topic_is_stored_and_then_served_from_library(self, acomplete):
+        await self.async_client.get("/api/search/", {"q": "Period pains?"})
+        topic = await TopicSummary.objects.prefetch_related("lessons").aget(key="pain period")
+        self.assertEqual((topic.source, topic.summary), ("live", "Periods are a normal part of growing up."))
+        self.assertEqual(len(topic.lessons.all()), 2)
+
+        await cache.aclear()
+        semantic.reset()
+        data = (await self.async_client.get("/api/search/", {"q": "pain during my period"})).json()
+        self.assertEqual(acomplete.call_count, 2)
+        self.assertEqual(data["summary"], topic.summary)
+        self.assertEqual([card["snippet"] for card in data["results"]], ["Lesson one", "Lesson two"])
+        self.assertEqual((await TopicSummary.objects.aget(pk=topic.pk)).hits, 1)
+        self.assertIsNotNone(await cache.aget("search:pain during my period"))
+
+    @mock.patch("chat.views.llm.acomplete", side_effect=fake_acomplete)
+    async def test_before_and_after_do_not_share_an_answer(self, acomplete):
+        for query in ("pain before period", "pain after period", "bleeding before period", "bleeding after period"):
+            data = (await self.async_client.get("/api/search/", {"q": query})).json()
+            self.assertNotIn("cached", data, query)
+        self.assertEqual(acomplete.call_count, 8)
+        self.assertEqual(await TopicSummary.objects.acount(), 4)
+
+    @mock.patch("chat.views.llm.acomplete", side_effect=slow_cards)
+    async def test_partial_answer_is_not_stored(self, _):
+        await self.async_client.get("/api/search/", {"q": "period pain"})
+        self.assertFalse(await TopicSummary.objects.aexists())
+
+
+@override_settings(SEARCH_DEADLINE=1, SEARCH_WAIT_POLL=0.05, REDIS_URL="")
+class SearchStampedeTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        semantic.reset()
+
+    def tearDown(self):
+        cache.clear()
+        semantic.reset()
+
+    @mock.patch("chat.views.llm.acomplete", side_effect=fake_acomplete)
+    async def test_concurrent_misses_generate_once(self, acomplete):
+        first, second = await asyncio.gather(
+            self.async_client.get("/api/search/", {"q": "period pain"}),
+            self.async_client.get("/api/search/", {"q": "period pain"}),
+        )
+        self.assertEqual(acomplete.call_count, 2)  # one summary + one cards call, not two of each
+        self.assertEqual(first.json()["summary"], second.json()["summary"])
+        self.assertEqual(sum(bool(r.json().get("cached")) for r in (first, second)), 1)
+
+    @mock.patch("chat.tasks.refresh_search.delay")
+    async def test_stale_answer_is_served_while_one_refresh_runs(self, delay):
+        answer = {"query": "period pain", "allowed": True, "summary": "Old summary", "results": []}
+        await cache.aset("search:period pain", {"answer": answer, "fresh_until": time.time() - 1})
+
+        for _ in range(3):
+            data = (await self.async_client.get("/api/search/", {"q": "period pain"})).json()
+            self.assertEqual((data["summary"], data["cached"], data["stale"]), ("Old summary", True, True))
+        delay.assert_called_once()
+        self.assertEqual(delay.call_args.args[:2], ("period pain", "search:period pain"))
+
+    @mock.patch("chat.tasks.refresh_search.delay")
+    @mock.patch("chat.views.llm.acomplete", side_effect=RuntimeError("LLM down"))
+    async def test_failed_answer_is_cached_briefly_and_retried(self, acomplete, delay):
+        with mock.patch.object(cache, "set", wraps=cache.set) as cache_set:
+            data = (await self.async_client.get("/api/search/", {"q": "heavy period"})).json()
+        self.assertEqual((data["summary"], data["results"]), (SUMMARY_UNAVAILABLE, []))
+        self.assertEqual(cache_set.call_args.args[2], settings.SEARCH_FAILED_TTL)
+        self.assertFalse(await TopicSummary.objects.aexists())
+
+        for _ in range(2):
+            data = (await self.async_client.get("/api/search/", {"q": "heavy period"})).json()
+            self.assertTrue(data["stale"])
+        self.assertEqual(acomplete.call_count, 2)  # the retry is the refresh task's, not each request's
+        delay.assert_called_once()
+
+    @override_settings(SEARCH_LIBRARY=False)
+    @mock.patch("chat.views.llm.acomplete", side_effect=fake_acomplete)
+    def test_refresh_task_recaches_and_releases_lock(self, _):
+        token = singleflight.acquire("refresh:search:period pain", ttl=60)
+        refresh_search.apply(args=("period pain", "search:period pain", token))
+
+        entry = cache.get("search:period pain")
+        self.assertEqual(entry["answer"]["summary"], "Periods are a normal part of growing up.")
+        self.assertGreater(entry["fresh_until"], time.time())
+        token = singleflight.acquire("refresh:search:period pain", ttl=60)
+        self.assertIsNotNone(token)
+        singleflight.release("refresh:search:period pain", token)
+
+
+@override_settings(SEARCH_DEADLINE=1)
+class GenerateLessonsCommandTest(TestCase):
+    @mock.patch("chat.views.llm.acomplete", side_effect=fake_acomplete)
+    def test_top_topics_are_generated_once(self, acomplete):
+        library.store("heavy flow", "Stored", [], source="live")
+        TopicSummary.objects.filter(key="flow heavy").update(hits=5)
+
+        call_command("generate_lessons", "--top", "3", stdout=StringIO())
+        self.assertEqual(acomplete.call_count, 4)  # heavy flow is already stored
+        self.assertEqual(
+            set(TopicSummary.objects.filter(source="batch").values_list("query", flat=True)),
+            {"period pain", "menstrual cycle"},
+        )
+
+        call_command("generate_lessons", "--top", "3", stdout=StringIO())
+        self.assertEqual(acomplete.call_count, 4)
+        call_command("generate_lessons", "--top", "1", "--refresh", stdout=StringIO())
+        self.assertEqual(TopicSummary.objects.get(key="flow heavy").source, "batch")
+
+
+class FakeRedis:
+    """The few hash commands chat.analytics uses."""
+
+    def __init__(self):
+        self.hashes = {}
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def execute(self):
+        return []
+
+    def hincrby(self, key, field, amount):
+        fields = self.hashes.setdefault(key, {})
+        fields[field.encode()] = fields.get(field.encode(), 0) + amount
+
+    def hgetall(self, key):
+        return {field: str(n).encode() for field, n in self.hashes.get(key, {}).items()}
+
+    def exists(self, key):
+        return int(key in self.hashes)
+
+    def rename(self, src, dst):
+        if src not in self.hashes:
+            raise redis.ResponseError("no such key")
+        self.hashes[dst] = self.hashes.pop(src)
+
+    def delete(self, key):
+        self.hashes.pop(key, None)
+
+
+@override_settings(REDIS_URL="", SEARCH_PREWARM_TOP=2, SEARCH_PREWARM_LEAD=900)
+class SearchAnalyticsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        analytics._local.clear()
+        self.redis = FakeRedis()
+
+    def tearDown(self):
+        cache.clear()
+
+    def _record(self, *queries, client=None):
+        with mock.patch("chat.analytics.redis_client.get_redis", return_value=client):
+            for query in queries:
+                analytics.record(query)
+
+    def _flush(self):
+        with mock.patch("chat.analytics.redis_client.get_redis", return_value=self.redis):
+            return flush_search_counts.apply().result
+
+    def test_counts_are_flushed_into_daily_rows(self):
+        self._record("Period pain", "period pain", "cramps", client=self.redis)
+        self.assertEqual(self._flush(), "✅ Flushed 3 searches.")
+        self._record("period pain", client=self.redis)
+        self._flush()
+        self.assertEqual(self._flush(), "✅ Flushed 0 searches.")
+
+        counts = dict(SearchQueryCount.objects.values_list("query", "count"))
+        self.assertEqual(counts, {"period pain": 3, "cramps": 1})
+        self.assertEqual(analytics.top(1), ["period pain"])
+
+    def test_counts_wait_in_process_while_redis_is_down(self):
+        self._record("cramps", "cramps")
+        self._record("cramps", client=self.redis)
+        self.assertEqual(self.redis.hashes[analytics.COUNTS_KEY], {b"cramps": 3})
+
+    @mock.patch("chat.views.llm.acomplete", side_effect=fake_acomplete)
+    async def test_only_allowed_searches_are_counted(self, _):
+        with mock.patch("chat.analytics.record") as record:
+            await self.async_client.get("/api/search/", {"q": "football scores"})
+            await self.async_client.get("/api/search/", {"q": "Period pain"})
+        record.assert_called_once_with("Period pain")
+
+    @mock.patch("chat.tasks.refresh_search.apply_async")
+    def test_top_queries_are_refreshed_before_going_stale(self, apply_async):
+        for query, count in (("period pain", 10), ("cramps", 5), ("pads", 1)):
+            SearchQueryCount.objects.create(query=query, day=timezone.localdate(), count=count)
+        cache.set("search:cramps", {"answer": {}, "fresh_until": time.time() + 3600})
+
+        prewarm_searches.apply()
+        (args,), kwargs = apply_async.call_args
+        self.assertEqual(args[:2], ("period pain", "search:period pain"))  # cramps is fresh, pads not top 2
+        self.assertEqual(kwargs["queue"], "bulk")
+
+        cache.set("search:cramps", {"answer": {}, "fresh_until": time.time() + 60})
+        prewarm_searches.apply()
+        self.assertEqual([c.args[0][0] for c in apply_async.call_args_list], ["period pain", "cramps"])
+        singleflight.release("refresh:search:period pain", args[2])
+
+
+@override_settings(SEARCH_SEMANTIC_CACHE_SIZE=2, SEARCH_SEMANTIC_THRESHOLD=0.88)
+class SemanticIndexTest(SimpleTestCase):
+    def setUp(self):
+        semantic.reset()
+        metrics.reset("search.")
+
+    def test_normalize_ignores_case_punctuation_order_and_stopwords(self):
+        self.assertEqual(semantic.normalize("What helps with PERIOD pains?!"), "help pain period")
+        self.assertEqual(semantic.normalize("pads or tampons"), semantic.normalize("Tampons vs pads"))
+        self.assertEqual(semantic.normalize("the of is"), "")
+
+    def test_timing_and_negation_change_the_question(self):
+        for a, b in (
+            ("pain before period", "pain after period"),
+            ("bleeding before my period", "bleeding after my period"),
+            ("cramps with pills", "cramps without pills"),
+        ):
+            self.assertNotEqual(semantic.normalize(a), semantic.normalize(b))
+            index = semantic.index()
+            index.add(a, "search:a")
+            self.assertIsNone(index.lookup(b), (a, b))
+            semantic.reset()
+
+    def test_during_and_while_do_not_change_the_question(self):
+        self.assertEqual(semantic.normalize("pain during my period"), semantic.normalize("period pain"))
+        index = semantic.index()
+        index.add("period pain", "search:pain")
+        self.assertEqual(index.lookup("pain during my period"), "search:pain")
+
+    def test_lookup_matches_near_duplicates_only(self):
+        index = semantic.index()
+        index.add("how to use a menstrual cup", "search:cup")
+        self.assertEqual(index.lookup("How do I use menstrual cups?"), "search:cup")
+        self.assertIsNone(index.lookup("menstrual cups"))
+        self.assertIsNone(index.lookup("period pain"))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        index = semantic.index()
+        index.add("period pain", "search:pain")
+        index.add("menstrual cup", "search:cup")
+        index.lookup("period pains")  # pain is now the most recently used
+        index.add("school hygiene", "search:school")
+
+        self.assertEqual(len(index), 2)
+        self.assertIsNone(index.lookup("menstrual cups"))
+        self.assertEqual(index.lookup("period pains"), "search:pain")
+        self.assertEqual(metrics.get("search.semantic.evictions"), 1)
+
+    def test_expired_entries_are_not_served_and_are_reused_first(self):
+        index = semantic.index()
+        with mock.patch("chat.semantic.time.monotonic", return_value=0):
+            index.add("period pain", "search:pain")
+            index.add("menstrual cup", "search:cup")
+        with mock.patch("chat.semantic.time.monotonic", return_value=index.ttl + 1):
+            self.assertIsNone(index.lookup("period pain"))
+            index.add("school hygiene", "search:school")
+        self.assertEqual(len(index), 2)
+        self.assertEqual(metrics.get("search.semantic.evictions"), 0)
+
+    def test_stats_report_hit_rate(self):
+        metrics.incr("search.semantic.hits", 3)
+        metrics.incr("search.semantic.misses")
+        semantic.index().add("period pain", "search:pain")
+        self.assertEqual(semantic.stats(), {"search.semantic.size": 1, "search.semantic.hit_rate_pct": 75})
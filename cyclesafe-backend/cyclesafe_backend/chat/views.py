@@ -1,14 +1,46 @@
+from asgiref.sync import sync_to_async
 from django.views.decorators.http import require_GET
 from django.http import JsonResponse
 from django.core.cache import cache
 from django.conf import settings
+import asyncio
 import logging
 import re
-from openai import OpenAI
+import time
+from cyclesafe_backend import llm, metrics, singleflight
+
+from . import analytics, library, semantic
 
 logger = logging.getLogger(__name__)
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+# ✅ Only allow menstrual or hygiene-related topics
+MENSTRUAL_KEYWORDS = [
+    "menstrual", "period", "hygiene", "puberty", "pads", "tampons", "cramps",
+    "menstruation", "menstrual cup", "flow", "sanitation", "school", "wash",
+    "cycle", "reproductive health", "menstrual hygiene", "menstrual health",
+    "period pain", "pain relief", "period care", "period hygiene"
+]
+
+# Attach trusted references for "Read More"
+TRUSTED_LINKS = [
+    {
+        "title": "WHO: Menstrual Health Overview",
+        "url": "https://www.who.int/health-topics/menstrual-health",
+        "source": "World Health Organization",
+    },
+    {
+        "title": "World Bank: Menstrual Hygiene in Schools",
+        "url": "https://data360.worldbank.org/en/indicator/WB_GS_SG_MHG_PPDP_ZS",
+        "source": "World Bank Data",
+    },
+    {
+        "title": "PubMed: Menstrual Health Studies",
+        "url": "https://pubmed.ncbi.nlm.nih.gov/?term=menstrual+health",
+        "source": "PubMed",
+    },
+]
+
+SUMMARY_UNAVAILABLE = "We couldn’t generate a summary right now. Please try again later."
 
 
 def clean_ai_text(text: str) -> str:
@@ -22,134 +54,272 @@ def clean_ai_text(text: str) -> str:
     return text
 
 
-@require_GET
-def search_view(request):
-    query = request.GET.get("q", "").strip()
-    if not query:
-        return JsonResponse({"error": "Missing query parameter 'q'."}, status=400)
-
-    # ✅ Only allow menstrual or hygiene-related topics
-    menstrual_keywords = [
-        "menstrual", "period", "hygiene", "puberty", "pads", "tampons", "cramps",
-        "menstruation", "menstrual cup", "flow", "sanitation", "school", "wash",
-        "cycle", "reproductive health", "menstrual hygiene", "menstrual health",
-        "period pain", "pain relief", "period care", "period hygiene"
+def summary_messages(query):
+    return [
+        {
+            "role": "system",
+            "content": (
+                "You are a friendly health educator writing for girls aged 10–16. "
+                "Write in a gentle, natural, and clear tone — like a nurse or teacher. "
+                "Avoid complex medical terms, markdown, or emojis."
+            ),
+        },
+        {
+            "role": "user",
+            "content": (
+                f"Explain clearly and kindly about '{query}'. "
+                "Keep it under 100 words and finish with a short encouraging message."
+            ),
+        },
     ]
 
-    if not any(word in query.lower() for word in menstrual_keywords):
-        return JsonResponse({
-            "query": query,
-            "allowed": False,
-            "message": "This search topic is outside menstrual health and hygiene education. "
-                       "Please ask about periods, menstrual care, puberty, or hygiene."
-        }, status=403)
 
-    cache_key = f"search:{query.lower()}"
-    cached = cache.get(cache_key)
-    if cached:
-        return JsonResponse({"query": query, **cached, "cached": True})
+def card_messages(query):
+    card_prompt = (
+        f"Create 3 to 4 short educational lessons (each 3–5 sentences) about '{query}'. "
+        f"Each lesson should focus on a single topic — meaning, hygiene, tips, or comfort. "
+        f"Write in plain English that 13-year-old girls can understand. "
+        f"Use a calm, caring tone. Return each card separated by '---'."
+    )
+    return [
+        {"role": "system", "content": "You are a menstrual health educator writing for teens."},
+        {"role": "user", "content": card_prompt},
+    ]
+
 
+def build_cards(query, card_text):
+    """Split the AI card text into lesson cards with trusted "Read More" links (deduplicated by URL)."""
     results = []
-    summary = ""
+    ai_cards = clean_ai_text(card_text).split("---")
+    for i, text in enumerate(ai_cards[:4]):
+        link = TRUSTED_LINKS[i % len(TRUSTED_LINKS)]
+        results.append({
+            "title": f"{query.capitalize()} – Lesson {i + 1}",
+            "snippet": text.strip(),
+            "source": link["source"],
+            "url": link["url"],
+            "type": "educational",
+            "published": None,
+        })
+
+    seen = set()
+    deduped = []
+    for item in results:
+        if item["url"] not in seen:
+            deduped.append(item)
+            seen.add(item["url"])
+    return deduped
 
+
+async def generate_summary(query, timeout=None):
     # 🧠 1) Generate a main AI summary (teacher tone)
     try:
-        completion = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are a friendly health educator writing for girls aged 10–16. "
-                        "Write in a gentle, natural, and clear tone — like a nurse or teacher. "
-                        "Avoid complex medical terms, markdown, or emojis."
-                    ),
-                },
-                {
-                    "role": "user",
-                    "content": (
-                        f"Explain clearly and kindly about '{query}'. "
-                        "Keep it under 100 words and finish with a short encouraging message."
-                    ),
-                },
-            ],
-            temperature=0.6,
-            max_tokens=220,
+        text = await llm.acomplete(
+            "chat.summary", summary_messages(query),
+            model="gpt-4o-mini", temperature=0.6, max_tokens=220, timeout=timeout,
         )
-        summary = clean_ai_text(completion.choices[0].message.content.strip())
+        return clean_ai_text(text)
     except Exception as e:
         logger.warning("AI summary generation failed: %s", e, exc_info=True)
-        summary = "We couldn’t generate a summary right now. Please try again later."
+        return SUMMARY_UNAVAILABLE
+
 
+async def generate_cards(query, timeout=None):
     # 🩸 2) Generate 3–4 short educational cards
     try:
-        card_prompt = (
-            f"Create 3 to 4 short educational lessons (each 3–5 sentences) about '{query}'. "
-            f"Each lesson should focus on a single topic — meaning, hygiene, tips, or comfort. "
-            f"Write in plain English that 13-year-old girls can understand. "
-            f"Use a calm, caring tone. Return each card separated by '---'."
+        text = await llm.acomplete(
+            "chat.cards", card_messages(query),
+            model="gpt-4o-mini", temperature=0.7, max_tokens=450, timeout=timeout,
         )
-
-        card_response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a menstrual health educator writing for teens."},
-                {"role": "user", "content": card_prompt},
-            ],
-            temperature=0.7,
-            max_tokens=450,
-        )
-
-        ai_cards = clean_ai_text(card_response.choices[0].message.content.strip()).split("---")
-
-        # Attach trusted references for "Read More"
-        trusted_links = [
-            {
-                "title": "WHO: Menstrual Health Overview",
-                "url": "https://www.who.int/health-topics/menstrual-health",
-                "source": "World Health Organization",
-            },
-            {
-                "title": "World Bank: Menstrual Hygiene in Schools",
-                "url": "https://data360.worldbank.org/en/indicator/WB_GS_SG_MHG_PPDP_ZS",
-                "source": "World Bank Data",
-            },
-            {
-                "title": "PubMed: Menstrual Health Studies",
-                "url": "https://pubmed.ncbi.nlm.nih.gov/?term=menstrual+health",
-                "source": "PubMed",
-            },
-        ]
-
-        for i, text in enumerate(ai_cards[:4]):
-            link = trusted_links[i % len(trusted_links)]
-            results.append({
-                "title": f"{query.capitalize()} – Lesson {i + 1}",
-                "snippet": text.strip(),
-                "source": link["source"],
-                "url": link["url"],
-                "type": "educational",
-                "published": None,
-            })
-
+        return build_cards(query, text)
     except Exception as e:
         logger.warning("AI card generation failed: %s", e)
-        results = []
+        return []
 
-    # 🧹 3) Deduplicate & cache
-    seen = set()
-    deduped = []
-    for item in results:
-        if item["url"] not in seen:
-            deduped.append(item)
-            seen.add(item["url"])
+
+async def generate_answer(query):
+    """
+    Generate the summary and the lesson cards concurrently. Returns the
+    response and whether it is complete (both parts made SEARCH_DEADLINE).
+    """
+    deadline = settings.SEARCH_DEADLINE
+    summary_task = asyncio.create_task(generate_summary(query, timeout=deadline))
+    cards_task = asyncio.create_task(generate_cards(query, timeout=deadline))
+    done, pending = await asyncio.wait({summary_task, cards_task}, timeout=deadline)
+    for task in pending:
+        task.cancel()
+
+    summary = summary_task.result() if summary_task in done else SUMMARY_UNAVAILABLE
+    results = cards_task.result() if cards_task in done else []
+    if pending:
+        logger.warning("Search for %r returned partial results after %ss", query, deadline)
 
     response_data = {
         "query": query,
         "allowed": True,
         "summary": summary,
-        "results": deduped,
+        "results": results,
     }
+    if pending:
+        response_data["partial"] = True
+    return response_data, not pending
+
 
-    cache.set(cache_key, response_data, 60 * 60)  # Cache for 1 hour
+def _entry(response_data):
+    """
+    Cache entry of an answer: fresh for SEARCH_CACHE_TTL seconds, then served
+    stale (while one refresh runs) until SEARCH_STALE_TTL more have passed.
+    """
+    return {"answer": response_data, "fresh_until": time.time() + settings.SEARCH_CACHE_TTL}
+
+
+def failed_answer(response_data):
+    """Whether the LLM failed on the summary or the lesson cards of an answer."""
+    return response_data["summary"] == SUMMARY_UNAVAILABLE or not response_data["results"]
+
+
+def store_answer(cache_key, response_data, to_library=True):
+    """
+    Cache a complete answer; generated answers with real content also go to
+    the lesson library. Failed answers are only kept for SEARCH_FAILED_TTL
+    seconds and are stale from the start, so the next request gets one
+    refresh (chat.tasks.refresh_search) to retry the LLM.
+    """
+    if failed_answer(response_data):
+        entry = {"answer": response_data, "fresh_until": time.time()}
+        cache.set(cache_key, entry, settings.SEARCH_FAILED_TTL)
+        metrics.incr("search.cache.failed")
+        return
+    cache.set(cache_key, _entry(response_data), settings.SEARCH_CACHE_TTL + settings.SEARCH_STALE_TTL)
+    if to_library and settings.SEARCH_LIBRARY:
+        library.store(response_data["query"], response_data["summary"], response_data["results"])
+
+
+async def _cached(cache_key):
+    """(answer, is stale) stored under `cache_key`, or (None, False)."""
+    entry = await cache.aget(cache_key)
+    if entry is None:
+        return None, False
+    if "fresh_until" not in entry:
+        return entry, True  # cached before entries had a soft TTL
+    return entry["answer"], time.time() >= entry["fresh_until"]
+
+
+async def _cache_answer(query, cache_key, response_data, to_library=True):
+    await sync_to_async(store_answer)(cache_key, response_data, to_library)
+    if settings.SEARCH_SEMANTIC_CACHE:
+        semantic.index().add(query, cache_key)
+
+
+async def _refresh_later(answer, cache_key):
+    """Queue one background regeneration of a stale answer; the lock keeps it to one."""
+    from .tasks import refresh_search
+
+    lock = f"refresh:{cache_key}"
+    token = await sync_to_async(singleflight.acquire, thread_sensitive=False)(lock, settings.SEARCH_REFRESH_LOCK_TTL)
+    if token is None:
+        return
+    try:
+        refresh_search.delay(answer["query"], cache_key, token)
+        metrics.incr("search.cache.refreshes")
+    except Exception as e:
+        logger.warning("Could not queue refresh of %s: %s", cache_key, e)
+        await sync_to_async(singleflight.release, thread_sensitive=False)(lock, token)
+
+
+async def _serve_cached(query, cache_key, answer, stale, **extra):
+    if stale:
+        metrics.incr("search.cache.stale")
+        await _refresh_later(answer, cache_key)
+    response_data = {**answer, "query": query, **extra, "cached": True}
+    if stale:
+        response_data["stale"] = True
+    return JsonResponse(response_data)
+
+
+async def _wait_for_answer(cache_key):
+    """Poll for the answer another request is generating, up to SEARCH_DEADLINE (plus slack)."""
+    deadline = time.monotonic() + settings.SEARCH_DEADLINE + 1
+    while time.monotonic() < deadline:
+        await asyncio.sleep(settings.SEARCH_WAIT_POLL)
+        answer, _ = await _cached(cache_key)
+        if answer is not None:
+            return answer
+    return None
+
+
+@require_GET
+async def search_view(request):
+    """
+    Async so the summary and the lesson cards are generated concurrently.
+    If one of them misses SEARCH_DEADLINE the other is returned on its own,
+    flagged "partial", and not cached. A near-duplicate of a cached query
+    gets that query's answer (chat/semantic.py), flagged "similar_to".
+    Topics in the lesson library (chat/library.py) are answered from the
+    database; the LLM only runs for new topics, whose answers are stored.
+    Only one request generates a given answer at a time (others wait for
+    it), and an answer past its soft TTL is served "stale" while a Celery
+    task refreshes it. Searches are counted so the hottest answers can be
+    refreshed ahead of time (chat/analytics.py).
+    """
+    query = request.GET.get("q", "").strip()
+    if not query:
+        return JsonResponse({"error": "Missing query parameter 'q'."}, status=400)
+
+    if not any(word in query.lower() for word in MENSTRUAL_KEYWORDS):
+        return JsonResponse({
+            "query": query,
+            "allowed": False,
+            "message": "This search topic is outside menstrual health and hygiene education. "
+                       "Please ask about periods, menstrual care, puberty, or hygiene."
+        }, status=403)
+
+    await sync_to_async(analytics.record, thread_sensitive=False)(query)
+
+    cache_key = f"search:{query.lower()}"
+    cached, stale = await _cached(cache_key)
+    if cached:
+        metrics.incr("search.cache.hits")
+        return await _serve_cached(query, cache_key, cached, stale)
+
+    # 🔁 Same question in other words?
+    if settings.SEARCH_SEMANTIC_CACHE:
+        similar_key = semantic.index().lookup(query)
+        cached, stale = await _cached(similar_key) if similar_key else (None, False)
+        if cached:
+            metrics.incr("search.semantic.hits")
+            return await _serve_cached(query, similar_key, cached, stale, similar_to=cached["query"])
+        if similar_key:
+            semantic.index().discard(similar_key)  # the answer expired first
+        metrics.incr("search.semantic.misses")
+
+    # 📚 Already in the lesson library?
+    if settings.SEARCH_LIBRARY:
+        stored = await sync_to_async(library.lookup)(query)
+        if stored:
+            metrics.incr("search.library.hits")
+            response_data = {"query": query, "allowed": True, **stored}
+            await _cache_answer(query, cache_key, response_data, to_library=False)
+            return JsonResponse(response_data)
+        metrics.incr("search.library.misses")
+
+    # 🧠 Generate it, unless another request already is
+    lock = cache_key
+    lock_ttl = settings.SEARCH_DEADLINE + 5
+    token = await sync_to_async(singleflight.acquire, thread_sensitive=False)(lock, lock_ttl)
+    if token is None:
+        metrics.incr("search.cache.waits")
+        answer = await _wait_for_answer(cache_key)
+        if answer is not None:
+            return JsonResponse({**answer, "query": query, "cached": True})
+        # The other request gave up or only got a partial answer: generate our own
+
+    try:
+        response_data, complete = await generate_answer(query)
+        # 🧹 3) Cache complete answers only
+        if complete:
+            await _cache_answer(query, cache_key, response_data)
+    finally:
+        if token is not None:
+            await sync_to_async(singleflight.release, thread_sensitive=False)(lock, token)
     return JsonResponse(response_data)
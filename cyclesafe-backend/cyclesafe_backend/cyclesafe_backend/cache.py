@@ -0,0 +1,329 @@
+# cyclesafe_backend/cache.py
+"""
+Two-tier Django cache backend: a small in-process LRU (L1) in front of Redis (L2).
+
+Configured as CACHES["default"], so every app keeps using django.core.cache.
+Reads try L1, then Redis, and keep what Redis returned in L1 for at most
+L1_TIMEOUT seconds. Every write is published on a Redis pub/sub channel; a
+listener thread in each process drops those keys from its L1, so workers
+and hosts stay coherent. L1 is only read while that listener is subscribed
+(it may have missed messages otherwise), or while Redis is down, when L1
+alone serves as a per-process cache like LocMemCache did.
+
+Hits and misses are counted per key prefix (the part before the first ":")
+in cyclesafe_backend.metrics, e.g. cache.search.l1_hits.
+"""
+import json
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import redis
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.redis import RedisCache
+
+from . import metrics, redis_client
+
+_MISSING = object()
+_CLEAR = "*"
+
+
+class LRU:
+    """Thread-safe bounded map of key -> (expiry, pickled value), least recently used first."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return _MISSING
+            expires, pickled = item
+            if expires is not None and expires <= time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+        return pickle.loads(pickled)
+
+    def set(self, key, value, timeout):
+        """Keep `value` for `timeout` seconds (None = until evicted)."""
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._data[key] = (None if timeout is None else time.monotonic() + timeout, pickled)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TieredCache(RedisCache):
+    """
+    RedisCache with an L1 LRU in front. Extra OPTIONS: L1_MAX_ENTRIES,
+    L1_TIMEOUT (seconds) and CHANNEL (pub/sub channel for invalidations).
+    """
+
+    def __init__(self, server, params):
+        params = {**params, "OPTIONS": dict(params.get("OPTIONS", {}))}
+        options = params["OPTIONS"]
+        self.l1_timeout = options.pop("L1_TIMEOUT", 30)
+        self.channel = options.pop("CHANNEL", "cache:invalidate")
+        super().__init__(server, params)
+        self.l1 = LRU(options.pop("L1_MAX_ENTRIES", 1000))
+        self._origin = uuid.uuid4().hex  # skip our own invalidations
+        self._listener_pid = None
+        self._subscribed = False
+        self._lock = threading.Lock()
+
+    # ---------- Redis (L2) ----------
+
+    def _l2(self, method, *args):
+        """Call the Redis client, or return _MISSING while Redis is down."""
+        if not redis_client.available():
+            return _MISSING
+        try:
+            result = getattr(self._cache, method)(*args)
+        except redis.RedisError as e:
+            redis_client.mark_down(e)
+            return _MISSING
+        self._ensure_listener()
+        return result
+
+    def _publish(self, keys):
+        """Tell the other processes to drop `keys` (or everything, for _CLEAR) from their L1."""
+        message = json.dumps({"origin": self._origin, "keys": keys})
+        try:
+            self._cache.get_client(None, write=True).publish(self.channel, message)
+        except redis.RedisError as e:
+            redis_client.mark_down(e)
+
+    def _ensure_listener(self):
+        if self._listener_pid == os.getpid():
+            return
+        with self._lock:
+            if self._listener_pid == os.getpid():
+                return
+            # A forked worker must not trust what its parent had in L1
+            self._listener_pid = os.getpid()
+            self._origin = uuid.uuid4().hex
+            self._subscribed = False
+            self.l1.clear()
+            threading.Thread(target=self._listen, name="cache-invalidation", daemon=True).start()
+
+    def _listen(self):
+        while True:
+            if not redis_client.available():
+                time.sleep(1)
+                continue
+            try:
+                pubsub = self._cache.get_client(None).pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                self.l1.clear()  # anything written while we weren't listening may be stale
+                self._subscribed = True
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message:
+                        self.invalidate(message["data"])
+            except redis.RedisError as e:
+                redis_client.mark_down(e)
+            finally:
+                self._subscribed = False
+
+    def invalidate(self, message):
+        """Apply an invalidation message from another process."""
+        try:
+            data = json.loads(message)
+        except (TypeError, ValueError):
+            return
+        if data.get("origin") == self._origin:
+            return
+        if data.get("keys") == _CLEAR:
+            self.l1.clear()
+            return
+        for key in data.get("keys", []):
+            self.l1.delete(key)
+
+    # ---------- L1 ----------
+
+    def _l1_readable(self):
+        return self._subscribed or not redis_client.available()
+
+    def _l1_timeout(self, timeout, l2_written):
+        if not l2_written:
+            return timeout  # L1 is the only copy while Redis is down
+        return self.l1_timeout if timeout is None else min(timeout, self.l1_timeout)
+
+    @staticmethod
+    def _count(key, outcome):
+        prefix = str(key).split(":", 1)[0] if ":" in str(key) else "other"
+        metrics.incr(f"cache.{prefix}.{outcome}")
+
+    # ---------- Django cache API ----------
+
+    def get(self, key, default=None, version=None):
+        made = self.make_and_validate_key(key, version=version)
+        if self._l1_readable():
+            value = self.l1.get(made)
+            if value is not _MISSING:
+                self._count(key, "l1_hits")
+                return value
+        value = self._l2("get", made, _MISSING)
+        if value is _MISSING:
+            self._count(key, "misses")
+            return default
+        self.l1.set(made, value, self.l1_timeout)
+        self._count(key, "l2_hits")
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        missing = {}
+        for key in keys:
+            made = self.make_and_validate_key(key, version=version)
+            value = self.l1.get(made) if self._l1_readable() else _MISSING
+            if value is _MISSING:
+                missing[made] = key
+            else:
+                found[key] = value
+                self._count(key, "l1_hits")
+        fetched = self._l2("get_many", list(missing)) if missing else {}
+        fetched = {} if fetched is _MISSING else fetched
+        for made, key in missing.items():
+            if made in fetched:
+                found[key] = fetched[made]
+                self.l1.set(made, fetched[made], self.l1_timeout)
+                self._count(key, "l2_hits")
+            else:
+                self._count(key, "misses")
+        return found
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version=version) is not _MISSING
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        made = self.make_and_validate_key(key, version=version)
+        timeout = self.get_backend_timeout(timeout)
+        written = self._l2("set", made, value, timeout) is not _MISSING
+        if written:
+            self._publish([made])
+        if timeout == 0:
+            self.l1.delete(made)
+        else:
+            self.l1.set(made, value, self._l1_timeout(timeout, written))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        made = self.make_and_validate_key(key, version=version)
+        timeout = self.get_backend_timeout(timeout)
+        added = self._l2("add", made, value, timeout)
+        if added is _MISSING:
+            if self.l1.get(made) is not _MISSING:
+                return False
+            added, written = True, False
+        else:
+            written = True
+        if added and timeout != 0:
+            self.l1.set(made, value, self._l1_timeout(timeout, written))
+            if written:
+                self._publish([made])
+        return bool(added)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        if not data:
+            return []
+        made = {self.make_and_validate_key(key, version=version): value for key, value in data.items()}
+        timeout = self.get_backend_timeout(timeout)
+        written = self._l2("set_many", made, timeout) is not _MISSING
+        if written:
+            self._publish(list(made))
+        for key, value in made.items():
+            self.l1.set(key, value, self._l1_timeout(timeout, written))
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        made = self.make_and_validate_key(key, version=version)
+        timeout = self.get_backend_timeout(timeout)
+        touched = self._l2("touch", made, timeout)
+        value = self.l1.get(made)
+        if touched is _MISSING:
+            if value is _MISSING:
+                return False
+            self.l1.set(made, value, timeout)
+            return True
+        if value is not _MISSING:
+            self.l1.set(made, value, self._l1_timeout(timeout, True))
+        return touched
+
+    def incr(self, key, delta=1, version=None):
+        made = self.make_and_validate_key(key, version=version)
+        value = self._l2("incr", made, delta)
+        if value is _MISSING:
+            current = self.l1.get(made)
+            if current is _MISSING:
+                raise ValueError("Key '%s' not found." % key)
+            value = current + delta
+            self.l1.set(made, value, None)
+            return value
+        self.l1.delete(made)
+        self._publish([made])
+        return value
+
+    def delete(self, key, version=None):
+        made = self.make_and_validate_key(key, version=version)
+        deleted = self._l2("delete", made)
+        in_l1 = self.l1.delete(made)
+        if deleted is _MISSING:
+            return in_l1
+        self._publish([made])
+        return bool(deleted)
+
+    def delete_many(self, keys, version=None):
+        if not keys:
+            return
+        made = [self.make_and_validate_key(key, version=version) for key in keys]
+        if self._l2("delete_many", made) is not _MISSING:
+            self._publish(made)
+        for key in made:
+            self.l1.delete(key)
+
+    def clear(self):
+        """
+        Drop this cache's keys only. RedisCache.clear() would FLUSHDB, which
+        also wipes the Celery queues sharing the database.
+        """
+        self.l1.clear()
+        if not redis_client.available():
+            return True
+        try:
+            client = self._cache.get_client(None, write=True)
+            batch = []
+            for key in client.scan_iter(match=f"{self.key_prefix}:*", count=1000):  # make_key() = prefix:version:key
+                batch.append(key)
+                if len(batch) >= 1000:
+                    client.delete(*batch)
+                    batch = []
+            if batch:
+                client.delete(*batch)
+        except redis.RedisError as e:
+            redis_client.mark_down(e)
+            return False
+        self._publish(_CLEAR)
+        return True
+
+    def stats(self):
+        """L1 size and whether it is kept coherent, for /api/metrics/."""
+        return {"cache.l1.size": len(self.l1), "cache.l1.subscribed": int(self._subscribed)}
@@ -1,8 +1,11 @@
 # cyclesafe_backend/celery.py
 import os
-from celery import Celery
+from celery import Celery, signals
 from celery.schedules import crontab
 from django.conf import settings
+from kombu import Queue
+
+from . import queues
 
 # ----------------------------------------------------
 # 🌸 Basic Celery Configuration
@@ -14,15 +17,83 @@ app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks()
 
 
+# ----------------------------------------------------
+# 📬 Queues, Routing & Priorities (see queues.py)
+# ----------------------------------------------------
+# Run one worker per queue so a Sunday tip broadcast never delays a
+# welcome message:  celery -A cyclesafe_backend worker -Q transactional
+app.conf.task_queues = [Queue(name, routing_key=name) for name in queues.QUEUES]
+app.conf.task_default_queue = "transactional"
+app.conf.broker_transport_options = {
+    "priority_steps": queues.PRIORITY_STEPS,
+    "sep": queues.PRIORITY_SEP,
+    "queue_order_strategy": "priority",  # drain queues in -Q order
+}
+
+app.conf.task_routes = {
+    # ✅ Someone is waiting on these
+    "tracker.tasks.send_welcome_message": queues.route("transactional"),
+    "tracker.tasks.deliver_sms": queues.route("transactional"),
+    "tracker.tasks.send_sms_reminder": queues.route("transactional"),
+    "tracker.tasks.generate_cycle_summary": queues.route("transactional"),
+    "tracker.tasks.schedule_cycle_reminders": queues.route("transactional"),
+
+    # ✅ Period / ovulation reminders
+    "tracker.tasks.dispatch_due_reminders": queues.route("reminders"),
+    "tracker.tasks.send_reminder_batch": queues.route("reminders"),
+    "tracker.tasks.check_and_send_daily_reminders": queues.route("reminders"),
+
+    # ✅ Broadcasts and batch jobs (daily reminder chunks go to "reminders" at dispatch)
+    "tracker.tasks.send_weekly_health_tip": queues.route("bulk"),
+    "tracker.tasks.send_fanout_chunk": queues.route("bulk"),
+    "tracker.tasks.rebuild_cycle_predictions": queues.route("bulk"),
+    "tracker.tasks.purge_delivery_log": queues.route("bulk"),
+    "tracker.tasks.refresh_reminder_slots": queues.route("bulk"),
+    "chat.tasks.refresh_search": queues.route("bulk"),
+    "chat.tasks.flush_search_counts": queues.route("bulk"),
+    "chat.tasks.prewarm_searches": queues.route("bulk"),
+}
+
+
+@signals.celeryd_init.connect
+def configure_queue_worker(conf=None, options=None, **kwargs):
+    """A worker started for a single queue takes that queue's concurrency and prefetch."""
+    names = (options or {}).get("queues") or []
+    if isinstance(names, str):
+        names = names.split(",")
+    if len(names) != 1:
+        return
+    concurrency, prefetch = queues.worker_options(names[0])
+    if concurrency and not options.get("concurrency"):
+        conf.worker_concurrency = concurrency
+    if prefetch and not options.get("prefetch_multiplier"):
+        conf.worker_prefetch_multiplier = prefetch
+
+
+@signals.before_task_publish.connect
+def stamp_enqueue_time(headers=None, **kwargs):
+    if headers is not None:
+        queues.stamp(headers)
+
+
+@signals.task_prerun.connect
+def record_queue_wait(task=None, **kwargs):
+    request = task.request
+    if request.is_eager:
+        return
+    queue = (request.delivery_info or {}).get("routing_key")
+    queues.record_wait(queue, getattr(request, queues.ENQUEUED_HEADER, None))
+
+
 # ----------------------------------------------------
 # 🕒 Celery Beat — Scheduled (Periodic) Tasks
 # ----------------------------------------------------
 # These run automatically based on a schedule
 app.conf.beat_schedule = {
-    # ✅ 1. Check daily reminders at 8 AM
+    # ✅ 1. Daily reminders, one time slice at a time (each user's slot in their own window)
     "check-daily-cycle-reminders": {
         "task": "tracker.tasks.check_and_send_daily_reminders",
-        "schedule": crontab(hour=8, minute=0),  # every day at 8:00 AM
+        "schedule": crontab(minute=f"*/{settings.REMINDER_SLICE_MINUTES}"),
     },
 
     # ✅ 2. (Optional) Weekly health tips every Sunday at 9 AM
@@ -30,6 +101,42 @@ app.conf.beat_schedule = {
         "task": "tracker.tasks.send_weekly_health_tip",
         "schedule": crontab(hour=9, minute=0, day_of_week="sun"),
     },
+
+    # ✅ 3. Send ScheduledReminders that are due (every minute)
+    "dispatch-due-reminders": {
+        "task": "tracker.tasks.dispatch_due_reminders",
+        "schedule": 60.0,
+    },
+
+    # ✅ 4. Rebuild every user's cycle predictions nightly at 2 AM
+    "rebuild-cycle-predictions": {
+        "task": "tracker.tasks.rebuild_cycle_predictions",
+        "schedule": crontab(hour=2, minute=0),
+    },
+
+    # ✅ 5. Purge delivery log rows past their retention at 3 AM
+    "purge-delivery-log": {
+        "task": "tracker.tasks.purge_delivery_log",
+        "schedule": crontab(hour=3, minute=0),
+    },
+
+    # ✅ 6. Move buffered search counts into the database
+    "flush-search-counts": {
+        "task": "chat.tasks.flush_search_counts",
+        "schedule": float(settings.SEARCH_COUNT_FLUSH_SECONDS),
+    },
+
+    # ✅ 7. Regenerate the most searched answers before they go stale
+    "prewarm-searches": {
+        "task": "chat.tasks.prewarm_searches",
+        "schedule": crontab(minute=f"*/{settings.SEARCH_PREWARM_MINUTES}"),
+    },
+
+    # ✅ 8. Keep reminder slots in their local window across DST changes, nightly at 1 AM
+    "refresh-reminder-slots": {
+        "task": "tracker.tasks.refresh_reminder_slots",
+        "schedule": crontab(hour=1, minute=0),
+    },
 }
 
 
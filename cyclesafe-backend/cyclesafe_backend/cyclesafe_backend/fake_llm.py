@@ -0,0 +1,85 @@
+# cyclesafe_backend/fake_llm.py
+"""
+Deterministic stand-in for OpenAI, selected with LLM_BACKEND = "fake".
+
+Answers depend only on the route and the prompt, so benchmarks and tests
+are repeatable. Each call sleeps FAKE_LLM_LATENCY_MS plus up to
+FAKE_LLM_JITTER_MS (drawn from a generator seeded with FAKE_LLM_SEED) to
+mimic upstream latency.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+SUMMARY_TEMPLATE = (
+    "Hey [NAME], here’s your personalized cycle summary. "
+    "Your period ran from [PERIOD_START] to [PERIOD_END], a time to rest and stay hydrated. "
+    "During the follicular phase, [FOLLICULAR_START] to [FOLLICULAR_END], energy and mood usually rise. "
+    "Ovulation is expected around [OVULATION], and your fertile window is [FERTILE_WINDOW]. "
+    "In the luteal phase, [LUTEAL_START] to [LUTEAL_END], you may feel more tired before your next "
+    "period around [NEXT_PERIOD]."
+)
+
+_rng = None
+_rng_lock = threading.Lock()
+
+
+def _delay():
+    global _rng
+    with _rng_lock:
+        if _rng is None:
+            _rng = random.Random(getattr(settings, "FAKE_LLM_SEED", 0))
+        jitter = _rng.uniform(0, getattr(settings, "FAKE_LLM_JITTER_MS", 0))
+    return (getattr(settings, "FAKE_LLM_LATENCY_MS", 0) + jitter) / 1000
+
+
+def _digest(messages):
+    text = "\n".join(m.get("content", "") for m in messages)
+    return int(hashlib.sha256(text.encode()).hexdigest()[:8], 16)
+
+
+def respond(route, messages, params):
+    """The fake completion text for `route`."""
+    prompt = "\n".join(m.get("content", "") for m in messages)
+    digest = _digest(messages)
+
+    if route == "tracker.extract":
+        start = timezone.localdate() - timedelta(days=5 + digest % 20)
+        return json.dumps({
+            "start_date": start.isoformat(),
+            "end_date": (start + timedelta(days=4)).isoformat(),
+            "cycle_length": None,
+        })
+    if route == "tracker.summary":
+        if "placeholders" in prompt:
+            return SUMMARY_TEMPLATE
+        return "Hey there, here’s your personalized cycle summary. Your cycle looks healthy and regular."
+    if route == "chat.cards":
+        return (
+            "Periods are a normal part of growing up. --- "
+            "Change pads every 4 to 6 hours and wash your hands. --- "
+            "Warm water bottles and gentle walks can ease cramps."
+        )
+    if route == "chat.summary":
+        return (
+            "A period is a normal monthly bleed as the body gets ready for a possible pregnancy. "
+            "Keeping clean and resting helps. You are doing great by learning about it!"
+        )
+    return f"Fake response #{digest % 1000}"
+
+
+def complete(route, messages, params):
+    time.sleep(_delay())
+    return respond(route, messages, params)
+
+
+async def acomplete(route, messages, params):
+    await asyncio.sleep(_delay())
+    return respond(route, messages, params)
@@ -0,0 +1,329 @@
+# cyclesafe_backend/llm.py
+"""
+Shared gateway for every OpenAI call in the backend.
+
+- one pooled HTTP client per process for sync calls (keep-alive connections
+  are reused); async calls open and close a client per call
+- a deadline per call, covering queueing, retries and backoff
+- retries with full jitter on timeouts, connection errors, 429s and 5xx
+- a global and a per-route concurrency limit per process, shared by sync
+  and async calls
+- a per-route circuit breaker that fails fast while the upstream is down
+- latency / error counters in cyclesafe_backend.metrics under "llm.<route>."
+  (call time also shows up as "llm" in the request's Server-Timing header)
+- LLM_BACKEND = "fake" swaps OpenAI for cyclesafe_backend.fake_llm (offline
+  tests and benchmarks); everything above still applies
+
+Callers pass a `fallback` (a value or a zero-argument callable) to get a
+cached or degraded answer instead of LLMUnavailable when the call can't be
+served.
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+
+import httpx
+import openai
+from django.conf import settings
+
+from . import fake_llm, metrics, profiling
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+RETRYABLE_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+class LLMUnavailable(Exception):
+    """The call was rejected, timed out, or the circuit for the route is open."""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# ---------- Pooled client ----------
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Process-wide OpenAI client backed by a pooled httpx client."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                pool = _setting("LLM_MAX_CONCURRENCY", 16)
+                _client = openai.OpenAI(
+                    api_key=settings.OPENAI_API_KEY,
+                    max_retries=0,  # retries are handled here, inside the deadline
+                    http_client=httpx.Client(
+                        limits=httpx.Limits(max_connections=pool, max_keepalive_connections=pool),
+                    ),
+                )
+    return _client
+
+
+def _call(model, messages, timeout, params):
+    response = get_client().with_options(timeout=timeout).chat.completions.create(
+        model=model, messages=messages, **params
+    )
+    return response.choices[0].message.content.strip()
+
+
+def _fake():
+    return _setting("LLM_BACKEND", "openai") == "fake"
+
+
+# ---------- Concurrency limits ----------
+
+_global_slots = None
+_route_slots = {}
+_slots_lock = threading.Lock()
+
+
+def _slots(route):
+    global _global_slots
+    with _slots_lock:
+        if _global_slots is None:
+            _global_slots = threading.BoundedSemaphore(_setting("LLM_MAX_CONCURRENCY", 16))
+        if route not in _route_slots:
+            limit = _setting("LLM_ROUTE_CONCURRENCY", {}).get(route, _setting("LLM_DEFAULT_ROUTE_CONCURRENCY", 8))
+            _route_slots[route] = threading.BoundedSemaphore(limit)
+        return _global_slots, _route_slots[route]
+
+
+# ---------- Circuit breaker ----------
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and rejects calls for
+    `cooldown` seconds; then lets a single trial call through (half-open).
+    """
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.cooldown or self.trial_running:
+                return False
+            self.trial_running = True
+            return True
+
+    def cancel_trial(self):
+        with self._lock:
+            self.trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        """Returns True if this failure opened the circuit."""
+        with self._lock:
+            self.failures += 1
+            was_open = self.opened_at is not None
+            if self.trial_running or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+            return not was_open and self.opened_at is not None
+
+
+_breakers = {}
+
+
+def breaker(route):
+    with _slots_lock:
+        if route not in _breakers:
+            _breakers[route] = CircuitBreaker(
+                _setting("LLM_BREAKER_THRESHOLD", 5), _setting("LLM_BREAKER_COOLDOWN", 30),
+            )
+        return _breakers[route]
+
+
+# ---------- Public API ----------
+
+def _observe(route, started):
+    elapsed = time.monotonic() - started
+    metrics.observe(f"llm.{route}.latency", elapsed)
+    profiling.record("llm", elapsed)
+
+
+def _backoff(attempt):
+    base = _setting("LLM_RETRY_BASE_DELAY", 0.5)
+    cap = _setting("LLM_RETRY_MAX_DELAY", 4)
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def _unavailable(route, reason, fallback):
+    metrics.incr(f"llm.{route}.{reason}")
+    if fallback is _MISSING:
+        raise LLMUnavailable(f"LLM route '{route}' unavailable ({reason})")
+    metrics.incr(f"llm.{route}.fallbacks")
+    return fallback() if callable(fallback) else fallback
+
+
+def _retry_delay(route, circuit, attempt, deadline, error):
+    """
+    Seconds to wait before retrying after a transient error, or None once the
+    attempts or the deadline are used up (the failure is then recorded).
+    """
+    delay = _backoff(attempt)
+    if attempt + 1 > _setting("LLM_MAX_RETRIES", 2) or time.monotonic() + delay >= deadline:
+        logger.warning("LLM route %s failed after %d attempt(s): %s", route, attempt + 1, error)
+        if circuit.record_failure():
+            metrics.incr(f"llm.{route}.breaker_opened")
+            logger.error("LLM circuit opened for route %s", route)
+        return None
+    metrics.incr(f"llm.{route}.retries")
+    return delay
+
+
+def complete(route, messages, *, model, timeout=None, fallback=_MISSING, **params):
+    """
+    Run a chat completion for `route` (e.g. "tracker.summary") and return the
+    stripped message text. Extra keyword arguments go to the OpenAI API.
+    """
+    deadline = time.monotonic() + (timeout or _setting("LLM_TIMEOUT", 30))
+    circuit = breaker(route)
+    if not circuit.allow():
+        return _unavailable(route, "short_circuited", fallback)
+
+    global_slots, route_slots = _slots(route)
+    if not global_slots.acquire(timeout=max(0, deadline - time.monotonic())):
+        circuit.cancel_trial()
+        return _unavailable(route, "rejected", fallback)
+    if not route_slots.acquire(timeout=max(0, deadline - time.monotonic())):
+        global_slots.release()
+        circuit.cancel_trial()
+        return _unavailable(route, "rejected", fallback)
+
+    try:
+        attempt = 0
+        while True:
+            metrics.incr(f"llm.{route}.calls")
+            started = time.monotonic()
+            try:
+                if _fake():
+                    text = fake_llm.complete(route, messages, params)
+                else:
+                    text = _call(model, messages, max(0.1, deadline - started), params)
+            except RETRYABLE_ERRORS as e:
+                _observe(route, started)
+                metrics.incr(f"llm.{route}.errors")
+                delay = _retry_delay(route, circuit, attempt, deadline, e)
+                if delay is None:
+                    return _unavailable(route, "failed", fallback)
+                attempt += 1
+                time.sleep(delay)
+                continue
+            except openai.OpenAIError:
+                # Bad request, auth, etc.: the upstream answered, so don't retry
+                # and don't count it against the circuit.
+                _observe(route, started)
+                metrics.incr(f"llm.{route}.errors")
+                circuit.record_success()
+                raise
+
+            _observe(route, started)
+            circuit.record_success()
+            return text
+    finally:
+        route_slots.release()
+        global_slots.release()
+
+
+# ---------- Async API ----------
+# Under WSGI every async view (and every asyncio.run) gets its own event
+# loop, so nothing loop-bound can be kept between calls: each call opens
+# and closes its own client, and waits for the same process-wide slots as
+# the sync API without blocking its loop. Circuit breakers and counters are
+# shared too.
+
+SLOT_POLL_INTERVAL = 0.005  # seconds between tries for a free slot
+
+
+async def _acall(model, messages, timeout, params):
+    async with openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY, max_retries=0, timeout=timeout) as client:
+        response = await client.chat.completions.create(model=model, messages=messages, **params)
+    return response.choices[0].message.content.strip()
+
+
+async def _acquire(semaphore, deadline):
+    while not semaphore.acquire(blocking=False):
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(SLOT_POLL_INTERVAL)
+    return True
+
+
+async def acomplete(route, messages, *, model, timeout=None, fallback=_MISSING, **params):
+    """Async twin of complete(), for async views."""
+    deadline = time.monotonic() + (timeout or _setting("LLM_TIMEOUT", 30))
+    circuit = breaker(route)
+    if not circuit.allow():
+        return _unavailable(route, "short_circuited", fallback)
+
+    global_slots, route_slots = _slots(route)
+    if not await _acquire(global_slots, deadline):
+        circuit.cancel_trial()
+        return _unavailable(route, "rejected", fallback)
+    if not await _acquire(route_slots, deadline):
+        global_slots.release()
+        circuit.cancel_trial()
+        return _unavailable(route, "rejected", fallback)
+
+    try:
+        attempt = 0
+        while True:
+            metrics.incr(f"llm.{route}.calls")
+            started = time.monotonic()
+            try:
+                if _fake():
+                    text = await fake_llm.acomplete(route, messages, params)
+                else:
+                    text = await _acall(model, messages, max(0.1, deadline - started), params)
+            except RETRYABLE_ERRORS as e:
+                _observe(route, started)
+                metrics.incr(f"llm.{route}.errors")
+                delay = _retry_delay(route, circuit, attempt, deadline, e)
+                if delay is None:
+                    return _unavailable(route, "failed", fallback)
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            except openai.OpenAIError:
+                _observe(route, started)
+                metrics.incr(f"llm.{route}.errors")
+                circuit.record_success()
+                raise
+            except asyncio.CancelledError:
+                # The caller's deadline passed; let a half-open trial go again.
+                circuit.cancel_trial()
+                raise
+
+            _observe(route, started)
+            circuit.record_success()
+            return text
+    finally:
+        route_slots.release()
+        global_slots.release()
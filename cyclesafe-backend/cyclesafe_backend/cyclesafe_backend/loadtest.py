@@ -0,0 +1,270 @@
+# cyclesafe_backend/loadtest.py
+"""
+Offline load tests for the main endpoints and Celery tasks.
+
+Runs against a throwaway test database with LLM_BACKEND = "fake",
+SMS_BACKEND = "memory" and Celery in eager mode, so nothing leaves the
+machine. Each scenario is driven by `concurrency` threads (one Django test
+client and DB connection each) and reports p50/p95/p99 latency, throughput
+and DB queries per operation. Used by `manage.py loadtest`.
+"""
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import metrics
+
+SEARCH_TOPICS = [
+    "period pain", "menstrual cup", "pads at school", "cramps relief", "puberty changes",
+    "period hygiene", "irregular cycle", "menstrual health", "tampons", "wash during period",
+]
+FREE_TEXT_MESSAGES = [
+    "my period started about a week ago and lasted five days",
+    "bleeding began last monday, stopped on friday",
+]
+
+
+# ---------- Fixtures ----------
+
+def use_test_database():
+    """Create a fresh test database and return the name to restore afterwards."""
+    if connection.vendor == "sqlite":
+        # A file DB shared by the worker threads; writers queue for the lock
+        # instead of failing with "database is locked". Use Postgres for
+        # numbers that matter.
+        if not connection.settings_dict["TEST"].get("NAME"):
+            connection.settings_dict["TEST"]["NAME"] = os.path.join(tempfile.gettempdir(), "cyclesafe_loadtest.sqlite3")
+        connection.settings_dict["OPTIONS"].setdefault("timeout", 30)
+        connection.settings_dict["OPTIONS"].setdefault("transaction_mode", "IMMEDIATE")
+    return connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+
+def drop_test_database(old_name):
+    connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def seed_users(count, history=3):
+    """`count` SMS-enabled users, each with `history` past cycles."""
+    from tracker.batch import materialize_predictions
+    from tracker.models import CycleRecord
+    from tracker.stats import rebuild_all_stats
+    from users.models import UserProfile
+
+    User.objects.bulk_create([User(username=f"loadtest{i}", first_name=f"User{i}") for i in range(count)])
+    users = list(User.objects.filter(username__startswith="loadtest").order_by("id"))
+    profiles = [UserProfile(user=u, phone_number=f"+2547{u.id:08d}", allow_sms=True) for u in users]
+    for profile in profiles:
+        profile.assign_reminder_slot()  # bulk_create skips save()
+    UserProfile.objects.bulk_create(profiles)
+    today = timezone.localdate()
+    CycleRecord.objects.bulk_create([
+        CycleRecord(
+            user=u,
+            start_date=today - timedelta(days=28 * (k + 1) + u.id % 5),
+            end_date=today - timedelta(days=28 * (k + 1) + u.id % 5 - 4),
+            cycle_length=26 + (u.id + k) % 6,
+        )
+        for u in users for k in range(history)
+    ])
+    # bulk_create skips the post_save signals
+    rebuild_all_stats()
+    materialize_predictions()
+    return users
+
+
+def _auth_header(user):
+    return {"HTTP_AUTHORIZATION": f"Bearer {AccessToken.for_user(user)}"}
+
+
+# ---------- Runner ----------
+
+def run(name, operation, requests, concurrency):
+    """
+    Call `operation(i)` for i in range(requests) from `concurrency` threads.
+    An operation returns True on success. Returns a result dict (see summarize).
+    """
+    indexes = iter(range(requests))
+    index_lock = threading.Lock()
+    samples = []
+    samples_lock = threading.Lock()
+
+    def worker():
+        try:
+            while True:
+                with index_lock:
+                    i = next(indexes, None)
+                if i is None:
+                    return
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    try:
+                        ok = bool(operation(i))
+                    except Exception:
+                        ok = False
+                    elapsed = time.perf_counter() - started
+                with samples_lock:
+                    samples.append((elapsed, len(queries), ok))
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, name=f"loadtest-{name}-{n}") for n in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return summarize(name, samples, time.perf_counter() - started, concurrency)
+
+
+def summarize(name, samples, wall_seconds, concurrency):
+    latencies = np.array([s[0] for s in samples]) * 1000
+    queries = np.array([s[1] for s in samples])
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(samples) else (0, 0, 0)
+    return {
+        "scenario": name,
+        "requests": len(samples),
+        "concurrency": concurrency,
+        "errors": sum(1 for s in samples if not s[2]),
+        "throughput": len(samples) / wall_seconds if wall_seconds else 0.0,
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "queries_mean": float(queries.mean()) if len(samples) else 0.0,
+        "queries_max": int(queries.max()) if len(samples) else 0,
+    }
+
+
+# ---------- Scenarios ----------
+# Each builder takes the seeded users and returns operation(i).
+
+def predict_scenario(users):
+    """POST /api/tracker/chat/ (sync summary); every 4th message needs the AI extractor."""
+    headers = [_auth_header(u) for u in users]
+    local = threading.local()
+    today = timezone.localdate()
+
+    def operation(i):
+        client = getattr(local, "client", None) or Client()
+        local.client = client
+        if i % 4 == 3:
+            message = FREE_TEXT_MESSAGES[i % len(FREE_TEXT_MESSAGES)]
+        else:
+            start = today - timedelta(days=3 + i % 10)
+            message = f"My period was from {start:%b %d} to {start + timedelta(days=4):%b %d}"
+        response = client.post(
+            "/api/tracker/chat/",
+            {"message": message, "allow_sms": True, "async_summary": False},
+            content_type="application/json",
+            **headers[i % len(headers)],
+        )
+        return response.status_code == 200
+
+    return operation
+
+
+def search_scenario(users):
+    """GET /api/search/ over a small topic set, so later requests hit the cache."""
+    local = threading.local()
+
+    def operation(i):
+        client = getattr(local, "client", None) or Client()
+        local.client = client
+        response = client.get("/api/search/", {"q": SEARCH_TOPICS[i % len(SEARCH_TOPICS)]})
+        return response.status_code == 200
+
+    return operation
+
+
+def summary_task_scenario(users):
+    """generate_cycle_summary for a fresh CycleSummary row per call."""
+    from tracker.models import CycleRecord, CycleSummary
+    from tracker.tasks import generate_cycle_summary
+
+    records = list(CycleRecord.objects.filter(user__in=users).order_by("id"))
+
+    def operation(i):
+        record = records[i % len(records)]
+        summary = CycleSummary.objects.create(user_id=record.user_id, record=record)
+        return generate_cycle_summary.apply(args=(str(summary.id), True, False)).successful()
+
+    return operation
+
+
+def sms_task_scenario(users):
+    from tracker.tasks import send_sms_reminder
+
+    def operation(i):
+        result = send_sms_reminder.apply(args=(users[i % len(users)].id, "Your period is expected in 2 days."))
+        return result.successful() and str(result.result).startswith("✅")
+
+    return operation
+
+
+def daily_reminders_scenario(users):
+    from tracker.tasks import check_and_send_daily_reminders
+
+    return lambda i: check_and_send_daily_reminders.apply().successful()
+
+
+def weekly_tip_scenario(users):
+    from tracker.tasks import send_weekly_health_tip
+
+    return lambda i: send_weekly_health_tip.apply().successful()
+
+
+SCENARIOS = {
+    "predict": predict_scenario,
+    "search": search_scenario,
+    "summary_task": summary_task_scenario,
+    "sms_task": sms_task_scenario,
+    "daily_reminders": daily_reminders_scenario,
+    "weekly_tip": weekly_tip_scenario,
+}
+# Beat sweeps touch every user per call, so they run a few times, one at a time.
+SWEEPS = {"daily_reminders", "weekly_tip"}
+
+
+def run_scenarios(names, users, requests, concurrency, sweeps=3):
+    from tracker import sms
+
+    results = []
+    for name in names:
+        cache.clear()
+        metrics.reset()
+        sms.outbox.clear()
+        operation = SCENARIOS[name](users)
+        if name in SWEEPS:
+            result = run(name, operation, sweeps, 1)
+        else:
+            result = run(name, operation, requests, concurrency)
+        result["sms_sent"] = len(sms.outbox)
+        result["llm_calls"] = sum(v for k, v in metrics.snapshot("llm.").items() if k.endswith(".calls"))
+        results.append(result)
+    return results
+
+
+COLUMNS = [
+    ("scenario", "{:<16}"), ("requests", "{:>8}"), ("concurrency", "{:>5}"), ("errors", "{:>6}"),
+    ("throughput", "{:>9.1f}"), ("p50_ms", "{:>9.1f}"), ("p95_ms", "{:>9.1f}"), ("p99_ms", "{:>9.1f}"),
+    ("queries_mean", "{:>7.1f}"), ("queries_max", "{:>6}"), ("llm_calls", "{:>6}"), ("sms_sent", "{:>6}"),
+]
+HEADERS = ["scenario", "reqs", "conc", "errors", "req/s", "p50 ms", "p95 ms", "p99 ms", "q/op", "q max", "llm", "sms"]
+
+
+def format_table(results):
+    widths = [len(fmt.format(0 if key != "scenario" else "")) for key, fmt in COLUMNS]
+    lines = [" ".join(h.rjust(w) if n else h.ljust(w) for n, (h, w) in enumerate(zip(HEADERS, widths)))]
+    for r in results:
+        lines.append(" ".join(fmt.format(r[key]) for key, fmt in COLUMNS))
+    return "\n".join(lines)
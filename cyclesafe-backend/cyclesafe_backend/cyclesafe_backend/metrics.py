@@ -0,0 +1,46 @@
+# cyclesafe_backend/metrics.py
+"""
+Tiny in-process counters shared by every app.
+
+Values live in the memory of the current worker process, so they are cheap
+to update on hot paths and are read back through `snapshot()` (exposed at
+/api/metrics/ for staff users).
+"""
+import threading
+from collections import defaultdict
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+
+
+def incr(name: str, amount: int = 1) -> None:
+    """Increase counter `name` by `amount`."""
+    with _lock:
+        _counters[name] += amount
+
+
+def observe(name: str, seconds: float) -> None:
+    """Record a duration as `name.count`, `name.total_ms` and `name.max_ms`."""
+    ms = int(seconds * 1000)
+    with _lock:
+        _counters[f"{name}.count"] += 1
+        _counters[f"{name}.total_ms"] += ms
+        _counters[f"{name}.max_ms"] = max(_counters[f"{name}.max_ms"], ms)
+
+
+def get(name: str) -> int:
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def snapshot(prefix: str = "") -> dict:
+    """Return a copy of every counter whose name starts with `prefix`."""
+    with _lock:
+        return {k: v for k, v in sorted(_counters.items()) if k.startswith(prefix)}
+
+
+def reset(prefix: str = "") -> None:
+    """Drop counters starting with `prefix` (used by tests)."""
+    with _lock:
+        for key in [k for k in _counters if k.startswith(prefix)]:
+            del _counters[key]
@@ -0,0 +1,229 @@
+# cyclesafe_backend/profiling.py
+"""
+Per-request timing breakdown.
+
+ServerTimingMiddleware collects, for every request:
+
+- db:        SQL query count and time (a connection execute wrapper)
+- llm:       time spent in OpenAI calls (cyclesafe_backend.llm)
+- http:      outbound HTTP time (e.g. the proxy fetch)
+- parse:     HTML parsing in the proxy
+- serialize: DRF serializer time (ProfiledSerializerMixin)
+- render:    response rendering (DRF / template responses)
+
+and reports them in a `Server-Timing` header and one structured log line.
+Other code adds its own spans with `timed("name")` (context manager or
+decorator) or `record("name", seconds)`; outside a request both are no-ops.
+
+With PROFILING_SAMPLE_RATE > 0 a share of sync requests also run under
+cProfile; profiles of requests slower than PROFILING_SLOW_MS are logged
+(and saved to PROFILING_DIR when set).
+"""
+import contextlib
+import contextvars
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+# Header / log order; anything else recorded is appended after these.
+CATEGORIES = ["db", "llm", "http", "parse", "serialize", "render"]
+
+
+class RequestTimings:
+    def __init__(self):
+        self.spans = {}  # name -> [seconds, count]
+        self._lock = threading.Lock()  # async views record from several threads
+
+    def add(self, name, seconds):
+        with self._lock:
+            span = self.spans.setdefault(name, [0.0, 0])
+            span[0] += seconds
+            span[1] += 1
+
+    def as_dict(self):
+        names = [n for n in CATEGORIES if n in self.spans] + sorted(set(self.spans) - set(CATEGORIES))
+        return {n: {"ms": round(self.spans[n][0] * 1000, 1), "count": self.spans[n][1]} for n in names}
+
+
+_current = contextvars.ContextVar("request_timings", default=None)
+_active = contextvars.ContextVar("profiling_active_spans", default=frozenset())
+
+
+def current():
+    """The RequestTimings of the request being handled, or None."""
+    return _current.get()
+
+
+def record(name, seconds):
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+@contextlib.contextmanager
+def timed(name):
+    """
+    Time a block (or, used as a decorator, a function) under `name`.
+    Nested spans with the same name only count once.
+    """
+    active = _active.get()
+    if _current.get() is None or name in active:
+        yield
+        return
+    token = _active.set(active | {name})
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+        _active.reset(token)
+
+
+class ProfiledSerializerMixin:
+    """Counts a DRF serializer's to_representation() as "serialize" time."""
+
+    def to_representation(self, instance):
+        with timed("serialize"):
+            return super().to_representation(instance)
+
+
+# ---------- SQL ----------
+
+def _sql_wrapper(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add("db", time.perf_counter() - started)
+
+
+def _install_sql_wrapper(connection, **kwargs):
+    if _sql_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_sql_wrapper)
+
+
+connection_created.connect(_install_sql_wrapper)
+
+
+# ---------- Middleware ----------
+
+def _header(timings, total):
+    parts = []
+    for name, span in timings.as_dict().items():
+        unit = "queries" if name == "db" else "calls"
+        parts.append(f'{name};dur={span["ms"]};desc="{span["count"]} {unit}"')
+    parts.append(f"total;dur={round(total * 1000, 1)}")
+    return ", ".join(parts)
+
+
+_profiler_lock = threading.Lock()  # cProfile can only run one profile at a time
+
+
+class ServerTimingMiddleware:
+    """
+    Adds the Server-Timing header and logs the breakdown of every request.
+    Keep it first in MIDDLEWARE so the total covers the other middleware
+    and its process_template_response runs last (just before rendering).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not settings.PROFILING_ENABLED:
+            return self.get_response(request)
+
+        _install_sql_wrapper(connection)
+        token = _current.set(RequestTimings())
+        try:
+            profiler = self._start_profiler()
+            started = time.perf_counter()
+            try:
+                response = self.get_response(request)
+            finally:
+                total = time.perf_counter() - started
+                if profiler is not None:
+                    profiler.disable()
+                    _profiler_lock.release()
+            self._report(request, response, total, profiler)
+        finally:
+            _current.reset(token)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.PROFILING_ENABLED:
+            return await self.get_response(request)
+
+        token = _current.set(RequestTimings())
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+            self._report(request, response, time.perf_counter() - started, None)
+        finally:
+            _current.reset(token)
+        return response
+
+    def process_template_response(self, request, response):
+        started = time.perf_counter()
+        timings = _current.get()
+        if timings is not None:
+            response.add_post_render_callback(lambda r: timings.add("render", time.perf_counter() - started))
+        return response
+
+    def _start_profiler(self):
+        rate = settings.PROFILING_SAMPLE_RATE
+        if rate <= 0 or random.random() >= rate or not _profiler_lock.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def _report(self, request, response, total, profiler):
+        timings = _current.get()
+        if settings.PROFILING_HEADER:
+            response["Server-Timing"] = _header(timings, total)
+        logger.info("request timings %s", json.dumps({
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "total_ms": round(total * 1000, 1),
+            "spans": timings.as_dict(),
+        }))
+        if profiler is not None and total * 1000 >= settings.PROFILING_SLOW_MS:
+            self._dump_profile(request, total, profiler)
+
+    def _dump_profile(self, request, total, profiler):
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(30)
+        logger.warning(
+            "slow request %s %s (%.0f ms) profile:\n%s", request.method, request.path, total * 1000, out.getvalue()
+        )
+        if settings.PROFILING_DIR:
+            os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.path.strip('/').replace('/', '_') or 'root'}-{uuid.uuid4().hex[:6]}.prof"
+            profiler.dump_stats(os.path.join(settings.PROFILING_DIR, name))
@@ -0,0 +1,120 @@
+# cyclesafe_backend/queues.py
+"""
+Celery queues, priorities and per-queue metrics.
+
+  transactional  welcome messages, cycle summaries: a user is waiting
+  reminders      period / ovulation reminders
+  bulk           weekly tips, nightly rebuilds
+
+On the Redis broker a lower priority number is served first (0 is the
+highest), and a worker listening on several queues drains them in the
+order given to -Q, so a shared worker still serves transactional first.
+
+Every message is stamped with its enqueue time when published; workers
+record how long it waited per queue in Redis, and queue depth is read
+straight from the broker lists. `stats()` returns both (it is merged into
+/api/metrics/).
+"""
+import logging
+import time
+
+import redis
+from django.conf import settings
+
+from . import metrics, redis_client
+
+logger = logging.getLogger(__name__)
+
+# queue: default priority for its tasks
+QUEUES = {
+    "transactional": 0,
+    "reminders": 3,
+    "bulk": 6,
+}
+PRIORITY_STEPS = list(range(10))
+PRIORITY_SEP = ":"  # kombu stores priority N of queue Q in the list "Q:N"
+
+ENQUEUED_HEADER = "enqueued_at"
+_WAIT_KEY = "celery:queue_wait:{}"
+
+
+def options(queue):
+    """apply_async() options sending a task to `queue` at its priority."""
+    return {"queue": queue, "priority": QUEUES[queue]}
+
+
+def route(queue):
+    """A task_routes entry for `queue`."""
+    return {"queue": queue, "priority": QUEUES[queue]}
+
+
+def worker_options(queue):
+    """(concurrency, prefetch multiplier) for a worker dedicated to `queue`."""
+    conf = settings.QUEUE_WORKERS.get(queue, {})
+    return conf.get("concurrency"), conf.get("prefetch")
+
+
+# ---------- Wait time ----------
+
+def stamp(headers):
+    """Add the enqueue time to a message's headers (before_task_publish)."""
+    headers.setdefault(ENQUEUED_HEADER, time.time())
+
+
+def record_wait(queue, enqueued_at, now=None):
+    """Record how long a message sat in `queue` before a worker started it."""
+    if queue not in QUEUES or enqueued_at is None:
+        return
+    wait = max(0.0, (now or time.time()) - float(enqueued_at))
+    metrics.observe(f"celery.queue.{queue}.wait", wait)
+
+    client = redis_client.get_redis()
+    if client is None:
+        return
+    ms = int(wait * 1000)
+    key = _WAIT_KEY.format(queue)
+    try:
+        pipe = client.pipeline()
+        pipe.hincrby(key, "count", 1)
+        pipe.hincrby(key, "total_ms", ms)
+        pipe.eval(
+            "if tonumber(redis.call('HGET', KEYS[1], 'max_ms') or '0') < tonumber(ARGV[1]) then "
+            "redis.call('HSET', KEYS[1], 'max_ms', ARGV[1]) end",
+            1, key, ms,
+        )
+        pipe.execute()
+    except redis.RedisError as e:
+        redis_client.mark_down(e)
+
+
+# ---------- Depth ----------
+
+def _list_names(queue):
+    return [queue] + [f"{queue}{PRIORITY_SEP}{step}" for step in PRIORITY_STEPS if step]
+
+
+def stats():
+    """
+    {"celery.queue.<name>.depth": ..., "celery.queue.<name>.wait.count": ...}
+    for every queue, read from Redis; empty while Redis is unavailable.
+    """
+    client = redis_client.get_redis()
+    if client is None:
+        return {}
+    result = {}
+    try:
+        pipe = client.pipeline()
+        for queue in QUEUES:
+            for name in _list_names(queue):
+                pipe.llen(name)
+            pipe.hgetall(_WAIT_KEY.format(queue))
+        replies = iter(pipe.execute())
+    except redis.RedisError as e:
+        redis_client.mark_down(e)
+        return {}
+
+    for queue in QUEUES:
+        result[f"celery.queue.{queue}.depth"] = sum(next(replies) for _ in _list_names(queue))
+        for field, value in next(replies).items():
+            result[f"celery.queue.{queue}.wait.{field.decode()}"] = int(value)
+    return result
@@ -0,0 +1,99 @@
+# cyclesafe_backend/ratelimit.py
+"""
+Token-bucket rate limiter shared by every worker through Redis.
+
+The bucket state lives in one Redis hash updated by a Lua script, so the
+limit holds across processes and hosts. While Redis is unreachable each
+process falls back to its own in-memory bucket with the same settings.
+"""
+import threading
+import time
+
+import redis
+
+from . import metrics, redis_client
+
+# Refill, then take one token if there is one. Returns the seconds to wait
+# before a token will be available ("0" when one was taken).
+_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `burst`."""
+
+    def __init__(self, name, rate, burst):
+        self.key = f"ratelimit:{name}"
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._ts = time.monotonic()
+        self._lock = threading.Lock()
+        self._script = None
+
+    def _local_wait(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._ts) * self.rate)
+            self._ts = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def _wait(self):
+        client = redis_client.get_redis()
+        if client is not None:
+            try:
+                if self._script is None:
+                    self._script = client.register_script(_TAKE_SCRIPT)
+                return float(self._script(keys=[self.key], args=[self.rate, self.burst], client=client))
+            except redis.RedisError as e:
+                redis_client.mark_down(e)
+        return self._local_wait()
+
+    def acquire(self, timeout):
+        """Take a token, waiting up to `timeout` seconds. Returns False if none came free."""
+        if self.rate <= 0:
+            return True
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = self._wait()
+            if wait <= 0:
+                return True
+            if time.monotonic() + wait > deadline:
+                metrics.incr(f"ratelimit.{self.name}.rejected")
+                return False
+            metrics.incr(f"ratelimit.{self.name}.waits")
+            time.sleep(wait)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def bucket(name, rate, burst):
+    """The process-wide TokenBucket for `name` (rebuilt if its settings change)."""
+    with _buckets_lock:
+        current = _buckets.get(name)
+        if current is None or (current.rate, current.burst) != (rate, burst):
+            current = _buckets[name] = TokenBucket(name, rate, burst)
+        return current
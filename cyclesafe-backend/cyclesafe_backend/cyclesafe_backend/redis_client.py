@@ -0,0 +1,52 @@
+# cyclesafe_backend/redis_client.py
+"""
+Shared Redis connection for app-level features (rate limits and the like),
+separate from Celery's broker connection.
+
+get_redis() returns None while Redis is known to be unreachable, so callers
+switch to their in-process fallback; after a failure (reported through
+mark_down) reconnecting is retried every REDIS_RETRY_INTERVAL seconds.
+"""
+import logging
+import os
+import threading
+import time
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_client_pid = None
+_down_until = 0.0
+_lock = threading.Lock()
+
+
+def get_redis():
+    """Process-wide Redis client, or None if Redis is unconfigured or down."""
+    global _client, _client_pid
+    url = getattr(settings, "REDIS_URL", "")
+    if not url or time.monotonic() < _down_until:
+        return None
+    with _lock:
+        if _client is None or _client_pid != os.getpid():  # don't share sockets across forked workers
+            timeout = getattr(settings, "REDIS_SOCKET_TIMEOUT", 0.5)
+            _client = redis.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+            _client_pid = os.getpid()
+        return _client
+
+
+def available():
+    """False while Redis is known to be down (see mark_down)."""
+    return time.monotonic() >= _down_until
+
+
+def mark_down(error):
+    """Record a Redis failure; get_redis() returns None until the retry interval passes."""
+    global _down_until
+    with _lock:
+        first = time.monotonic() >= _down_until
+        _down_until = time.monotonic() + getattr(settings, "REDIS_RETRY_INTERVAL", 30)
+    if first:
+        logger.warning("Redis unavailable, using in-process fallbacks: %s", error)
@@ -68,12 +68,14 @@ INSTALLED_APPS = [
     "tracker",
     "proxy",
     "blog",
+    "chat",
 ]
 
 # ------------------------------------------
 # 🧱 Middleware
 # ------------------------------------------
 MIDDLEWARE = [
+    "cyclesafe_backend.profiling.ServerTimingMiddleware",  # keep first: times everything below
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -84,6 +86,15 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Server-Timing header + per-request timing log (cyclesafe_backend/profiling.py).
+# Off unless asked for: the header exposes internal timings to every client.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "False") == "True"
+PROFILING_HEADER = os.getenv("PROFILING_HEADER", "False") == "True"
+# cProfile a share of requests (0 = off) and log the ones slower than PROFILING_SLOW_MS
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_SLOW_MS = float(os.getenv("PROFILING_SLOW_MS", "1000"))
+PROFILING_DIR = os.getenv("PROFILING_DIR", "")  # also save .prof files here when set
+
 ROOT_URLCONF = "cyclesafe_backend.urls"
 
 # ------------------------------------------
@@ -171,11 +182,147 @@ if not REDIS_URL:
     CELERY_BROKER_URL = "memory://"
     CELERY_RESULT_BACKEND = "cache+memory://"
 
+# ✅ Shared cache: a small per-process LRU in front of Redis, kept coherent over pub/sub
+# (cyclesafe_backend/cache.py). Falls back to the LRU alone while Redis is down.
+CACHES = {
+    "default": {
+        "BACKEND": "cyclesafe_backend.cache.TieredCache",
+        "LOCATION": os.getenv("CACHE_REDIS_URL", REDIS_URL),
+        "KEY_PREFIX": "cache",  # clear() only deletes these keys; the Celery queues share the database
+        "OPTIONS": {
+            "L1_MAX_ENTRIES": int(os.getenv("CACHE_L1_MAX_ENTRIES", "1000")),
+            "L1_TIMEOUT": int(os.getenv("CACHE_L1_TIMEOUT", "30")),  # seconds; bounds staleness if a message is lost
+            "socket_timeout": float(os.getenv("CACHE_SOCKET_TIMEOUT", "0.5")),
+            "socket_connect_timeout": float(os.getenv("CACHE_SOCKET_TIMEOUT", "0.5")),
+        },
+    }
+} if REDIS_URL else {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+}
+
+# Per-queue worker sizing (cyclesafe_backend/queues.py), applied to workers started with a single -Q
+QUEUE_WORKERS = {
+    "transactional": {
+        "concurrency": int(os.getenv("TRANSACTIONAL_CONCURRENCY", "4")),
+        "prefetch": int(os.getenv("TRANSACTIONAL_PREFETCH", "1")),  # don't hoard: latency matters
+    },
+    "reminders": {
+        "concurrency": int(os.getenv("REMINDERS_CONCURRENCY", "2")),
+        "prefetch": int(os.getenv("REMINDERS_PREFETCH", "4")),
+    },
+    "bulk": {
+        "concurrency": int(os.getenv("BULK_CONCURRENCY", "2")),
+        "prefetch": int(os.getenv("BULK_PREFETCH", "1")),  # chunk tasks are long
+    },
+}
+
 # ------------------------------------------
 # 🤖 External APIs
 # ------------------------------------------
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# Shared LLM gateway (cyclesafe_backend/llm.py)
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))  # seconds per call, retries included
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))  # per process
+LLM_DEFAULT_ROUTE_CONCURRENCY = int(os.getenv("LLM_DEFAULT_ROUTE_CONCURRENCY", "8"))
+LLM_ROUTE_CONCURRENCY = {
+    "tracker.summary": 4,
+}
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))  # consecutive failures
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))  # seconds
+
+# "openai" or "fake" (cyclesafe_backend/fake_llm.py: deterministic offline answers)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "200"))
+FAKE_LLM_JITTER_MS = float(os.getenv("FAKE_LLM_JITTER_MS", "100"))
+FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED", "0"))
+
+# "twilio", "memory" (kept in tracker.sms.outbox) or "file" (JSON lines in SMS_FILE_PATH)
+SMS_BACKEND = os.getenv("SMS_BACKEND", "twilio")
+SMS_FILE_PATH = os.getenv("SMS_FILE_PATH", str(BASE_DIR / "sms_outbox.jsonl"))
+
+# SMS segments (tracker/segments.py): swap emoji / smart quotes for GSM-7 text when
+# that needs fewer segments, and split long bodies into messages of at most N segments
+SMS_COMPACT = os.getenv("SMS_COMPACT", "True") == "True"
+SMS_MAX_SEGMENTS = int(os.getenv("SMS_MAX_SEGMENTS", "10"))
+
+# Twilio send rate across all workers (token bucket in Redis, per-process if Redis is down)
+SMS_RATE_LIMIT = float(os.getenv("SMS_RATE_LIMIT", "10"))  # messages per second, 0 = unlimited
+SMS_RATE_BURST = int(os.getenv("SMS_RATE_BURST", "10"))
+SMS_RATE_LIMIT_WAIT = float(os.getenv("SMS_RATE_LIMIT_WAIT", "10"))  # seconds, then requeue
+SMS_RETRY_BASE_DELAY = float(os.getenv("SMS_RETRY_BASE_DELAY", "5"))  # requeue backoff after a 429
+SMS_RETRY_MAX_DELAY = float(os.getenv("SMS_RETRY_MAX_DELAY", "300"))
+TWILIO_TIMEOUT = float(os.getenv("TWILIO_TIMEOUT", "10"))
+
+# ScheduledReminder dispatcher (tracker/reminders.py, runs every minute)
+SCHEDULED_REMINDER_BATCH_SIZE = int(os.getenv("SCHEDULED_REMINDER_BATCH_SIZE", "200"))
+SCHEDULED_REMINDER_MAX_BATCHES = int(os.getenv("SCHEDULED_REMINDER_MAX_BATCHES", "50"))  # per run
+SCHEDULED_REMINDER_LEASE = int(os.getenv("SCHEDULED_REMINDER_LEASE", "600"))  # seconds before a stuck claim is retried
+
+# Daily reminder sweep runs every REMINDER_SLICE_MINUTES (should divide 60) over the users
+# whose slot in their delivery window falls in that slice (tracker/windows.py)
+REMINDER_SLICE_MINUTES = int(os.getenv("REMINDER_SLICE_MINUTES", "10"))
+
+# SMS delivery log (tracker/delivery.py): rows per bulk insert, the longest a row waits
+# for one (checked after each task), and how long they are kept
+DELIVERY_LOG_BATCH_SIZE = int(os.getenv("DELIVERY_LOG_BATCH_SIZE", "200"))
+DELIVERY_LOG_FLUSH_SECONDS = float(os.getenv("DELIVERY_LOG_FLUSH_SECONDS", "10"))
+DELIVERY_LOG_RETENTION_DAYS = int(os.getenv("DELIVERY_LOG_RETENTION_DAYS", "90"))
+
+# Seconds a user's SMS opt-in / number is cached for the delivery pipeline's
+# send-time consent check (tracker/recipients.py); saving the profile clears it
+SMS_CONSENT_CACHE_TTL = int(os.getenv("SMS_CONSENT_CACHE_TTL", "60"))
+
+# Bulk SMS beat jobs fan out as one Celery task per SMS_FANOUT_CHUNK_SIZE user ids
+# (tracker/fanout.py); False queues one deliver_sms per user instead
+SMS_FANOUT = os.getenv("SMS_FANOUT", "True") == "True"
+SMS_FANOUT_CHUNK_SIZE = int(os.getenv("SMS_FANOUT_CHUNK_SIZE", "500"))
+
+# Structured (JSON-schema) period extraction model used when the local parser misses
+EXTRACTION_MODEL = os.getenv("EXTRACTION_MODEL", "gpt-4.1-mini")
+
+# search_view answers with whatever is ready after this many seconds
+SEARCH_DEADLINE = float(os.getenv("SEARCH_DEADLINE", "20"))
+
+# Complete search answers are cached for SEARCH_CACHE_TTL seconds. Near-duplicate
+# queries ("Period pains?" vs "period pain") reuse them through an in-process index of
+# up to SEARCH_SEMANTIC_CACHE_SIZE queries matched at this cosine similarity (chat/semantic.py)
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "3600"))
+SEARCH_SEMANTIC_CACHE = os.getenv("SEARCH_SEMANTIC_CACHE", "True") == "True"
+SEARCH_SEMANTIC_CACHE_SIZE = int(os.getenv("SEARCH_SEMANTIC_CACHE_SIZE", "1000"))
+SEARCH_SEMANTIC_THRESHOLD = float(os.getenv("SEARCH_SEMANTIC_THRESHOLD", "0.88"))
+
+# After SEARCH_CACHE_TTL an answer is served stale for up to SEARCH_STALE_TTL more seconds
+# while one chat.tasks.refresh_search regenerates it (at most one per SEARCH_REFRESH_LOCK_TTL).
+# Requests arriving while another generates the same answer poll every SEARCH_WAIT_POLL seconds
+SEARCH_STALE_TTL = int(os.getenv("SEARCH_STALE_TTL", "86400"))
+SEARCH_REFRESH_LOCK_TTL = int(os.getenv("SEARCH_REFRESH_LOCK_TTL", "120"))
+SEARCH_WAIT_POLL = float(os.getenv("SEARCH_WAIT_POLL", "0.1"))
+# Answers the LLM failed on are cached this long only, already stale, so one refresh retries
+SEARCH_FAILED_TTL = int(os.getenv("SEARCH_FAILED_TTL", "60"))
+
+# Search counts are buffered in Redis and flushed to SearchQueryCount every
+# SEARCH_COUNT_FLUSH_SECONDS. Every SEARCH_PREWARM_MINUTES the SEARCH_PREWARM_TOP most
+# searched queries of the last SEARCH_PREWARM_DAYS days are refreshed if their answer
+# goes stale within SEARCH_PREWARM_LEAD seconds (chat/analytics.py)
+SEARCH_COUNT_FLUSH_SECONDS = int(os.getenv("SEARCH_COUNT_FLUSH_SECONDS", "300"))
+SEARCH_PREWARM_TOP = int(os.getenv("SEARCH_PREWARM_TOP", "50"))
+SEARCH_PREWARM_DAYS = int(os.getenv("SEARCH_PREWARM_DAYS", "7"))
+SEARCH_PREWARM_MINUTES = int(os.getenv("SEARCH_PREWARM_MINUTES", "10"))
+SEARCH_PREWARM_LEAD = int(os.getenv("SEARCH_PREWARM_LEAD", "900"))
+
+# Answer searches from the stored lesson library (chat/library.py) before calling the LLM,
+# and store new topics there; `manage.py generate_lessons` fills it in advance
+SEARCH_LIBRARY = os.getenv("SEARCH_LIBRARY", "True") == "True"
+
+# Return cycle predictions right away and generate the AI summary in Celery
+# (clients can also opt in per request with "async_summary": true)
+TRACKER_ASYNC_SUMMARY = os.getenv("TRACKER_ASYNC_SUMMARY", "False") == "True"
+
+# Cycle summary templates are cached per (cycle length, duration bucket)
+SUMMARY_TEMPLATE_TTL = int(os.getenv("SUMMARY_TEMPLATE_TTL", str(7 * 24 * 60 * 60)))
+
 # ------------------------------------------
 # 🧩 React (for local dev only)
 # ------------------------------------------
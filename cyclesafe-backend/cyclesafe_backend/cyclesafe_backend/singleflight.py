@@ -0,0 +1,76 @@
+# cyclesafe_backend/singleflight.py
+"""
+Single-flight locks: at most one holder of a name at a time, across workers.
+
+Used so that only one request regenerates an expired cache entry while the
+others wait for it or keep serving the stale copy. The lock is a Redis key
+set with NX and a TTL, so a holder that dies only blocks others until the
+TTL passes. While Redis is unreachable each process falls back to its own
+in-memory locks (one regeneration per process instead of per request).
+"""
+import threading
+import time
+import uuid
+
+import redis
+
+from . import metrics, redis_client
+
+# Delete the lock only if it still holds our token (it may have expired and been re-taken)
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_local = {}  # key -> (token, monotonic expiry)
+_local_lock = threading.Lock()
+_release_script = None
+
+
+def _key(name):
+    return f"singleflight:{name}"
+
+
+def acquire(name, ttl):
+    """A token if the caller now holds `name` for up to `ttl` seconds, else None."""
+    token = uuid.uuid4().hex
+    client = redis_client.get_redis()
+    if client is not None:
+        try:
+            acquired = client.set(_key(name), token, nx=True, px=max(int(ttl * 1000), 1))
+            metrics.incr("singleflight.acquired" if acquired else "singleflight.contended")
+            return token if acquired else None
+        except redis.RedisError as e:
+            redis_client.mark_down(e)
+
+    with _local_lock:
+        now = time.monotonic()
+        held = _local.get(_key(name))
+        if held and held[1] > now:
+            metrics.incr("singleflight.contended")
+            return None
+        _local[_key(name)] = (token, now + ttl)
+    metrics.incr("singleflight.acquired")
+    return token
+
+
+def release(name, token):
+    """Give up `name` if `token` still holds it."""
+    global _release_script
+    with _local_lock:
+        held = _local.get(_key(name))
+        if held and held[0] == token:
+            del _local[_key(name)]
+            return
+
+    client = redis_client.get_redis()
+    if client is None:
+        return
+    try:
+        if _release_script is None:
+            _release_script = client.register_script(_RELEASE_SCRIPT)
+        _release_script(keys=[_key(name)], args=[token], client=client)
+    except redis.RedisError as e:
+        redis_client.mark_down(e)
@@ -0,0 +1,376 @@
+# cyclesafe_backend/tests.py
+import asyncio
+import fnmatch
+import json
+import os
+from unittest import mock
+
+import httpx
+import openai
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from blog.models import BlogSubmission
+from cyclesafe_backend import llm, loadtest, metrics, profiling, queues, ratelimit, redis_client, singleflight
+from cyclesafe_backend.cache import TieredCache
+from cyclesafe_backend.celery import app, configure_queue_worker
+
+
+def _timeout():
+    return openai.APITimeoutError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+
+
+def _always_timeout(*args):
+    raise _timeout()
+
+
+@override_settings(LLM_RETRY_BASE_DELAY=0, LLM_MAX_RETRIES=2, LLM_BREAKER_THRESHOLD=2, LLM_BREAKER_COOLDOWN=60)
+class LLMGatewayTest(SimpleTestCase):
+    def setUp(self):
+        llm._breakers.clear()
+        metrics.reset("llm.")
+
+    @mock.patch("cyclesafe_backend.llm._call", side_effect=[_timeout(), "hello"])
+    def test_retries_transient_errors(self, call):
+        self.assertEqual(llm.complete("test.route", [], model="m"), "hello")
+        self.assertEqual(call.call_count, 2)
+        self.assertEqual(metrics.get("llm.test.route.retries"), 1)
+        self.assertEqual(metrics.get("llm.test.route.latency.count"), 2)
+
+    @mock.patch("cyclesafe_backend.llm._call", side_effect=_always_timeout)
+    def test_fallback_and_circuit_breaker(self, call):
+        self.assertEqual(llm.complete("test.route", [], model="m", fallback="degraded"), "degraded")
+        self.assertEqual(call.call_count, 3)  # first try + 2 retries
+
+        with self.assertRaises(llm.LLMUnavailable):
+            llm.complete("test.route", [], model="m")
+        self.assertEqual(metrics.get("llm.test.route.breaker_opened"), 1)
+
+        # Circuit is open: fail fast without touching the upstream.
+        self.assertEqual(llm.complete("test.route", [], model="m", fallback=lambda: "cached"), "cached")
+        self.assertEqual(call.call_count, 6)
+        self.assertEqual(metrics.get("llm.test.route.short_circuited"), 1)
+
+    def test_half_open_trial_closes_circuit(self):
+        circuit = llm.CircuitBreaker(threshold=1, cooldown=0)
+        circuit.record_failure()
+        self.assertTrue(circuit.allow())   # trial call
+        self.assertFalse(circuit.allow())  # only one trial at a time
+        circuit.record_success()
+        self.assertTrue(circuit.allow())
+
+
+@override_settings(LLM_BACKEND="fake", FAKE_LLM_LATENCY_MS=0, FAKE_LLM_JITTER_MS=0)
+class FakeLLMBackendTest(SimpleTestCase):
+    def setUp(self):
+        llm._breakers.clear()
+        metrics.reset("llm.")
+
+    @mock.patch("cyclesafe_backend.llm._call")
+    def test_answers_offline_and_deterministically(self, call):
+        messages = [{"role": "user", "content": "my period started last week"}]
+        first = llm.complete("tracker.extract", messages, model="m")
+        self.assertEqual(first, llm.complete("tracker.extract", messages, model="m"))
+        self.assertEqual(set(json.loads(first)), {"start_date", "end_date", "cycle_length"})
+        call.assert_not_called()
+        self.assertEqual(metrics.get("llm.tracker.extract.calls"), 2)
+
+    def test_async_answers(self):
+        text = asyncio.run(llm.acomplete("chat.cards", [{"role": "user", "content": "cramps"}], model="m"))
+        self.assertEqual(len(text.split("---")), 3)
+
+    def test_async_calls_share_the_process_wide_slots(self):
+        _, route_slots = llm._slots("test.async")
+        held = 0
+        while route_slots.acquire(blocking=False):
+            held += 1
+        try:
+            # another event loop (another request) holds every slot of the route
+            busy = asyncio.run(llm.acomplete("test.async", [], model="m", timeout=0.05, fallback="busy"))
+            self.assertEqual(busy, "busy")
+            self.assertEqual(metrics.get("llm.test.async.rejected"), 1)
+        finally:
+            for _ in range(held):
+                route_slots.release()
+        self.assertNotEqual(asyncio.run(llm.acomplete("test.async", [], model="m")), "busy")
+
+    @override_settings(LLM_BACKEND="openai")
+    def test_async_client_is_closed_after_each_call(self):
+        client = mock.MagicMock()
+        client.__aenter__ = mock.AsyncMock(return_value=client)
+        client.__aexit__ = mock.AsyncMock(return_value=False)
+        client.chat.completions.create = mock.AsyncMock(
+            return_value=mock.Mock(choices=[mock.Mock(message=mock.Mock(content=" hi "))]),
+        )
+        with mock.patch("cyclesafe_backend.llm.openai.AsyncOpenAI", return_value=client) as AsyncOpenAI:
+            for _ in range(2):
+                self.assertEqual(asyncio.run(llm.acomplete("test.async", [], model="m")), "hi")
+        self.assertEqual(AsyncOpenAI.call_count, 2)
+        self.assertEqual(client.__aexit__.await_count, 2)
+
+
+class LoadTestRunnerTest(TransactionTestCase):
+    def test_reports_percentiles_and_errors(self):
+        result = loadtest.run("noop", lambda i: i % 10 != 0, requests=50, concurrency=4)
+        self.assertEqual(result["requests"], 50)
+        self.assertEqual(result["errors"], 5)
+        self.assertLessEqual(result["p50_ms"], result["p95_ms"])
+        self.assertLessEqual(result["p95_ms"], result["p99_ms"])
+        self.assertEqual(result["queries_max"], 0)
+        self.assertIn("noop", loadtest.format_table([{**result, "llm_calls": 0, "sms_sent": 0}]))
+
+
+@override_settings(PROFILING_ENABLED=True, PROFILING_HEADER=True, PROFILING_SAMPLE_RATE=0)
+class ServerTimingTest(TestCase):
+    def test_blog_list_breakdown(self):
+        for i in range(3):
+            BlogSubmission.objects.create(name="A", email="a@example.com", title=f"Post {i}", content="Hi", status="approved")
+
+        with self.assertLogs("cyclesafe_backend.profiling", "INFO") as logs:
+            response = self.client.get("/api/blog/approved-posts/")
+
+        header = response["Server-Timing"]
+        for name in ("db;", "serialize;", "render;", "total;"):
+            self.assertIn(name, header)
+        self.assertIn('desc="3 calls"', header.split("serialize;")[1])  # nested comments not double counted
+        entry = json.loads(logs.output[0].split("request timings ", 1)[1])
+        self.assertEqual(entry["status"], 200)
+        self.assertGreater(entry["spans"]["db"]["count"], 0)
+
+    @override_settings(LLM_BACKEND="fake", FAKE_LLM_LATENCY_MS=0, FAKE_LLM_JITTER_MS=0)
+    def test_async_view_reports_llm_time(self):
+        llm._breakers.clear()
+        response = self.client.get("/api/search/", {"q": "period pain"})
+        self.assertIn('llm;dur=', response["Server-Timing"])
+        self.assertIn('desc="2 calls"', response["Server-Timing"])
+
+    @override_settings(PROFILING_SAMPLE_RATE=1, PROFILING_SLOW_MS=0)
+    def test_slow_requests_are_profiled(self):
+        with self.assertLogs("cyclesafe_backend.profiling", "WARNING") as logs:
+            self.client.get("/api/blog/latest-blogs/")
+        self.assertIn("slow request GET /api/blog/latest-blogs/", logs.output[0])
+        self.assertIn("cumulative", logs.output[0])
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_timings_are_cleared_when_the_view_raises(self):
+        def broken_view(request):
+            raise RuntimeError("boom")
+
+        middleware = profiling.ServerTimingMiddleware(broken_view)
+        with self.assertRaises(RuntimeError):
+            middleware(RequestFactory().get("/"))
+        self.assertIsNone(profiling.current())
+        self.assertTrue(profiling._profiler_lock.acquire(blocking=False))  # profiler released too
+        profiling._profiler_lock.release()
+
+    def test_spans_are_noops_outside_requests(self):
+        with profiling.timed("http"):
+            pass
+        self.assertIsNone(profiling.current())
+
+
+class TokenBucketTest(SimpleTestCase):
+    def test_local_bucket_spends_burst_then_waits(self):
+        bucket = ratelimit.TokenBucket("test", rate=50, burst=2)
+        self.assertTrue(bucket.acquire(timeout=0))
+        self.assertTrue(bucket.acquire(timeout=0))
+        self.assertFalse(bucket.acquire(timeout=0))
+        self.assertTrue(bucket.acquire(timeout=1))  # ~20 ms until the next token
+
+    @override_settings(REDIS_URL="redis://127.0.0.1:1/0", REDIS_SOCKET_TIMEOUT=0.1)
+    def test_falls_back_when_redis_is_down(self):
+        redis_client._down_until = 0
+        bucket = ratelimit.TokenBucket("test-down", rate=50, burst=1)
+        with self.assertLogs("cyclesafe_backend.redis_client", "WARNING"):
+            self.assertTrue(bucket.acquire(timeout=0))
+        self.assertIsNone(redis_client.get_redis())
+        redis_client._down_until = 0
+
+
+@override_settings(REDIS_URL="")
+class SingleFlightTest(SimpleTestCase):
+    def test_one_holder_at_a_time(self):
+        token = singleflight.acquire("test-key", ttl=60)
+        self.assertIsNotNone(token)
+        self.assertIsNone(singleflight.acquire("test-key", ttl=60))
+
+        singleflight.release("test-key", "someone else")
+        self.assertIsNone(singleflight.acquire("test-key", ttl=60))
+        singleflight.release("test-key", token)
+        other = singleflight.acquire("test-key", ttl=60)
+        self.assertIsNotNone(other)
+        singleflight.release("test-key", other)
+
+    def test_lock_expires(self):
+        self.assertIsNotNone(singleflight.acquire("test-expiry", ttl=0))
+        self.assertIsNotNone(singleflight.acquire("test-expiry", ttl=0))
+
+
+class FakeRedis:
+    """Stands in for Django's RedisCacheClient (and the raw client it hands out) over one dict."""
+
+    def __init__(self):
+        self.data = {}
+        self.published = []
+
+    def get_client(self, key=None, *, write=False):
+        return self
+
+    def get(self, key, default):
+        return self.data.get(key, default)
+
+    def get_many(self, keys):
+        return {k: self.data[k] for k in keys if k in self.data}
+
+    def set(self, key, value, timeout):
+        self.data[key] = value
+
+    def set_many(self, data, timeout):
+        self.data.update(data)
+
+    def add(self, key, value, timeout):
+        return self.data.setdefault(key, value) is value
+
+    def incr(self, key, delta):
+        if key not in self.data:
+            raise ValueError(key)
+        self.data[key] += delta
+        return self.data[key]
+
+    def delete(self, *keys):
+        return sum(self.data.pop(k, None) is not None for k in keys)
+
+    def delete_many(self, keys):
+        self.delete(*keys)
+
+    def scan_iter(self, match, count):
+        return [k for k in list(self.data) if fnmatch.fnmatch(k, match)]
+
+    def publish(self, channel, message):
+        self.published.append(message)
+
+
+class TieredCacheTest(SimpleTestCase):
+    def setUp(self):
+        metrics.reset("cache.")
+        self.redis = FakeRedis()
+        self._down_until = redis_client._down_until
+        redis_client._down_until = 0
+
+    def tearDown(self):
+        redis_client._down_until = self._down_until
+
+    def _cache(self, max_entries=10):
+        cache = TieredCache("redis://unused", {"KEY_PREFIX": "t", "OPTIONS": {"L1_MAX_ENTRIES": max_entries}})
+        cache.__dict__["_cache"] = self.redis
+        cache._listener_pid = os.getpid()  # no listener thread; subscription is simulated
+        cache._subscribed = True
+        return cache
+
+    def _deliver(self, *caches):
+        for message in self.redis.published:
+            for cache in caches:
+                cache.invalidate(message)
+        self.redis.published.clear()
+
+    def test_reads_go_l1_then_redis_and_are_counted_per_prefix(self):
+        cache = self._cache()
+        self.redis.data[cache.make_key("search:period pain")] = {"summary": "Hi"}
+
+        self.assertEqual(cache.get("search:period pain"), {"summary": "Hi"})
+        self.assertEqual(cache.get("search:period pain"), {"summary": "Hi"})
+        self.assertIsNone(cache.get("search:cramps"))
+        self.assertEqual(metrics.snapshot("cache.search."), {
+            "cache.search.l1_hits": 1, "cache.search.l2_hits": 1, "cache.search.misses": 1,
+        })
+
+    def test_writes_invalidate_other_processes(self):
+        worker_a, worker_b = self._cache(), self._cache()
+        worker_a.set("sms_consent:1", (True, "+254700000001"))
+        self.assertEqual(worker_b.get("sms_consent:1"), (True, "+254700000001"))
+
+        worker_a.set("sms_consent:1", (False, None))
+        self.assertEqual(worker_b.get("sms_consent:1"), (True, "+254700000001"))  # message not delivered yet
+        self._deliver(worker_a, worker_b)
+        self.assertEqual(worker_b.get("sms_consent:1"), (False, None))
+        self.assertEqual(worker_a.get("sms_consent:1"), (False, None))  # its own message didn't drop it
+
+        worker_a.delete("sms_consent:1")
+        self._deliver(worker_a, worker_b)
+        self.assertIsNone(worker_b.get("sms_consent:1"))
+
+    def test_l1_is_bounded(self):
+        cache = self._cache(max_entries=2)
+        cache.set_many({"a:1": 1, "a:2": 2, "a:3": 3})
+        self.assertEqual(len(cache.l1), 2)
+        self.assertEqual(cache.get_many(["a:1", "a:2", "a:3"]), {"a:1": 1, "a:2": 2, "a:3": 3})
+
+    def test_l1_is_skipped_while_not_subscribed(self):
+        cache = self._cache()
+        cache.set("a:1", "old")
+        self.redis.data[cache.make_key("a:1")] = "new"  # written while we missed the message
+        cache._subscribed = False
+        self.assertEqual(cache.get("a:1"), "new")
+
+    def test_l1_alone_serves_while_redis_is_down(self):
+        cache = self._cache()
+        cache._subscribed = False
+        redis_client._down_until = float("inf")
+
+        cache.set("a:1", 1)
+        self.assertEqual(cache.get("a:1"), 1)
+        self.assertEqual(cache.incr("a:1"), 2)
+        self.assertFalse(cache.add("a:1", 5))
+        self.assertEqual(self.redis.data, {})
+
+    def test_clear_keeps_other_keys_in_the_database(self):
+        cache = self._cache()
+        cache.set("a:1", 1)
+        self.redis.data["celery"] = "queued task"
+        cache.clear()
+        self.assertEqual(self.redis.data, {"celery": "queued task"})
+        self.assertIn('"keys": "*"', self.redis.published[-1])
+
+
+class QueueRoutingTest(SimpleTestCase):
+    def _route(self, name, **options):
+        route = app.amqp.router.route(options, name)
+        return route["queue"].name, route.get("priority")
+
+    def test_tasks_are_routed_by_urgency(self):
+        self.assertEqual(self._route("tracker.tasks.send_welcome_message"), ("transactional", 0))
+        self.assertEqual(self._route("tracker.tasks.send_reminder_batch"), ("reminders", 3))
+        self.assertEqual(self._route("tracker.tasks.send_fanout_chunk"), ("bulk", 6))
+        # callers can move a shared task to another queue
+        self.assertEqual(
+            self._route("tracker.tasks.send_sms_reminder", **queues.options("bulk")), ("bulk", 6),
+        )
+
+    @override_settings(QUEUE_WORKERS={"bulk": {"concurrency": 2, "prefetch": 1}})
+    def test_single_queue_worker_takes_its_sizing(self):
+        conf = mock.Mock(worker_concurrency=None, worker_prefetch_multiplier=4)
+        configure_queue_worker(conf=conf, options={"queues": ["bulk"]})
+        self.assertEqual((conf.worker_concurrency, conf.worker_prefetch_multiplier), (2, 1))
+
+        conf = mock.Mock(worker_concurrency=None, worker_prefetch_multiplier=4)
+        configure_queue_worker(conf=conf, options={"queues": ["bulk", "reminders"]})
+        self.assertEqual((conf.worker_concurrency, conf.worker_prefetch_multiplier), (None, 4))
+
+    @override_settings(REDIS_URL="")
+    def test_wait_time_is_recorded_per_queue(self):
+        metrics.reset("celery.queue.")
+        headers = {}
+        queues.stamp(headers)
+        queues.record_wait("bulk", headers[queues.ENQUEUED_HEADER] - 2.5)
+        queues.record_wait("unknown", 0)
+        self.assertEqual(metrics.get("celery.queue.bulk.wait.count"), 1)
+        self.assertGreaterEqual(metrics.get("celery.queue.bulk.wait.max_ms"), 2500)
+        self.assertEqual(metrics.snapshot("celery.queue.unknown"), {})
+
+    def test_depth_sums_priority_lists(self):
+        client = mock.Mock()
+        per_queue = [2, 1] + [0] * 8 + [{b"count": b"3", b"total_ms": b"90"}]
+        client.pipeline.return_value.execute.return_value = per_queue * len(queues.QUEUES)
+        with mock.patch.object(redis_client, "get_redis", return_value=client):
+            stats = queues.stats()
+        self.assertEqual(stats["celery.queue.transactional.depth"], 3)
+        self.assertEqual(stats["celery.queue.bulk.wait.total_ms"], 90)
@@ -3,11 +3,26 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.urls import path, include, re_path
 from django.http import JsonResponse
+from django.core.cache import cache
+from django.contrib.admin.views.decorators import staff_member_required
+from chat import semantic
+from . import metrics, queues
 # from django.views.generic import TemplateView  # optional if you comment React route
 
 def home(request):
     return JsonResponse({"status": "ok", "message": "CycleSafe API is running 🚀"})
 
+@staff_member_required
+def metrics_view(request):
+    """In-process counters of the worker that served this request, plus Celery queue depth/wait and cache L1 size."""
+    prefix = request.GET.get("prefix", "")
+    data = metrics.snapshot(prefix)
+    data.update({k: v for k, v in queues.stats().items() if k.startswith(prefix)})
+    data.update({k: v for k, v in semantic.stats().items() if k.startswith(prefix)})
+    if hasattr(cache, "stats"):
+        data.update({k: v for k, v in cache.stats().items() if k.startswith(prefix)})
+    return JsonResponse(data)
+
 urlpatterns = [
     path('admin/', admin.site.urls),
 
@@ -17,6 +32,7 @@ urlpatterns = [
     path('api/tracker/', include('tracker.urls')),
     path('api/search/', include('chat.urls')),
     path('api/blog/', include('blog.urls')),
+    path('api/metrics/', metrics_view, name='metrics'),
 
     # ✅ JSON root view instead of React for now
     path('', home),
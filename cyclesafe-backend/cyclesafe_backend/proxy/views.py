@@ -5,6 +5,7 @@ from django.conf import settings
 from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_GET
+from cyclesafe_backend.profiling import timed
 
 @csrf_exempt
 @require_GET
@@ -25,7 +26,8 @@ def proxy_view(request):
 
     try:
         headers = {"User-Agent": "CycleSafeProxy/1.0"}
-        response = requests.get(url, headers=headers, timeout=10)
+        with timed("http"):
+            response = requests.get(url, headers=headers, timeout=10)
 
         # ✅ Validate response type
         content_type = response.headers.get("Content-Type", "")
@@ -35,19 +37,22 @@ def proxy_view(request):
                 status=400,
             )
 
-        soup = BeautifulSoup(response.text, "html.parser")
+        with timed("parse"):
+            soup = BeautifulSoup(response.text, "html.parser")
 
-        # ✅ Remove unsafe/unnecessary sections
-        for tag in soup(["script", "style", "header", "footer", "nav", "aside", "form", "noscript", "iframe"]):
-            tag.decompose()
+            # ✅ Remove unsafe/unnecessary sections
+            for tag in soup(["script", "style", "header", "footer", "nav", "aside", "form", "noscript", "iframe"]):
+                tag.decompose()
 
-        # ✅ Extract main meaningful section
-        main = soup.find("main") or soup.find("article") or soup.find("body") or soup
+            # ✅ Extract main meaningful section
+            main = soup.find("main") or soup.find("article") or soup.find("body") or soup
 
-        # ✅ Ensure links open safely in new tabs
-        for a in main.find_all("a", href=True):
-            a["target"] = "_blank"
-            a["rel"] = "noopener noreferrer"
+            # ✅ Ensure links open safely in new tabs
+            for a in main.find_all("a", href=True):
+                a["target"] = "_blank"
+                a["rel"] = "noopener noreferrer"
+
+            body = main.prettify()
 
         # ✅ Simple inline CSS for readability
         clean_html = f"""
@@ -84,7 +89,7 @@ def proxy_view(request):
             </style>
         </head>
         <body>
-            {main.prettify()}
+            {body}
         </body>
         </html>
         """
@@ -1,9 +1,12 @@
 #!/bin/bash
 echo "🚀 Starting CycleSafe Backend Services..."
 
-# 1️⃣ Start Celery Worker
-echo "⚙️ Starting Celery Worker..."
-celery -A cyclesafe_backend worker -l info --pool=solo &
+# 1️⃣ Start Celery Workers — one per queue (sizes in settings.QUEUE_WORKERS)
+# Set CELERY_POOL=solo on Windows.
+echo "⚙️ Starting Celery Workers..."
+for queue in transactional reminders bulk; do
+    celery -A cyclesafe_backend worker -l info -Q "$queue" -n "$queue@%h" --pool="${CELERY_POOL:-prefork}" &
+done
 
 # 2️⃣ Start Celery Beat
 echo "⏰ Starting Celery Beat..."
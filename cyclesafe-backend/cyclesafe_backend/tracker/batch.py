@@ -0,0 +1,174 @@
+# tracker/batch.py
+"""
+Vectorized cycle predictions for the whole user base.
+
+Cycle histories are loaded into NumPy arrays one user-id range at a time and
+every user's windows are computed in a single pass, using the same rules as
+CycleRecord.calculate_predictions (average of the last 3 recorded cycle
+lengths, ovulation 14 days before the next period, 6-day fertile window).
+"""
+import logging
+import time
+
+import numpy as np
+from django.db.models import Max, Min
+
+from .models import CycleRecord, CyclePrediction
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CYCLE = 28
+RECENT_CYCLES = 3
+DEFAULT_CHUNK_SIZE = 5000
+
+PREDICTION_FIELDS = [
+    "avg_cycle", "period_start", "period_end", "next_period_date", "ovulation_date",
+    "fertile_start", "fertile_end", "follicular_start", "follicular_end",
+    "luteal_start", "luteal_end",
+]
+
+
+def load_histories(user_id_gte=None, user_id_lt=None):
+    """
+    Return (user_ids, starts, ends, cycle_lengths) arrays sorted by user and
+    newest record first, for users in [user_id_gte, user_id_lt).
+    """
+    qs = CycleRecord.objects.all()
+    if user_id_gte is not None:
+        qs = qs.filter(user_id__gte=user_id_gte)
+    if user_id_lt is not None:
+        qs = qs.filter(user_id__lt=user_id_lt)
+    rows = list(
+        qs.order_by("user_id", "-created_at", "-id")
+        .values_list("user_id", "start_date", "end_date", "cycle_length")
+    )
+    if not rows:
+        empty = np.array([], dtype="datetime64[D]")
+        return np.array([], dtype=np.int64), empty, empty, np.array([], dtype=np.int64)
+
+    user_ids, starts, ends, lengths = zip(*rows)
+    return (
+        np.asarray(user_ids, dtype=np.int64),
+        np.asarray(starts, dtype="datetime64[D]"),
+        np.asarray(ends, dtype="datetime64[D]"),
+        np.asarray([length or 0 for length in lengths], dtype=np.int64),
+    )
+
+
+def compute_predictions(user_ids, starts, ends, lengths):
+    """
+    Vectorized equivalent of CycleRecord.calculate_predictions for every user
+    present in the arrays. Input must be grouped by user, newest record first.
+    Returns a dict of arrays with one entry per user.
+    """
+    if len(user_ids) == 0:
+        return {"user_id": user_ids}
+
+    new_group = np.r_[True, user_ids[1:] != user_ids[:-1]]
+    group = np.cumsum(new_group) - 1
+    first = np.flatnonzero(new_group)
+    rank = np.arange(len(user_ids)) - first[group]
+
+    # Average of the last 3 recorded cycle lengths, ignoring empty ones
+    recent = (rank < RECENT_CYCLES) & (lengths > 0)
+    sums = np.bincount(group, weights=np.where(recent, lengths, 0))
+    counts = np.bincount(group, weights=recent)
+    avg = np.where(counts > 0, np.round(sums / np.maximum(counts, 1)), DEFAULT_CYCLE).astype(np.int64)
+
+    start = starts[first]
+    end = ends[first]
+    cycle_days = avg.astype("timedelta64[D]")
+    one = np.timedelta64(1, "D")
+
+    next_period = start + cycle_days
+    ovulation = next_period - 14 * one
+
+    return {
+        "user_id": user_ids[first],
+        "avg_cycle": avg,
+        "period_start": start,
+        "period_end": end,
+        "next_period_date": next_period,
+        "ovulation_date": ovulation,
+        "fertile_start": ovulation - 5 * one,
+        "fertile_end": ovulation + one,
+        "follicular_start": end + one,
+        "follicular_end": ovulation - one,
+        "luteal_start": ovulation + one,
+        "luteal_end": next_period - one,
+    }
+
+
+def _to_rows(predictions):
+    """Turn the column arrays into CyclePrediction instances."""
+    columns = {f: predictions[f].tolist() for f in PREDICTION_FIELDS}
+    return [
+        CyclePrediction(user_id=user_id, **{f: columns[f][i] for f in PREDICTION_FIELDS})
+        for i, user_id in enumerate(predictions["user_id"].tolist())
+    ]
+
+
+def _upsert(rows):
+    CyclePrediction.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["user"],
+        update_fields=PREDICTION_FIELDS + ["computed_at"],
+    )
+
+
+def refresh_user_prediction(user_id):
+    """
+    Recompute one user's CyclePrediction after their records change, so the
+    reminder sweep never reads stale dates. Returns the row, or None (and
+    removes any old row) when the user has no records left.
+    """
+    predictions = compute_predictions(*load_histories(user_id, user_id + 1))
+    rows = _to_rows(predictions) if len(predictions["user_id"]) else []
+    if not rows:
+        CyclePrediction.objects.filter(user_id=user_id).delete()
+        return None
+    _upsert(rows)
+    return rows[0]
+
+
+def refresh_prediction_from_stats(record, stats):
+    """
+    refresh_user_prediction for a just-created `record`, without reloading
+    the user's history: it is their newest record, and `stats` (already
+    updated for it) holds the last recorded cycle lengths, newest first.
+    """
+    lengths = [length or 0 for length in stats.recent_cycle_lengths] or [record.cycle_length or 0]
+    count = len(lengths)
+    predictions = compute_predictions(
+        np.full(count, record.user_id, dtype=np.int64),
+        np.full(count, np.datetime64(record.start_date, "D")),
+        np.full(count, np.datetime64(record.end_date, "D")),
+        np.asarray(lengths, dtype=np.int64),
+    )
+    row, = _to_rows(predictions)
+    _upsert([row])
+    return row
+
+
+def materialize_predictions(chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Recompute CyclePrediction for every user with cycle records, processing
+    `chunk_size` user ids per pass. Returns the number of users written.
+    """
+    bounds = CycleRecord.objects.aggregate(lo=Min("user_id"), hi=Max("user_id"))
+    if bounds["lo"] is None:
+        return 0
+
+    began = time.monotonic()
+    written = 0
+    for lo in range(bounds["lo"], bounds["hi"] + 1, chunk_size):
+        predictions = compute_predictions(*load_histories(lo, lo + chunk_size))
+        rows = _to_rows(predictions) if len(predictions["user_id"]) else []
+        if not rows:
+            continue
+        _upsert(rows)
+        written += len(rows)
+
+    logger.info("Materialized cycle predictions for %d users in %.2fs", written, time.monotonic() - began)
+    return written
@@ -0,0 +1,129 @@
+# tracker/delivery.py
+"""
+Delivery log: one compact DeliveryLog row per SMS delivery attempt.
+
+The send tasks used to return status strings that piled up, unread, in the
+Celery result backend; they now run with ignore_result and record what a
+dashboard needs here instead. Rows are buffered per process and written
+with one bulk_create when DELIVERY_LOG_BATCH_SIZE are waiting, at the end
+of each fan-out chunk or reminder batch, after a task once the oldest row
+has waited DELIVERY_LOG_FLUSH_SECONDS, and when the worker process exits.
+Single-SMS tasks therefore share inserts instead of writing a row each.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from celery.signals import task_postrun, worker_process_shutdown
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Avg, Count, Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DeliveryLog
+
+logger = logging.getLogger(__name__)
+
+_buffer = []
+_oldest = None  # monotonic time the oldest buffered row was recorded
+_lock = threading.Lock()
+
+
+def record(user_id, kind, status, segments=0, sid="", latency_ms=0, error=""):
+    """Queue a DeliveryLog row; it is written on the next flush()."""
+    row = DeliveryLog(
+        user_id=user_id,
+        kind=kind,
+        status=status,
+        provider_sid=(sid or "")[:64],
+        segments=segments,
+        latency_ms=max(0, int(latency_ms)),
+        error=str(error)[:255],
+        created_at=timezone.now(),
+    )
+    global _oldest
+    with _lock:
+        _buffer.append(row)
+        if _oldest is None:
+            _oldest = time.monotonic()
+        full = len(_buffer) >= settings.DELIVERY_LOG_BATCH_SIZE
+    if full or due():
+        flush()
+
+
+def due():
+    """Whether the oldest buffered row has waited DELIVERY_LOG_FLUSH_SECONDS."""
+    oldest = _oldest
+    return oldest is not None and time.monotonic() - oldest >= settings.DELIVERY_LOG_FLUSH_SECONDS
+
+
+def flush():
+    """Write the buffered rows in one bulk insert. Returns how many were written."""
+    global _oldest
+    with _lock:
+        rows = _buffer[:]
+        _buffer.clear()
+        _oldest = None
+    if not rows:
+        return 0
+    try:
+        DeliveryLog.objects.bulk_create(rows, batch_size=settings.DELIVERY_LOG_BATCH_SIZE)
+    except DatabaseError as e:
+        # the log is telemetry: never fail a send because of it
+        logger.error("Dropped %d delivery log rows: %s", len(rows), e)
+        return 0
+    return len(rows)
+
+
+def reset():
+    """Drop the buffered rows without writing them (used by tests)."""
+    global _oldest
+    with _lock:
+        _buffer.clear()
+        _oldest = None
+
+
+@task_postrun.connect
+def _flush_if_due(**kwargs):
+    if due():
+        flush()
+
+
+@worker_process_shutdown.connect
+def _flush_on_shutdown(**kwargs):
+    flush()
+
+
+def purge(days=None, batch_size=5000):
+    """Delete rows older than `days` (DELIVERY_LOG_RETENTION_DAYS) in batches. Returns how many."""
+    days = settings.DELIVERY_LOG_RETENTION_DAYS if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted = 0
+    while True:
+        ids = list(DeliveryLog.objects.filter(created_at__lt=cutoff).values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += DeliveryLog.objects.filter(id__in=ids).delete()[0]
+
+
+def daily_stats(days=7, kind=None):
+    """
+    Per day, kind and status: deliveries, segments, average and max latency
+    for the last `days` days, oldest first.
+    """
+    qs = DeliveryLog.objects.filter(created_at__gte=timezone.now() - timedelta(days=days))
+    if kind:
+        qs = qs.filter(kind=kind)
+    return list(
+        qs.annotate(day=TruncDate("created_at"))
+        .values("day", "kind", "status")
+        .annotate(
+            count=Count("id"),
+            segments=Sum("segments"),
+            avg_latency_ms=Avg("latency_ms"),
+            max_latency_ms=Max("latency_ms"),
+        )
+        .order_by("day", "kind", "status")
+    )
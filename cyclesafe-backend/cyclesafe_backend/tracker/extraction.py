@@ -0,0 +1,361 @@
+# tracker/extraction.py
+"""
+Turns a free-text chat message ("My period was from Oct 1 to Oct 5") into
+structured period data.
+
+A local rule-based parser handles the common English phrasings first; the
+LLM is only asked when the parser can't produce a confident answer.
+"""
+import logging
+import re
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from pydantic import BaseModel, Field, ValidationError
+
+from cyclesafe_backend import llm, metrics
+
+logger = logging.getLogger(__name__)
+
+MAX_PERIOD_DAYS = 14
+MIN_CYCLE_LENGTH = 15
+MAX_CYCLE_LENGTH = 60
+MAX_LOOKBACK_DAYS = 366
+
+
+class ExtractionError(Exception):
+    """Raised when the AI output can't be turned into period data."""
+
+    def __init__(self, message, raw_output=""):
+        super().__init__(message)
+        self.raw_output = raw_output
+
+
+# ---------- Vocabulary ----------
+
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+
+WEEKDAYS = {
+    "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3,
+    "friday": 4, "saturday": 5, "sunday": 6,
+}
+
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+}
+
+_MONTH = (
+    r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+    r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\.?"
+)
+_DAY = r"(\d{1,2})(?:st|nd|rd|th)?"
+_YEAR = r"(?:,?\s+(\d{4}))?"
+_NUM = r"(\d{1,2}|" + "|".join(NUMBER_WORDS) + r")"
+_RANGE_SEP = r"\s*(?:-|–|to|until|till|through|thru)\s*"
+
+# "Oct 1-5", "October 1st to 5th, 2025"
+_MONTH_DAY_RANGE = re.compile(rf"\b({_MONTH})\s+{_DAY}{_RANGE_SEP}{_DAY}\b(?!\s*(?:days?|/|{_MONTH})){_YEAR}")
+# "1-5 October", "1st to 5th of Oct"
+_DAY_RANGE_MONTH = re.compile(rf"\b{_DAY}{_RANGE_SEP}{_DAY}\s+(?:of\s+)?({_MONTH}){_YEAR}")
+# "2025-10-01"
+_ISO_DATE = re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")
+# "Oct 1", "October 1st, 2025"
+_MONTH_DAY = re.compile(rf"\b({_MONTH})\s+{_DAY}\b{_YEAR}")
+# "1 Oct", "1st of October 2025"
+_DAY_MONTH = re.compile(rf"\b{_DAY}\s+(?:of\s+)?({_MONTH})(?![a-z]){_YEAR}")
+# "01/10/2025", "1/10"
+_NUMERIC_DATE = re.compile(r"\b(\d{1,2})/(\d{1,2})(?:/(\d{2}|\d{4}))?\b")
+_RELATIVE_WORD = re.compile(r"\b(today|yesterday)\b")
+_AGO = re.compile(rf"\b{_NUM}\s+(day|week)s?\s+ago\b")
+_LAST_WEEKDAY = re.compile(r"\b(?:last|this past)\s+(" + "|".join(WEEKDAYS) + r")\b")
+
+_DURATION = re.compile(rf"\b(?:lasted|lasting|for)\s+(?:about\s+|around\s+)?{_NUM}\s+days?\b")
+_CYCLE_LENGTH = [
+    re.compile(r"\bcycle(?:\s+length)?\s+(?:is|was|of|=|:)?\s*(?:usually\s+|about\s+|around\s+|roughly\s+)?(\d{2})(?:\s*days?)?\b"),
+    re.compile(r"\b(\d{2})[-\s]days?\s+cycles?\b"),
+    re.compile(r"\bevery\s+(\d{2})\s+days\b"),
+]
+
+
+# ---------- Local parser ----------
+
+def _month_number(token: str) -> int:
+    return MONTHS[token.strip(".").lower()[:3]]
+
+
+def _number(token: str) -> int:
+    return NUMBER_WORDS[token] if token in NUMBER_WORDS else int(token)
+
+
+def _safe_date(year: int, month: int, day: int):
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def _past_date(month: int, day: int, today: date):
+    """Most recent occurrence of month/day on or before today."""
+    d = _safe_date(today.year, month, day)
+    if d and d > today:
+        d = _safe_date(today.year - 1, month, day)
+    return d
+
+
+def _resolve(month, day, year, today):
+    """Returns (date, year_was_given) or None."""
+    if year:
+        year = int(year)
+        if year < 100:
+            year += 2000
+        d = _safe_date(year, month, day)
+        return (d, True) if d else None
+    d = _past_date(month, day, today)
+    return (d, False) if d else None
+
+
+def _find_dates(text: str, today: date) -> list | None:
+    """
+    Collect every date mentioned in `text`, in reading order.
+    Returns None when a mention is ambiguous (e.g. "03/04").
+    """
+    found = []  # (start, end, date, year_given)
+
+    def taken(span):
+        return any(s < span[1] and span[0] < e for s, e, *_ in found)
+
+    def add(span, resolved):
+        if resolved and not taken(span):
+            found.append((span[0], span[1], resolved[0], resolved[1]))
+
+    for m in _MONTH_DAY_RANGE.finditer(text):
+        month = _month_number(m.group(1))
+        add((m.start(), m.start(3)), _resolve(month, int(m.group(2)), m.group(4), today))
+        add((m.start(3), m.end()), _resolve(month, int(m.group(3)), m.group(4), today))
+
+    for m in _DAY_RANGE_MONTH.finditer(text):
+        month = _month_number(m.group(3))
+        add((m.start(), m.start(2)), _resolve(month, int(m.group(1)), m.group(4), today))
+        add((m.start(2), m.end()), _resolve(month, int(m.group(2)), m.group(4), today))
+
+    for m in _ISO_DATE.finditer(text):
+        d = _safe_date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+        add(m.span(), (d, True) if d else None)
+
+    for m in _MONTH_DAY.finditer(text):
+        add(m.span(), _resolve(_month_number(m.group(1)), int(m.group(2)), m.group(3), today))
+
+    for m in _DAY_MONTH.finditer(text):
+        add(m.span(), _resolve(_month_number(m.group(2)), int(m.group(1)), m.group(3), today))
+
+    for m in _NUMERIC_DATE.finditer(text):
+        if taken(m.span()):
+            continue
+        first, second = int(m.group(1)), int(m.group(2))
+        if first <= 12 and second <= 12 and first != second:
+            return None  # day/month order is ambiguous
+        day, month = (first, second) if first > 12 or first == second else (second, first)
+        add(m.span(), _resolve(month, day, m.group(3), today))
+
+    for m in _RELATIVE_WORD.finditer(text):
+        offset = 0 if m.group(1) == "today" else 1
+        add(m.span(), (today - timedelta(days=offset), True))
+
+    for m in _AGO.finditer(text):
+        days = _number(m.group(1)) * (7 if m.group(2) == "week" else 1)
+        add(m.span(), (today - timedelta(days=days), True))
+
+    for m in _LAST_WEEKDAY.finditer(text):
+        back = (today.weekday() - WEEKDAYS[m.group(1)]) % 7 or 7
+        add(m.span(), (today - timedelta(days=back), True))
+
+    found.sort(key=lambda f: f[0])
+    return [(d, year_given) for _, _, d, year_given in found]
+
+
+def _find_cycle_length(text: str):
+    """Returns the stated cycle length, None if absent, or False if conflicting."""
+    values = {int(m.group(1)) for p in _CYCLE_LENGTH for m in p.finditer(text)}
+    if not values:
+        return None
+    if len(values) > 1:
+        return False
+    return values.pop()
+
+
+def parse_period_message(message: str, today: date | None = None) -> dict | None:
+    """
+    Rule-based extraction of start_date / end_date / cycle_length.
+
+    Returns a dict shaped like the AI output (ISO date strings) or None when
+    the message isn't one of the phrasings we can read with confidence.
+    """
+    if not message:
+        return None
+    today = today or timezone.localdate()
+    text = message.lower()
+
+    cycle_length = _find_cycle_length(text)
+    if cycle_length is False:
+        return None
+    if cycle_length is not None and not MIN_CYCLE_LENGTH <= cycle_length <= MAX_CYCLE_LENGTH:
+        return None
+
+    # Drop the cycle-length phrase so "30 days" there isn't read as a duration.
+    for pattern in _CYCLE_LENGTH:
+        text = pattern.sub(" ", text)
+
+    dates = _find_dates(text, today)
+    if not dates:
+        return None
+
+    durations = {_number(m.group(1)) for m in _DURATION.finditer(text)}
+
+    if len(dates) == 2 and not durations:
+        (start, _), (end, end_year_given) = dates
+        if end < start and not end_year_given:
+            # No year given: take the first occurrence on or after the start
+            # ("Oct 18 to Oct 22" while the period is ongoing, "Dec 28 to Jan 2").
+            end = _safe_date(start.year, end.month, end.day)
+            if end is not None and end < start:
+                end = _safe_date(start.year + 1, end.month, end.day)
+    elif len(dates) == 1 and len(durations) == 1:
+        start = dates[0][0]
+        end = start + timedelta(days=durations.pop() - 1)
+    else:
+        return None
+
+    if end is None or end < start:
+        return None
+    if (end - start).days > MAX_PERIOD_DAYS:
+        return None
+    if start > today or (today - start).days > MAX_LOOKBACK_DAYS:
+        return None
+
+    return {
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+        "cycle_length": cycle_length,
+    }
+
+
+# ---------- AI fallback ----------
+
+class PeriodExtraction(BaseModel):
+    """Typed schema the AI output must validate against."""
+    start_date: date
+    end_date: date
+    cycle_length: int | None = Field(default=None, ge=MIN_CYCLE_LENGTH, le=MAX_CYCLE_LENGTH)
+
+
+# JSON schema sent as response_format so the model can only answer in this shape
+EXTRACTION_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "period_data",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "start_date": {"type": "string", "description": "YYYY-MM-DD"},
+                "end_date": {"type": "string", "description": "YYYY-MM-DD"},
+                "cycle_length": {"type": ["integer", "null"]},
+            },
+            "required": ["start_date", "end_date", "cycle_length"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+def _validate(raw_output: str) -> dict:
+    """Raises ValidationError if raw_output isn't valid period data."""
+    cleaned_output = (raw_output or "").strip()
+    if cleaned_output.startswith("```"):
+        cleaned_output = cleaned_output.strip("`").removeprefix("json")
+    data = PeriodExtraction.model_validate_json(cleaned_output)
+    return {
+        "start_date": data.start_date.isoformat(),
+        "end_date": data.end_date.isoformat(),
+        "cycle_length": data.cycle_length,
+    }
+
+
+def _describe(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, e['loc'])) or 'output'}: {e['msg']}" for e in error.errors())
+
+
+def _extract_with_ai(user_message: str) -> dict:
+    """
+    Schema-constrained extraction on EXTRACTION_MODEL. Output that still
+    fails validation gets one repair round-trip inside the request.
+    """
+    extract_prompt = f"""
+    You are a women's health assistant. Today is {timezone.localdate().isoformat()}.
+    Extract structured period data from this message:
+    "{user_message}"
+
+    Dates are YYYY-MM-DD. If the user did not mention their cycle length, use null.
+    """
+    messages = [{"role": "system", "content": extract_prompt}]
+
+    metrics.incr("tracker.extraction.ai_calls")
+    raw_output = llm.complete(
+        "tracker.extract", messages,
+        model=settings.EXTRACTION_MODEL, response_format=EXTRACTION_RESPONSE_FORMAT,
+    )
+    try:
+        return _validate(raw_output)
+    except ValidationError as e:
+        metrics.incr("tracker.extraction.parse_failure")
+        error = e
+
+    logger.info("Repairing invalid extraction output: %s", error)
+    repair_messages = messages + [
+        {"role": "assistant", "content": raw_output},
+        {"role": "user", "content": (
+            f"That answer was invalid ({_describe(error)}). "
+            "Reply again with corrected JSON only."
+        )},
+    ]
+    raw_output = llm.complete(
+        "tracker.extract", repair_messages,
+        model=settings.EXTRACTION_MODEL, response_format=EXTRACTION_RESPONSE_FORMAT,
+    )
+    try:
+        data = _validate(raw_output)
+    except ValidationError:
+        metrics.incr("tracker.extraction.repair_failure")
+        raise ExtractionError("AI returned invalid JSON.", raw_output)
+    metrics.incr("tracker.extraction.repair_success")
+    return data
+
+
+def extract_period_data(user_message: str) -> dict:
+    """
+    Local fast path first, GPT only on a miss.
+    Raises ExtractionError if the AI fallback returns unusable output and
+    llm.LLMUnavailable if it can't be reached.
+    """
+    local = parse_period_message(user_message)
+    if local is not None:
+        metrics.incr("tracker.extraction.local_hit")
+        logger.info(
+            "Date extraction served locally (hits=%d, misses=%d)",
+            metrics.get("tracker.extraction.local_hit"),
+            metrics.get("tracker.extraction.local_miss"),
+        )
+        return local
+
+    metrics.incr("tracker.extraction.local_miss")
+    logger.info(
+        "Date extraction falling back to AI (hits=%d, misses=%d)",
+        metrics.get("tracker.extraction.local_hit"),
+        metrics.get("tracker.extraction.local_miss"),
+    )
+    return _extract_with_ai(user_message)
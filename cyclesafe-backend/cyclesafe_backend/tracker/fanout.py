@@ -0,0 +1,175 @@
+# tracker/fanout.py
+"""
+Chunked fan-out for the bulk SMS beat jobs.
+
+A FanoutRun splits the recipients into FanoutChunks of SMS_FANOUT_CHUNK_SIZE
+user ids. Each chunk is one Celery task (tracker.tasks.send_fanout_chunk)
+that loads its recipients in a single query and sends their messages
+itself, instead of queueing one send_sms_reminder per user.
+
+Chunks store a cursor (the last user id handled), so a retried or resumed
+chunk carries on where it stopped without re-sending.
+"""
+import logging
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db.models import F, Max, Min, Q
+from django.utils import timezone
+
+from users.models import UserProfile
+from . import messages, phases, windows
+from .models import CyclePrediction, FanoutChunk, FanoutRun
+
+logger = logging.getLogger(__name__)
+
+
+def sms_profiles():
+    return UserProfile.objects.filter(allow_sms=True, phone_number__isnull=False).exclude(phone_number="")
+
+
+def due_predictions(days, minutes=None):
+    """
+    Predictions with a period or ovulation on one of `days`, for users who
+    accept SMS; with minutes=(lo, hi) only users whose reminder slot is in
+    that range of UTC minutes (tracker/windows.py).
+    """
+    if isinstance(days, (date, str)):
+        days = [days]
+    qs = (
+        CyclePrediction.objects
+        .filter(Q(next_period_date__in=days) | Q(ovulation_date__in=days))
+        .filter(user__profile__allow_sms=True, user__profile__phone_number__isnull=False)
+        .exclude(user__profile__phone_number="")
+    )
+    if minutes is not None:
+        lo, hi = minutes
+        qs = qs.filter(user__profile__reminder_minute_utc__gte=lo, user__profile__reminder_minute_utc__lt=hi)
+    return qs
+
+
+def reminders_due(prediction, day):
+    """(kind, text) for each reminder `prediction` needs when reminding on behalf of `day`."""
+    user = prediction.user
+    if prediction.next_period_date == day:
+        yield "period", messages.period_reminder(user)
+    if prediction.ovulation_date == day:
+        yield "ovulation", messages.ovulation_reminder(user)
+
+
+def phase_tips(profiles, tips, day):
+    """
+    Yield (profile, text): each user's tip for their phase on `day`, from
+    `tips` (phase -> tip). Profiles should be loaded with
+    select_related("user__cycle_prediction"); phases are classified per
+    batch in one NumPy pass.
+    """
+    profiles = list(profiles)
+    for profile, phase in zip(profiles, phases.for_users([p.user for p in profiles], day)):
+        yield profile, messages.weekly_tip(profile.user, tips[phase], phase)
+
+
+def _recipients(run):
+    if run.kind == "weekly_tip":
+        return sms_profiles()
+    if "date" in run.payload:  # runs created before sweeps were time-sliced
+        return due_predictions(run.payload["date"])
+    return due_predictions(run.payload["days"], (run.payload["lo"], run.payload["hi"]))
+
+
+def create_run(kind, payload, chunk_size=None):
+    """Create a FanoutRun and its chunks; returns the run."""
+    chunk_size = chunk_size or settings.SMS_FANOUT_CHUNK_SIZE
+    run = FanoutRun.objects.create(kind=kind, payload=payload)
+    bounds = _recipients(run).aggregate(lo=Min("user_id"), hi=Max("user_id"))
+    if bounds["lo"] is None:
+        run.status = "done"
+        run.finished_at = timezone.now()
+        run.save(update_fields=["status", "finished_at"])
+        return run
+
+    FanoutChunk.objects.bulk_create([
+        FanoutChunk(run=run, lo_id=lo, hi_id=lo + chunk_size)
+        for lo in range(bounds["lo"], bounds["hi"] + 1, chunk_size)
+    ])
+    run.total_chunks = run.chunks.count()
+    run.save(update_fields=["total_chunks"])
+    return run
+
+
+def chunk_messages(chunk):
+    """
+    Yield (user_id, phone, kind, text) for the chunk's recipients after its cursor,
+    ordered by user id, from one query.
+    """
+    run = chunk.run
+    lo = chunk.lo_id if chunk.cursor is None else max(chunk.lo_id, chunk.cursor + 1)
+    rows = _recipients(run).filter(user_id__gte=lo, user_id__lt=chunk.hi_id).order_by("user_id")
+
+    if run.kind == "weekly_tip":
+        if "tip" in run.payload:  # runs created before phase-targeted tips
+            tip = run.payload["tip"]
+            for profile in rows.select_related("user"):
+                yield profile.user_id, profile.phone_number, "weekly_tip", messages.weekly_tip(profile.user, tip)
+            return
+        day = date.fromisoformat(run.payload["day"])
+        profiles = rows.select_related("user__cycle_prediction")
+        for profile, text in phase_tips(profiles, run.payload["tips"], day):
+            yield profile.user_id, profile.phone_number, "weekly_tip", text
+        return
+
+    # daily_reminders runs are no longer created (the sweep writes ScheduledReminders);
+    # this finishes runs created before that change when they are resumed
+    fixed_day = date.fromisoformat(run.payload["date"]) if "date" in run.payload else None
+    at = windows.parse(run.payload.get("at"))
+    for prediction in rows.select_related("user__profile"):
+        profile = prediction.user.profile
+        day = fixed_day or windows.local_date(profile, at) + timedelta(days=2)
+        for kind, text in reminders_due(prediction, day):
+            yield prediction.user_id, profile.phone_number, kind, text
+
+
+def start_chunk(chunk):
+    chunk.status = "running"
+    chunk.attempts += 1
+    chunk.save(update_fields=["status", "attempts", "updated_at"])
+
+
+def record_progress(chunk, sent, failed, cursor):
+    """Persist the chunk's cursor and add this attempt's counts to the chunk and run."""
+    FanoutChunk.objects.filter(id=chunk.id).update(
+        cursor=cursor, sent=F("sent") + sent, failed=F("failed") + failed, updated_at=timezone.now(),
+    )
+    FanoutRun.objects.filter(id=chunk.run_id).update(sent=F("sent") + sent, failed=F("failed") + failed)
+    chunk.cursor = cursor
+
+
+def close_chunk(chunk, status, error=""):
+    """Mark the chunk done/failed and finish the run once every chunk is closed."""
+    FanoutChunk.objects.filter(id=chunk.id).update(status=status, error=error, updated_at=timezone.now())
+    counter = "done_chunks" if status == "done" else "failed_chunks"
+    FanoutRun.objects.filter(id=chunk.run_id).update(**{counter: F(counter) + 1})
+
+    run = FanoutRun.objects.get(id=chunk.run_id)
+    logger.info(
+        "Fan-out %s %s: %d/%d chunks done, %d failed, %d messages sent",
+        run.kind, run.id, run.done_chunks, run.total_chunks, run.failed_chunks, run.sent,
+    )
+    if run.done_chunks + run.failed_chunks >= run.total_chunks:
+        FanoutRun.objects.filter(id=run.id, finished_at__isnull=True).update(
+            status="failed" if run.failed_chunks else "done", finished_at=timezone.now(),
+        )
+
+
+def reopen_chunks(run):
+    """
+    Put a run's unfinished chunks back to pending (failed ones keep their
+    cursor) and return their ids for re-dispatch.
+    """
+    failed = run.chunks.filter(status="failed").count()
+    ids = list(run.chunks.exclude(status="done").values_list("id", flat=True))
+    run.chunks.filter(id__in=ids).update(status="pending", error="")
+    FanoutRun.objects.filter(id=run.id).update(
+        status="running", finished_at=None, failed_chunks=F("failed_chunks") - failed,
+    )
+    return ids
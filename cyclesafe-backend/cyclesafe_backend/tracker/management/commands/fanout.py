@@ -0,0 +1,29 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from tracker.models import FanoutRun
+from tracker.tasks import resume_fanout
+
+
+class Command(BaseCommand):
+    help = "Show progress of recent SMS fan-out runs, or resume one that did not finish."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=10, help="Number of recent runs to list.")
+        parser.add_argument("--resume", metavar="RUN_ID", help="Re-dispatch the unfinished chunks of this run.")
+
+    def handle(self, *args, **options):
+        if options["resume"]:
+            try:
+                message = resume_fanout(options["resume"])
+            except (FanoutRun.DoesNotExist, ValidationError):
+                raise CommandError(f"Fan-out run {options['resume']} not found.")
+            self.stdout.write(self.style.SUCCESS(message))
+            return
+
+        for run in FanoutRun.objects.order_by("-created_at")[: options["limit"]]:
+            self.stdout.write(
+                f"{run.id}  {run.kind:<16} {run.status:<8} "
+                f"{run.done_chunks}/{run.total_chunks} chunks ({run.progress:.0%}), "
+                f"{run.failed_chunks} failed chunks, {run.sent} sent, {run.failed} failed messages"
+            )
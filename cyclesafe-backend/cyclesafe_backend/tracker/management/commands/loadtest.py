@@ -0,0 +1,60 @@
+import json
+
+from celery import current_app
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from cyclesafe_backend import loadtest
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the tracker/search endpoints and SMS tasks offline "
+        "(fake LLM, in-memory SMS, throwaway test database)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scenario", action="append", choices=sorted(loadtest.SCENARIOS),
+            help="Scenario to run (repeatable). Defaults to all of them.",
+        )
+        parser.add_argument("--users", type=int, default=200, help="Seeded users.")
+        parser.add_argument("--requests", type=int, default=200, help="Operations per scenario.")
+        parser.add_argument("--concurrency", type=int, default=8, help="Worker threads per scenario.")
+        parser.add_argument("--sweeps", type=int, default=3, help="Runs of each beat sweep task.")
+        parser.add_argument("--latency-ms", type=float, default=200, help="Fake LLM base latency.")
+        parser.add_argument("--jitter-ms", type=float, default=100, help="Fake LLM latency jitter.")
+        parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+
+    def handle(self, *args, **options):
+        if options["users"] < 1 or options["requests"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--users, --requests and --concurrency must be positive.")
+        names = options["scenario"] or list(loadtest.SCENARIOS)
+
+        fakes = override_settings(
+            LLM_BACKEND="fake",
+            FAKE_LLM_LATENCY_MS=options["latency_ms"],
+            FAKE_LLM_JITTER_MS=options["jitter_ms"],
+            SMS_BACKEND="memory",
+        )
+        eager = current_app.conf.task_always_eager
+        setup_test_environment()
+        old_name = loadtest.use_test_database()
+        try:
+            with fakes:
+                current_app.conf.task_always_eager = True
+                users = loadtest.seed_users(options["users"])
+                results = loadtest.run_scenarios(
+                    names, users, options["requests"], options["concurrency"], sweeps=options["sweeps"],
+                )
+        finally:
+            current_app.conf.task_always_eager = eager
+            loadtest.drop_test_database(old_name)
+            teardown_test_environment()
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            self.stdout.write(loadtest.format_table(results))
+        errors = sum(r["errors"] for r in results)
+        self.stdout.write(self.style.SUCCESS(f"✅ Load test finished ({errors} failed operations)."))
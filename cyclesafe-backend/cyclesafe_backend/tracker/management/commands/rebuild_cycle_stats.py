@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from tracker.stats import BULK_BATCH_SIZE, rebuild_all_stats
+
+
+class Command(BaseCommand):
+    help = "Backfill the per-user CycleStats rows from existing cycle records."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int, default=BULK_BATCH_SIZE,
+            help="Number of users written per bulk upsert.",
+        )
+
+    def handle(self, *args, **options):
+        written = rebuild_all_stats(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"✅ Rebuilt cycle stats for {written} users."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from tracker.batch import DEFAULT_CHUNK_SIZE, materialize_predictions
+
+
+class Command(BaseCommand):
+    help = "Recompute every user's upcoming cycle windows into the CyclePrediction table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+            help="Number of user ids loaded per vectorized pass.",
+        )
+
+    def handle(self, *args, **options):
+        written = materialize_predictions(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"✅ Rebuilt predictions for {written} users."))
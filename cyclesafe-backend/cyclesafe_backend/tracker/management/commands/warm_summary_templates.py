@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from tracker.summaries import DURATION_BUCKETS, TEMPLATE_CYCLE_RANGE, get_summary_template
+
+
+class Command(BaseCommand):
+    help = "Pre-generate cached cycle summary templates for the common cycle shapes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--min-cycle", type=int, default=24)
+        parser.add_argument("--max-cycle", type=int, default=35)
+        parser.add_argument(
+            "--refresh", action="store_true",
+            help="Regenerate templates even if they are already cached.",
+        )
+
+    def handle(self, *args, **options):
+        lengths = [
+            n for n in range(options["min_cycle"], options["max_cycle"] + 1) if n in TEMPLATE_CYCLE_RANGE
+        ]
+        warmed = failed = 0
+        for cycle_length in lengths:
+            for _, bucket in DURATION_BUCKETS:
+                if get_summary_template(cycle_length, bucket, refresh=options["refresh"]):
+                    warmed += 1
+                else:
+                    failed += 1
+                    self.stderr.write(f"⚠️ No template for {cycle_length} days / {bucket}")
+        self.stdout.write(self.style.SUCCESS(f"✅ Warmed {warmed} summary templates ({failed} failed)."))
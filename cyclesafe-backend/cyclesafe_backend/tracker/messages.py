@@ -0,0 +1,97 @@
+# tracker/messages.py
+"""SMS texts shared by the per-user tasks and the chunked fan-out."""
+import os
+
+BRAND_NAME = os.getenv("BRAND_NAME", "CycleSafe")
+
+WEEKLY_TIPS = [
+    "💧 Stay hydrated! Drinking enough water supports hormone balance.",
+    "🌸 Gentle exercise can reduce cramps and improve mood.",
+    "🍎 Include iron-rich foods after your period to replenish energy.",
+    "🧘‍♀️ Mindfulness and rest help regulate your cycle.",
+    "💤 Prioritize sleep — it supports hormonal health.",
+]
+
+# Weekly tips by the phase the user is in (tracker/phases.py); users without
+# cycle records get a general tip.
+PHASE_TIPS = {
+    "menstrual": [
+        "🍎 Include iron-rich foods like beans and leafy greens while you bleed.",
+        "🔥 A warm compress and gentle stretching can ease cramps.",
+        "💤 Your energy may be lower this week. Rest is productive too.",
+    ],
+    "follicular": [
+        "🌱 Energy usually rises after your period. A good week to try new exercise.",
+        "🥗 Fresh vegetables and protein support your body as estrogen rises.",
+        "🧠 Many people feel sharper now. Plan the tasks that need focus.",
+    ],
+    "ovulation": [
+        "🌼 You are in your fertile window. Plan protection or conception accordingly.",
+        "💧 Stay hydrated. Some people notice mild one-sided pain around ovulation.",
+        "💕 Confidence and energy often peak now. Enjoy it and listen to your body.",
+    ],
+    "luteal": [
+        "🍫 Cravings are common before your period. Complex carbs help keep energy steady.",
+        "🧘‍♀️ Mood changes can come before your period. Gentle movement and sleep help.",
+        "🧂 Cutting back on salt and caffeine can reduce bloating this week.",
+    ],
+    "unknown": WEEKLY_TIPS,
+}
+
+
+def first_name(user):
+    return user.first_name or user.username
+
+
+def branded(message):
+    return f"💗 [{BRAND_NAME}]\n{message}"
+
+
+def period_reminder(user):
+    return (
+        f"Hey {first_name(user)}, your period is expected in 2 days 💗\n"
+        "Remember to rest, stay hydrated, and keep your pads ready!"
+    )
+
+
+def ovulation_reminder(user):
+    return (
+        f"Hey {first_name(user)}, your ovulation is in 2 days 🌼\n"
+        "This is your fertile phase — take care and listen to your body 💕"
+    )
+
+
+def welcome(name, summary):
+    return (
+        f"🌸 Welcome to {BRAND_NAME}, {name}!\n\n"
+        "We’re excited to support you in understanding your cycle better.\n\n"
+        f"{summary}\n\n"
+        "We’ll send helpful reminders before your next period and ovulation. 💕"
+    )
+
+
+def summary_update(name, summary):
+    return f"Hey {name}, here’s your updated cycle summary 🌼\n\n{summary}"
+
+
+COMPOSERS = {
+    "welcome": welcome,
+    "summary": summary_update,
+}
+
+
+def compose(kind, name, text):
+    """The SMS text for a delivery: welcome / summary wrap `text`, other kinds send it as is."""
+    composer = COMPOSERS.get(kind)
+    return composer(name, text) if composer else text
+
+
+def weekly_tip(user, tip, phase=None):
+    if phase in PHASE_TIPS and phase != "unknown":
+        intro = f"you’re in your {phase} phase, here’s a tip for it"
+    else:
+        intro = "here’s your health reminder"
+    return (
+        f"💗 [{BRAND_NAME} Weekly Tip]\n"
+        f"Hi {first_name(user)}, {intro}:\n\n{tip}"
+    )
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0003_cyclesummary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CyclePrediction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('avg_cycle', models.IntegerField(default=28)),
+                ('period_start', models.DateField()),
+                ('period_end', models.DateField()),
+                ('next_period_date', models.DateField(db_index=True)),
+                ('ovulation_date', models.DateField(db_index=True)),
+                ('fertile_start', models.DateField()),
+                ('fertile_end', models.DateField()),
+                ('follicular_start', models.DateField()),
+                ('follicular_end', models.DateField()),
+                ('luteal_start', models.DateField()),
+                ('luteal_end', models.DateField()),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='cycle_prediction', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
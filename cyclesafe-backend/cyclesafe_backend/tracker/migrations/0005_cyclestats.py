@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0004_cycleprediction'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CycleStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('record_count', models.IntegerField(default=0)),
+                ('last_start_date', models.DateField(blank=True, null=True)),
+                ('recent_start_dates', models.JSONField(default=list)),
+                ('recent_cycle_lengths', models.JSONField(default=list)),
+                ('interval_count', models.IntegerField(default=0)),
+                ('interval_mean', models.FloatField(default=0)),
+                ('interval_m2', models.FloatField(default=0)),
+                ('regularity_score', models.FloatField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='cycle_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
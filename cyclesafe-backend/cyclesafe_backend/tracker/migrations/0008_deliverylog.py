@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:50
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0007_scheduledreminder'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('welcome', 'Welcome'), ('summary', 'Summary'), ('period', 'Period'), ('ovulation', 'Ovulation'), ('weekly_tip', 'Weekly tip'), ('sms', 'Other')], max_length=12)),
+                ('status', models.CharField(choices=[('sent', 'Sent'), ('failed', 'Failed'), ('rate_limited', 'Rate limited'), ('skipped', 'Skipped')], max_length=12)),
+                ('provider_sid', models.CharField(blank=True, max_length=64)),
+                ('segments', models.PositiveSmallIntegerField(default=0)),
+                ('latency_ms', models.PositiveIntegerField(default=0)),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='deliveries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at'], name='tracker_del_created_5c2bd6_idx'), models.Index(fields=['kind', 'created_at'], name='tracker_del_kind_b22d18_idx'), models.Index(fields=['user', 'created_at'], name='tracker_del_user_id_511685_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Period and ovulation reminders are sent by the daily sweep only; cancel the
+# ScheduledReminder copies so nobody gets them twice.
+
+from django.db import migrations
+
+
+def cancel_cycle_reminders(apps, schema_editor):
+    ScheduledReminder = apps.get_model("tracker", "ScheduledReminder")
+    ScheduledReminder.objects.filter(status="pending", kind__in=["period", "ovulation"]).update(status="cancelled")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0008_deliverylog'),
+    ]
+
+    operations = [
+        migrations.RunPython(cancel_cycle_reminders, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
-from datetime import timedelta
+from datetime import date, timedelta
+import uuid
 
 class CycleRecord(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -18,14 +20,11 @@ class CycleRecord(models.Model):
 
     @staticmethod
     def get_average_cycle_length(user):
-        """Get user’s average cycle from their last 3 cycles."""
-        records = CycleRecord.objects.filter(user=user).order_by('-created_at')[:3]
-        if not records.exists():
+        """Get user’s average cycle from their last 3 cycles (read from CycleStats)."""
+        stats = CycleStats.objects.filter(user=user).first()
+        if stats is None:
             return 28
-        lengths = [r.cycle_length for r in records if r.cycle_length]
-        if not lengths:
-            return 28
-        return round(sum(lengths) / len(lengths))
+        return stats.average_cycle_length
 
     def calculate_predictions(self):
         """Predict all cycle windows and biological phases."""
@@ -56,3 +55,245 @@ class CycleRecord(models.Model):
 
     def __str__(self):
         return f"{self.user.username} | {self.start_date} → {self.end_date} | {self.cycle_length} days"
+
+
+class CycleSummary(models.Model):
+    """AI cycle summary generated in the background (async summary mode)."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="cycle_summaries")
+    record = models.ForeignKey(CycleRecord, on_delete=models.CASCADE, related_name="summaries")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    message = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user.username} | summary {self.id} ({self.status})"
+
+
+class CyclePrediction(models.Model):
+    """
+    Materialized upcoming cycle windows, one row per user.
+    Written in bulk by tracker.batch.materialize_predictions and refreshed
+    for a single user whenever their CycleRecords change (tracker.signals).
+    The indexed next_period_date / ovulation_date drive the reminder sweep.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="cycle_prediction")
+    avg_cycle = models.IntegerField(default=28)
+    period_start = models.DateField()
+    period_end = models.DateField()
+    next_period_date = models.DateField(db_index=True)
+    ovulation_date = models.DateField(db_index=True)
+    fertile_start = models.DateField()
+    fertile_end = models.DateField()
+    follicular_start = models.DateField()
+    follicular_end = models.DateField()
+    luteal_start = models.DateField()
+    luteal_end = models.DateField()
+    computed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id} | next period {self.next_period_date} | ovulation {self.ovulation_date}"
+
+
+class CycleStats(models.Model):
+    """
+    Per-user cycle statistics, kept current by tracker.stats whenever a
+    CycleRecord is saved or deleted so callers never re-aggregate history.
+    """
+    RECENT_WINDOW = 3
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="cycle_stats")
+    record_count = models.IntegerField(default=0)
+    last_start_date = models.DateField(blank=True, null=True)
+    # Newest first: start dates by start_date, cycle lengths by created_at
+    recent_start_dates = models.JSONField(default=list)
+    recent_cycle_lengths = models.JSONField(default=list)
+    # Running mean / sum of squared deviations (Welford) of start-to-start gaps
+    interval_count = models.IntegerField(default=0)
+    interval_mean = models.FloatField(default=0)
+    interval_m2 = models.FloatField(default=0)
+    # 1.0 = perfectly regular, 0.0 = gaps vary by 10+ days
+    regularity_score = models.FloatField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def average_cycle_length(self):
+        """Same rule as the old query: mean of the last 3 recorded cycle lengths."""
+        lengths = [n for n in self.recent_cycle_lengths if n]
+        if not lengths:
+            return 28
+        return round(sum(lengths) / len(lengths))
+
+    @property
+    def interval_variance(self):
+        if self.interval_count < 2:
+            return 0.0
+        return self.interval_m2 / (self.interval_count - 1)
+
+    def recent_interval_average(self):
+        """Mean start-to-start gap over the last 3 periods, or None without enough history."""
+        starts = [date.fromisoformat(d) for d in self.recent_start_dates]
+        if len(starts) < 2:
+            return None
+        diffs = [(a - b).days for a, b in zip(starts, starts[1:]) if (a - b).days > 0]
+        return round(sum(diffs) / len(diffs)) if diffs else None
+
+    def __str__(self):
+        return f"{self.user.username} | {self.record_count} records | avg {self.average_cycle_length} days"
+
+
+class FanoutRun(models.Model):
+    """
+    One bulk SMS send (weekly tip or daily reminders) split into FanoutChunks
+    by user-id range. Counters are updated as chunks finish.
+    """
+    KIND_CHOICES = [
+        ('weekly_tip', 'Weekly health tip'),
+        ('daily_reminders', 'Daily reminders'),
+    ]
+    STATUS_CHOICES = [
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    payload = models.JSONField(default=dict, blank=True)  # e.g. the tip text or reminder date
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='running')
+    total_chunks = models.IntegerField(default=0)
+    done_chunks = models.IntegerField(default=0)
+    failed_chunks = models.IntegerField(default=0)
+    sent = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    @property
+    def progress(self):
+        if not self.total_chunks:
+            return 1.0
+        return (self.done_chunks + self.failed_chunks) / self.total_chunks
+
+    def __str__(self):
+        return f"{self.kind} {self.id} | {self.done_chunks}/{self.total_chunks} chunks ({self.status})"
+
+
+class FanoutChunk(models.Model):
+    """Recipients with lo_id <= user_id < hi_id of a FanoutRun."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    run = models.ForeignKey(FanoutRun, on_delete=models.CASCADE, related_name="chunks")
+    lo_id = models.BigIntegerField()
+    hi_id = models.BigIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    cursor = models.BigIntegerField(blank=True, null=True)  # last user id handled; a retry resumes after it
+    sent = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    attempts = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["run", "status"])]
+
+    def __str__(self):
+        return f"{self.run_id} [{self.lo_id}, {self.hi_id}) ({self.status})"
+
+
+class ScheduledReminder(models.Model):
+    """
+    A period / ovulation SMS, at most one per user and kind.
+    The daily reminder sweep writes it at the user's slot two days before the
+    event; the next event overwrites the row.
+    Due rows are claimed and sent by tracker.tasks.dispatch_due_reminders.
+    """
+    KIND_CHOICES = [
+        ('period', 'Period'),
+        ('ovulation', 'Ovulation'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="scheduled_reminders")
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    send_at = models.DateTimeField()
+    message = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "kind"], name="unique_reminder_per_user_kind"),
+        ]
+        indexes = [models.Index(fields=["send_at", "status"])]
+
+    def __str__(self):
+        return f"{self.user_id} | {self.kind} at {self.send_at} ({self.status})"
+
+
+class DeliveryLog(models.Model):
+    """
+    One SMS delivery attempt. Written in batches by tracker/delivery.py and
+    purged after DELIVERY_LOG_RETENTION_DAYS; the send tasks don't store
+    results in the Celery backend.
+    """
+    KIND_CHOICES = [
+        ('welcome', 'Welcome'),
+        ('summary', 'Summary'),
+        ('period', 'Period'),
+        ('ovulation', 'Ovulation'),
+        ('weekly_tip', 'Weekly tip'),
+        ('sms', 'Other'),
+    ]
+    STATUS_CHOICES = [
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+        ('rate_limited', 'Rate limited'),
+        ('skipped', 'Skipped'),
+    ]
+
+    # No FK constraint: log rows are append-only and outlive deleted users until purged
+    user = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False,
+        blank=True, null=True, related_name="deliveries",
+    )
+    kind = models.CharField(max_length=12, choices=KIND_CHOICES)
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES)
+    provider_sid = models.CharField(max_length=64, blank=True)
+    segments = models.PositiveSmallIntegerField(default=0)
+    latency_ms = models.PositiveIntegerField(default=0)
+    error = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at"]),
+            models.Index(fields=["kind", "created_at"]),
+            models.Index(fields=["user", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} | {self.kind} {self.status} ({self.segments} segments)"
@@ -0,0 +1,62 @@
+# tracker/phases.py
+"""
+Vectorized menstrual-phase classification for many users at once.
+
+Works on the materialized CyclePrediction columns (latest period, average
+cycle), so a batch of users is classified in one NumPy pass with no
+per-user queries. Cycles are projected forward by the average length when
+the last logged period is more than a cycle old. Phases follow
+CycleRecord.calculate_predictions, with "ovulation" covering the fertile
+window (ovulation - 5 to ovulation + 1 days) so it lasts long enough for a
+weekly message to land in it.
+"""
+import numpy as np
+
+from .models import CyclePrediction
+
+PHASES = np.array(["menstrual", "follicular", "ovulation", "luteal"], dtype=object)
+UNKNOWN = "unknown"  # no cycle records yet
+
+
+def classify(period_start, period_end, avg_cycle, today):
+    """
+    Phase name of each user on `today`. `period_start` / `period_end` are
+    datetime64[D] arrays of the latest logged period, `avg_cycle` an int array.
+    """
+    cycle = np.maximum(np.asarray(avg_cycle, dtype=np.int64), 1)
+    period_start = np.asarray(period_start, dtype="datetime64[D]")
+    period_end = np.asarray(period_end, dtype="datetime64[D]")
+
+    elapsed = (np.datetime64(today, "D") - period_start).astype(np.int64)
+    day = np.mod(elapsed, cycle)  # day of the current (projected) cycle, 0 = first day of bleeding
+    bleeding = np.clip((period_end - period_start).astype(np.int64) + 1, 1, cycle)
+    ovulation = cycle - 14
+
+    codes = np.full(len(day), 3)  # luteal
+    codes[day < ovulation - 5] = 1  # follicular
+    codes[(day >= ovulation - 5) & (day <= ovulation + 1)] = 2  # fertile window
+    codes[day < bleeding] = 0  # menstrual
+    return PHASES[codes]
+
+
+def _prediction(user):
+    try:
+        return user.cycle_prediction
+    except CyclePrediction.DoesNotExist:
+        return None
+
+
+def for_users(users, today):
+    """
+    Phase of each user on `today` (UNKNOWN without a CyclePrediction). Load
+    the users with select_related("cycle_prediction") to avoid a query each.
+    """
+    predictions = [_prediction(user) for user in users]
+    known = [p for p in predictions if p is not None]
+    phases = iter(classify(
+        [p.period_start for p in known],
+        [p.period_end for p in known],
+        [p.avg_cycle for p in known],
+        today,
+    )) if known else iter(())
+    return [next(phases) if p is not None else UNKNOWN for p in predictions]
@@ -0,0 +1,72 @@
+# tracker/recipients.py
+"""
+Pre-resolved SMS recipients for the delivery pipeline (tracker.tasks.deliver_sms).
+
+Callers that already have the user and profile loaded pack what a send
+needs into a small JSON payload (normalized number, name, opt-in snapshot),
+so the task doesn't read User and UserProfile again. Consent is re-checked
+once at send time through a cached lookup, kept for SMS_CONSENT_CACHE_TTL
+seconds, refreshed when the profile is saved and dropped when it is
+deleted (tracker.signals).
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from users.models import UserProfile
+
+
+def normalize_phone(phone: str) -> str | None:
+    if not phone:
+        return None
+    p = phone.strip().replace(" ", "").replace("-", "")
+    if p.startswith("00"):
+        p = "+" + p[2:]
+    if not p.startswith("+"):
+        p = "+" + p
+    digits = ''.join(ch for ch in p if ch.isdigit())
+    return p if len(digits) >= 9 else None
+
+
+def resolve(user, profile):
+    """The recipient payload for `user`, or None if they don't accept SMS or have no valid number."""
+    if profile is None or not profile.allow_sms:
+        return None
+    to = normalize_phone(profile.phone_number)
+    if to is None:
+        return None
+    return {"user_id": user.id, "to": to, "name": user.first_name or user.username, "allow_sms": True}
+
+
+def _key(user_id):
+    return f"sms_consent:{user_id}"
+
+
+def consent(user_id):
+    """(allow_sms, normalized number) for the user, from the cache when possible."""
+    cached = cache.get(_key(user_id))
+    if cached is None:
+        row = UserProfile.objects.filter(user_id=user_id).values_list("allow_sms", "phone_number").first()
+        cached = (bool(row and row[0]), normalize_phone(row[1]) if row else None)
+        cache.set(_key(user_id), cached, settings.SMS_CONSENT_CACHE_TTL)
+    return tuple(cached)
+
+
+def remember(profile):
+    """Cache the consent of a profile that was just saved."""
+    value = (bool(profile.allow_sms), normalize_phone(profile.phone_number))
+    cache.set(_key(profile.user_id), value, settings.SMS_CONSENT_CACHE_TTL)
+
+
+def forget(user_id):
+    cache.delete(_key(user_id))
+
+
+def current_number(recipient):
+    """
+    Where to send `recipient` now: None if they opted out (or lost their
+    number) since the payload was built; a number changed since then wins.
+    """
+    if not recipient.get("allow_sms"):
+        return None
+    allowed, phone = consent(recipient["user_id"])
+    return phone if allowed else None
@@ -0,0 +1,129 @@
+# tracker/reminders.py
+"""
+Durable reminder scheduling on the ScheduledReminder table.
+
+Reminders used to be queued weeks ahead with apply_async(eta=...), where
+they sat unacked in Redis and could not be cancelled. Now scheduling is an
+upsert per (user, kind) - the daily sweep writes each user's period and
+ovulation reminders at their slot - and a once-a-minute beat task claims
+the due rows in batches (SELECT ... FOR UPDATE SKIP LOCKED where the
+database supports it) and hands each batch to one send task.
+
+A claimed row is "sending" until it is marked sent/failed; claims older
+than SCHEDULED_REMINDER_LEASE seconds (a worker died mid-batch) are claimed
+again.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import ScheduledReminder
+
+logger = logging.getLogger(__name__)
+
+
+def schedule(user_id, kind, send_at, message):
+    """Create or replace the user's reminder of this kind."""
+    reminder, _ = ScheduledReminder.objects.update_or_create(
+        user_id=user_id,
+        kind=kind,
+        defaults={
+            "send_at": send_at,
+            "message": message,
+            "status": "pending",
+            "attempts": 0,
+            "claimed_at": None,
+            "sent_at": None,
+            "error": "",
+        },
+    )
+    return reminder
+
+
+def schedule_many(items):
+    """
+    Upsert (user_id, kind, send_at, message) reminders in two queries.
+    A reminder already scheduled for the same time is left as it is, so a
+    sweep that runs twice never sends twice. Returns how many were written.
+    """
+    items = list(items)
+    if not items:
+        return 0
+    existing = {
+        (user_id, kind): send_at
+        for user_id, kind, send_at in ScheduledReminder.objects
+        .filter(user_id__in={item[0] for item in items}, kind__in={item[1] for item in items})
+        .values_list("user_id", "kind", "send_at")
+    }
+    rows = [
+        ScheduledReminder(user_id=user_id, kind=kind, send_at=send_at, message=message, status="pending")
+        for user_id, kind, send_at, message in items
+        if existing.get((user_id, kind)) != send_at
+    ]
+    ScheduledReminder.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["user", "kind"],
+        update_fields=["send_at", "message", "status", "attempts", "claimed_at", "sent_at", "error", "updated_at"],
+    )
+    return len(rows)
+
+
+def cancel(user_id, kind=None):
+    """Cancel the user's pending reminders (of one kind or a tuple of kinds, or all). Returns how many."""
+    qs = ScheduledReminder.objects.filter(user_id=user_id, status="pending")
+    if isinstance(kind, (list, tuple)):
+        qs = qs.filter(kind__in=kind)
+    elif kind is not None:
+        qs = qs.filter(kind=kind)
+    return qs.update(status="cancelled")
+
+
+def claim_due(batch_size, now=None):
+    """
+    Mark up to `batch_size` due reminders as "sending" and return their ids.
+    Concurrent dispatchers never get the same row.
+    """
+    now = now or timezone.now()
+    stale = now - timedelta(seconds=settings.SCHEDULED_REMINDER_LEASE)
+    with transaction.atomic():
+        ids = list(
+            ScheduledReminder.objects
+            .select_for_update(skip_locked=True)
+            .filter(send_at__lte=now)
+            .filter(Q(status="pending") | Q(status="sending", claimed_at__lt=stale))
+            .order_by("send_at")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if ids:
+            ScheduledReminder.objects.filter(id__in=ids).update(
+                status="sending", claimed_at=now, attempts=F("attempts") + 1,
+            )
+    return ids
+
+
+def claimed(ids):
+    """The claimed reminders in `ids`, with user and profile, in one query."""
+    return ScheduledReminder.objects.filter(id__in=ids, status="sending").select_related("user__profile")
+
+
+def mark_sent(reminder):
+    ScheduledReminder.objects.filter(id=reminder.id).update(status="sent", sent_at=timezone.now(), error="")
+
+
+def mark_failed(reminder, error, status="failed"):
+    ScheduledReminder.objects.filter(id=reminder.id).update(status=status, error=str(error)[:1000])
+
+
+def requeue(reminder, delay_seconds, error=""):
+    """Put a rate-limited reminder back for a later dispatcher pass."""
+    ScheduledReminder.objects.filter(id=reminder.id).update(
+        status="pending",
+        send_at=timezone.now() + timedelta(seconds=delay_seconds),
+        claimed_at=None,
+        error=str(error)[:1000],
+    )
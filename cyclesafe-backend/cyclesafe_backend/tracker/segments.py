@@ -0,0 +1,106 @@
+# tracker/segments.py
+"""
+SMS encoding and segment math.
+
+A message that only uses the GSM-7 alphabet fits 160 characters in one
+segment (153 per segment once it is concatenated); a single character
+outside it (an emoji, a curly quote) switches the whole message to UCS-2,
+with 70 / 67 UTF-16 units per segment. Providers bill per segment.
+"""
+import math
+import re
+
+GSM7_BASIC = set(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+GSM7_EXTENDED = set("^{}\\[~]|€\f")  # sent as escape + char: 2 septets
+
+LIMITS = {
+    # encoding: (single segment, per segment when concatenated)
+    "GSM-7": (160, 153),
+    "UCS-2": (70, 67),
+}
+
+# Compaction: GSM-7 stand-ins for common typography, and emoji to drop.
+REPLACEMENTS = {
+    "’": "'", "‘": "'", "‚": "'", "′": "'",
+    "“": '"', "”": '"', "„": '"', "″": '"',
+    "–": "-", "—": "-", "…": "...", "\u00a0": " ", "•": "-",
+}
+_EMOJI_RE = re.compile("[\U0001F000-\U0001FAFF\u2600-\u27BF\u2B00-\u2BFF\uFE0F\u200D]")
+_SPACES_RE = re.compile(r"[ \t]{2,}")
+
+
+def encoding(text):
+    return "GSM-7" if all(c in GSM7_BASIC or c in GSM7_EXTENDED for c in text) else "UCS-2"
+
+
+def _char_units(c, enc):
+    if enc == "GSM-7":
+        return 2 if c in GSM7_EXTENDED else 1
+    return 2 if ord(c) > 0xFFFF else 1  # astral characters are a UTF-16 surrogate pair
+
+
+def units(text, enc=None):
+    """Septets (GSM-7) or UTF-16 code units (UCS-2) needed for `text`."""
+    enc = enc or encoding(text)
+    return sum(_char_units(c, enc) for c in text)
+
+
+def segment_count(text):
+    if not text:
+        return 0
+    enc = encoding(text)
+    single, multi = LIMITS[enc]
+    n = units(text, enc)
+    return 1 if n <= single else math.ceil(n / multi)
+
+
+def compact(text):
+    """`text` with typography swapped for GSM-7 characters and emoji removed."""
+    for src, dst in REPLACEMENTS.items():
+        text = text.replace(src, dst)
+    text = _EMOJI_RE.sub("", text)
+    text = _SPACES_RE.sub(" ", text)
+    return "\n".join(line.strip() for line in text.split("\n")).strip()
+
+
+def compact_if_smaller(text):
+    """The compacted text if it needs fewer segments, otherwise `text` unchanged."""
+    compacted = compact(text)
+    return compacted if segment_count(compacted) < segment_count(text) else text
+
+
+def split(text, max_segments):
+    """
+    Split `text` into messages of at most `max_segments` segments each,
+    breaking between words where possible.
+    """
+    enc = encoding(text)
+    single, multi = LIMITS[enc]
+    capacity = single if max_segments <= 1 else multi * max_segments
+    if units(text, enc) <= capacity:
+        return [text]
+
+    parts, current, used = [], "", 0
+    for token in re.findall(r"\S+\s*", text):
+        size = units(token, enc)
+        if used + size > capacity and current:
+            parts.append(current.rstrip())
+            current, used = "", 0
+        while size > capacity:  # a single word longer than a whole message
+            head, head_units = "", 0
+            for c in token:
+                if head_units + _char_units(c, enc) > capacity:
+                    break
+                head += c
+                head_units += _char_units(c, enc)
+            parts.append(head)
+            token = token[len(head):]
+            size = units(token, enc)
+        current += token
+        used += size
+    if current.strip():
+        parts.append(current.rstrip())
+    return parts
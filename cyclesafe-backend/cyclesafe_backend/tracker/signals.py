@@ -0,0 +1,45 @@
+# tracker/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.models import UserProfile
+from . import recipients
+from .batch import refresh_prediction_from_stats, refresh_user_prediction
+from .models import CycleRecord
+from .stats import rebuild_user_stats, record_added
+
+
+@receiver(post_save, sender=CycleRecord)
+def update_stats_on_save(sender, instance, created, raw=False, **kwargs):
+    """
+    Keep CycleStats and CyclePrediction current. A new record updates the
+    stats row (the one the caller set as `preloaded_stats`, if any) and
+    derives the prediction from it; edits recompute both from history.
+    """
+    if raw:
+        return
+    if created:
+        stats = record_added(instance, getattr(instance, "preloaded_stats", None))
+        refresh_prediction_from_stats(instance, stats)
+    else:
+        rebuild_user_stats(instance.user_id)
+        refresh_user_prediction(instance.user_id)
+
+
+@receiver(post_delete, sender=CycleRecord)
+def update_stats_on_delete(sender, instance, **kwargs):
+    rebuild_user_stats(instance.user_id)
+    refresh_user_prediction(instance.user_id)
+
+
+@receiver(post_save, sender=UserProfile)
+def remember_sms_consent(sender, instance, raw=False, **kwargs):
+    if raw:
+        recipients.forget(instance.user_id)
+        return
+    recipients.remember(instance)
+
+
+@receiver(post_delete, sender=UserProfile)
+def forget_sms_consent(sender, instance, **kwargs):
+    recipients.forget(instance.user_id)
@@ -0,0 +1,104 @@
+# tracker/sms.py
+"""
+SMS delivery backends, selected with settings.SMS_BACKEND:
+
+- "twilio": real messages through the Twilio REST API, using one pooled
+            client per worker process and the shared "sms" token bucket
+            (SMS_RATE_LIMIT messages/second across all workers)
+- "memory": appended to `outbox` (tests and benchmarks)
+- "file":   one JSON line per message in settings.SMS_FILE_PATH
+"""
+import itertools
+import json
+import os
+import random
+import threading
+
+from django.conf import settings
+from django.utils import timezone
+from twilio.base.exceptions import TwilioRestException
+from twilio.http.http_client import TwilioHttpClient
+from twilio.rest import Client
+
+from cyclesafe_backend import metrics, ratelimit
+
+outbox = []
+_counter = itertools.count(1)
+_lock = threading.Lock()
+
+
+class SMSRateLimited(Exception):
+    """The provider answered 429, or no send slot came free in time. Requeue the message."""
+
+
+_client = None
+_client_pid = None
+
+
+def _get_twilio_client():
+    """Per-process Twilio client; its HTTP session keeps connections alive between messages."""
+    global _client, _client_pid
+    with _lock:
+        if _client is None or _client_pid != os.getpid():
+            sid = os.getenv("TWILIO_ACCOUNT_SID")
+            token = os.getenv("TWILIO_AUTH_TOKEN")
+            if not sid or not token:
+                raise RuntimeError("Twilio credentials are not configured in environment.")
+            http_client = TwilioHttpClient(pool_connections=True, timeout=settings.TWILIO_TIMEOUT)
+            _client = Client(sid, token, http_client=http_client)
+            _client_pid = os.getpid()
+        return _client
+
+
+def _twilio_send(to, body):
+    from_number = os.getenv("TWILIO_PHONE_NUMBER")
+    if not from_number:
+        raise RuntimeError("TWILIO_PHONE_NUMBER not set")
+    limiter = ratelimit.bucket("sms", settings.SMS_RATE_LIMIT, settings.SMS_RATE_BURST)
+    if not limiter.acquire(settings.SMS_RATE_LIMIT_WAIT):
+        raise SMSRateLimited("No SMS send slot free within SMS_RATE_LIMIT_WAIT")
+    try:
+        msg = _get_twilio_client().messages.create(body=body, from_=from_number, to=to)
+    except TwilioRestException as e:
+        if e.status == 429:
+            metrics.incr("sms.provider_429")
+            raise SMSRateLimited(str(e)) from e
+        raise
+    return msg.sid
+
+
+def retry_countdown(retries):
+    """Seconds before requeueing a rate-limited send: exponential, capped, jittered."""
+    delay = min(settings.SMS_RETRY_MAX_DELAY, settings.SMS_RETRY_BASE_DELAY * 2 ** retries)
+    return delay * random.uniform(0.5, 1)
+
+
+def _memory_send(to, body):
+    with _lock:
+        sid = f"SMmemory{next(_counter)}"
+        outbox.append({"sid": sid, "to": to, "body": body})
+    return sid
+
+
+def _file_send(to, body):
+    with _lock:
+        sid = f"SMfile{next(_counter)}"
+        line = json.dumps({"sid": sid, "to": to, "body": body, "sent_at": timezone.now().isoformat()})
+        with open(settings.SMS_FILE_PATH, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    return sid
+
+
+BACKENDS = {
+    "twilio": _twilio_send,
+    "memory": _memory_send,
+    "file": _file_send,
+}
+
+
+def send(to: str, body: str) -> str:
+    """Send one message through the configured backend and return its sid."""
+    backend = getattr(settings, "SMS_BACKEND", "twilio")
+    if backend not in BACKENDS:
+        raise RuntimeError(f"Unknown SMS_BACKEND '{backend}'")
+    return BACKENDS[backend](to, body)
@@ -0,0 +1,124 @@
+# tracker/stats.py
+"""
+Maintains CycleStats rows.
+
+A newly logged cycle that is the latest one for the user (the normal case)
+updates the row incrementally; edits, deletions and back-filled older
+cycles recompute just that user's row from their history.
+"""
+import math
+from itertools import groupby
+
+from django.db import transaction
+
+from .models import CycleRecord, CycleStats
+
+REGULARITY_SPREAD_DAYS = 10
+BULK_BATCH_SIZE = 1000
+
+STAT_FIELDS = [
+    "record_count", "last_start_date", "recent_start_dates", "recent_cycle_lengths",
+    "interval_count", "interval_mean", "interval_m2", "regularity_score",
+]
+
+
+def _regularity(stats):
+    if stats.interval_count < 2:
+        return None
+    spread = min(math.sqrt(stats.interval_variance), REGULARITY_SPREAD_DAYS)
+    return round(1 - spread / REGULARITY_SPREAD_DAYS, 3)
+
+
+def _add_interval(stats, gap):
+    """Welford update with one more start-to-start gap."""
+    stats.interval_count += 1
+    delta = gap - stats.interval_mean
+    stats.interval_mean += delta / stats.interval_count
+    stats.interval_m2 += delta * (gap - stats.interval_mean)
+
+
+def _fill(stats, records):
+    """
+    Recompute `stats` from `records`, a list of (start_date, cycle_length, created_at, id).
+    """
+    window = CycleStats.RECENT_WINDOW
+    by_start = sorted(records, key=lambda r: r[0])
+    by_created = sorted(records, key=lambda r: (r[2], r[3]), reverse=True)
+
+    stats.record_count = len(records)
+    stats.last_start_date = by_start[-1][0] if records else None
+    stats.recent_start_dates = [r[0].isoformat() for r in reversed(by_start[-window:])]
+    stats.recent_cycle_lengths = [r[1] for r in by_created[:window]]
+    stats.interval_count, stats.interval_mean, stats.interval_m2 = 0, 0.0, 0.0
+    for prev, cur in zip(by_start, by_start[1:]):
+        gap = (cur[0] - prev[0]).days
+        if gap > 0:
+            _add_interval(stats, gap)
+    stats.regularity_score = _regularity(stats)
+    return stats
+
+
+def rebuild_user_stats(user_id):
+    """Recompute one user's CycleStats from their CycleRecords."""
+    records = list(
+        CycleRecord.objects.filter(user_id=user_id)
+        .values_list("start_date", "cycle_length", "created_at", "id")
+    )
+    with transaction.atomic():
+        stats, _ = CycleStats.objects.select_for_update().get_or_create(user_id=user_id)
+        _fill(stats, records)
+        stats.save()
+    return stats
+
+
+def record_added(record, stats=None):
+    """
+    Fold a newly created CycleRecord into its user's stats. `stats` is the
+    user's row when the caller already read it (locked, in its transaction).
+    """
+    with transaction.atomic(savepoint=False):
+        if stats is None:
+            stats, _ = CycleStats.objects.select_for_update().get_or_create(user_id=record.user_id)
+        last = stats.last_start_date
+        if last is not None and record.start_date < last:
+            # Back-filled older cycle: gaps and windows need the full history.
+            return rebuild_user_stats(record.user_id)
+
+        window = CycleStats.RECENT_WINDOW
+        if last is not None and (record.start_date - last).days > 0:
+            _add_interval(stats, (record.start_date - last).days)
+        stats.record_count += 1
+        stats.last_start_date = record.start_date
+        stats.recent_start_dates = [record.start_date.isoformat()] + stats.recent_start_dates[:window - 1]
+        stats.recent_cycle_lengths = [record.cycle_length] + stats.recent_cycle_lengths[:window - 1]
+        stats.regularity_score = _regularity(stats)
+        stats.save()
+    return stats
+
+
+def rebuild_all_stats(chunk_size=BULK_BATCH_SIZE):
+    """Backfill CycleStats for every user with cycle records. Returns rows written."""
+    rows = (
+        CycleRecord.objects.order_by("user_id")
+        .values_list("user_id", "start_date", "cycle_length", "created_at", "id")
+        .iterator(chunk_size=chunk_size)
+    )
+    batch, written = [], 0
+    for user_id, records in groupby(rows, key=lambda r: r[0]):
+        batch.append(_fill(CycleStats(user_id=user_id), [r[1:] for r in records]))
+        if len(batch) >= chunk_size:
+            written += _upsert(batch)
+            batch = []
+    if batch:
+        written += _upsert(batch)
+    return written
+
+
+def _upsert(batch):
+    CycleStats.objects.bulk_create(
+        batch,
+        update_conflicts=True,
+        unique_fields=["user"],
+        update_fields=STAT_FIELDS + ["updated_at"],
+    )
+    return len(batch)
@@ -0,0 +1,199 @@
+# tracker/summaries.py
+"""
+Cycle window math and the personalized AI summary.
+Shared by SmartCyclePredictor (sync mode) and the generate_cycle_summary task.
+"""
+import logging
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+
+from cyclesafe_backend import llm, metrics
+
+logger = logging.getLogger(__name__)
+
+
+def cycle_windows(start_date, end_date, cycle_length):
+    """Predict next period, ovulation, fertile window and phase boundaries."""
+    next_period = start_date + timedelta(days=cycle_length)
+    ovulation_day = start_date + timedelta(days=cycle_length - 14)
+    fertile_start = ovulation_day - timedelta(days=5)
+    fertile_end = ovulation_day + timedelta(days=1)
+
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "cycle_length": cycle_length,
+        "next_period": next_period,
+        "ovulation": ovulation_day,
+        "fertile_window": f"{fertile_start.strftime('%b %d')} – {fertile_end.strftime('%b %d')}",
+        "menstrual_end": end_date,
+        "follicular_start": end_date + timedelta(days=1),
+        "follicular_end": ovulation_day - timedelta(days=1),
+        "luteal_start": ovulation_day + timedelta(days=1),
+        "luteal_end": next_period - timedelta(days=1),
+    }
+
+
+def build_summary_prompt(user_name, w):
+    return f"""
+    You are a kind and professional women's health assistant.
+    The user's name is {user_name}.
+    Their last period was from {w["start_date"]} to {w["end_date"]}.
+    Cycle length: {w["cycle_length"]} days.
+    Next period: {w["next_period"]}.
+    Ovulation: {w["ovulation"]}.
+    Fertile window: {w["fertile_window"]}.
+
+    Phases:
+    Menstrual Phase: {w["start_date"]} to {w["menstrual_end"]}
+    Follicular Phase: {w["follicular_start"]} to {w["follicular_end"]}
+    Ovulation Phase: {w["ovulation"]}
+    Luteal Phase: {w["luteal_start"]} to {w["luteal_end"]}
+
+    Write a warm, personalized summary beginning with:
+    "Hey {user_name}, here’s your personalized cycle summary."
+    Then describe what’s happening in each phase using clear, natural paragraphs.
+    Include how energy, mood, fertility, and hormones change.
+    Avoid emojis, markdown, bullet points, or complex formatting.
+    Keep it concise and suitable for mobile app display.
+    """
+
+
+def basic_summary(user_name, w):
+    """Plain summary used when the AI is unavailable."""
+    return (
+        f"Hey {user_name}, here’s your personalized cycle summary. "
+        f"Your period ran from {w['start_date']:%b %d} to {w['end_date']:%b %d}. "
+        f"With a {w['cycle_length']}-day cycle, your next period is expected around {w['next_period']:%b %d}, "
+        f"and ovulation around {w['ovulation']:%b %d}. "
+        f"Your most fertile days are {w['fertile_window']}."
+    )
+
+
+def _personal_summary(user_name, windows):
+    """One-off gpt-4.1 summary written for this user (shapes we don't template)."""
+    return llm.complete(
+        "tracker.summary",
+        [
+            {"role": "system", "content": "You are a supportive, concise, and accurate women's health guide."},
+            {"role": "user", "content": build_summary_prompt(user_name, windows)},
+        ],
+        model="gpt-4.1",
+        fallback=lambda: basic_summary(user_name, windows),
+    )
+
+
+# ---------- Shape-keyed template cache ----------
+# The summary prose only depends on cycle length and period duration; the
+# name and dates are filled in locally from placeholders.
+
+TEMPLATE_CACHE_PREFIX = "cycle-summary-template:v1"
+TEMPLATE_CYCLE_RANGE = range(21, 46)  # shapes outside this are summarized per user
+DURATION_BUCKETS = [(3, "short"), (6, "typical"), (None, "long")]
+
+PLACEHOLDERS = {
+    "[NAME]": lambda name, w: name,
+    "[PERIOD_START]": lambda name, w: _day(w["start_date"]),
+    "[PERIOD_END]": lambda name, w: _day(w["end_date"]),
+    "[NEXT_PERIOD]": lambda name, w: _day(w["next_period"]),
+    "[OVULATION]": lambda name, w: _day(w["ovulation"]),
+    "[FERTILE_WINDOW]": lambda name, w: w["fertile_window"],
+    "[FOLLICULAR_START]": lambda name, w: _day(w["follicular_start"]),
+    "[FOLLICULAR_END]": lambda name, w: _day(w["follicular_end"]),
+    "[LUTEAL_START]": lambda name, w: _day(w["luteal_start"]),
+    "[LUTEAL_END]": lambda name, w: _day(w["luteal_end"]),
+}
+_PLACEHOLDER_RE = re.compile(r"\[[A-Z_]+\]")
+
+
+def _day(d):
+    return f"{d:%B} {d.day}"
+
+
+def duration_bucket(windows):
+    days = (windows["end_date"] - windows["start_date"]).days + 1
+    for limit, name in DURATION_BUCKETS:
+        if limit is None or days <= limit:
+            return name
+
+
+def template_key(cycle_length, bucket):
+    return f"{TEMPLATE_CACHE_PREFIX}:{cycle_length}:{bucket}"
+
+
+def build_template_prompt(cycle_length, bucket):
+    return f"""
+    You are a kind and professional women's health assistant.
+    Write a reusable cycle summary for someone with a {cycle_length}-day cycle
+    whose period usually lasts a {bucket} number of days.
+
+    Use these placeholders exactly as written instead of real names and dates:
+    [NAME], [PERIOD_START], [PERIOD_END], [NEXT_PERIOD], [OVULATION],
+    [FERTILE_WINDOW], [FOLLICULAR_START], [FOLLICULAR_END], [LUTEAL_START], [LUTEAL_END].
+
+    Begin with:
+    "Hey [NAME], here’s your personalized cycle summary."
+    Then describe what’s happening in each phase (menstrual, follicular,
+    ovulation, luteal) using clear, natural paragraphs and the placeholders.
+    Include how energy, mood, fertility, and hormones change.
+    Avoid emojis, markdown, bullet points, or complex formatting.
+    Keep it concise and suitable for mobile app display.
+    """
+
+
+def _valid_template(text):
+    tokens = set(_PLACEHOLDER_RE.findall(text or ""))
+    return "[NAME]" in tokens and tokens <= set(PLACEHOLDERS)
+
+
+def get_summary_template(cycle_length, bucket, refresh=False):
+    """
+    Cached template for this cycle shape, generated on a miss.
+    Returns None for uncached shapes or when no valid template can be made.
+    Entries expire after SUMMARY_TEMPLATE_TTL and the key space is bounded by
+    TEMPLATE_CYCLE_RANGE x DURATION_BUCKETS.
+    """
+    if cycle_length not in TEMPLATE_CYCLE_RANGE:
+        return None
+    key = template_key(cycle_length, bucket)
+    template = None if refresh else cache.get(key)
+    if template is not None:
+        metrics.incr("tracker.summary_template.hit")
+        return template
+
+    metrics.incr("tracker.summary_template.miss")
+    template = llm.complete(
+        "tracker.summary",
+        [
+            {"role": "system", "content": "You are a supportive, concise, and accurate women's health guide."},
+            {"role": "user", "content": build_template_prompt(cycle_length, bucket)},
+        ],
+        model="gpt-4.1",
+        fallback=None,
+    )
+    if template is None:
+        return None
+    if not _valid_template(template):
+        logger.warning("Discarding summary template for %s/%s with bad placeholders", cycle_length, bucket)
+        return None
+    cache.set(key, template, settings.SUMMARY_TEMPLATE_TTL)
+    return template
+
+
+def fill_template(template, user_name, windows):
+    return _PLACEHOLDER_RE.sub(lambda m: PLACEHOLDERS[m.group(0)](user_name, windows), template)
+
+
+def generate_summary(user_name, windows):
+    """
+    Personalized cycle summary. Served from the shape template cache when
+    possible; otherwise asks gpt-4.1 directly, falling back to basic_summary
+    when the LLM gateway can't serve the call.
+    """
+    template = get_summary_template(windows["cycle_length"], duration_bucket(windows))
+    if template is not None:
+        return fill_template(template, user_name, windows)
+    return _personal_summary(user_name, windows)
@@ -1,113 +1,121 @@
 # tracker/tasks.py
-from celery import shared_task
-from twilio.rest import Client
+from celery import group, shared_task
 from twilio.base.exceptions import TwilioRestException
-from datetime import datetime, timedelta
+from datetime import timedelta
+from django.conf import settings
 from django.utils import timezone
 import os
-from users.models import UserProfile
+from users.models import UserProfile, observes_dst, reminder_minute_utc
 from django.contrib.auth.models import User
-import math
+from cyclesafe_backend import metrics, queues
+from . import delivery, fanout, messages, recipients, reminders, segments, sms, windows
+from .recipients import normalize_phone as _normalize_phone
+from .models import CycleSummary, FanoutChunk, FanoutRun
+from .summaries import cycle_windows, generate_summary
+from .batch import DEFAULT_CHUNK_SIZE, materialize_predictions
+import itertools
 import logging
 import random
+import time
 
 logger = logging.getLogger(__name__)
 
 # ---------- CONFIG ----------
-BRAND_NAME = os.getenv("BRAND_NAME", "CycleSafe")
 TRIAL_MODE = os.getenv("TWILIO_TRIAL", "false").lower() in ("1", "true", "yes")
 TRIAL_MAX_CHARS = int(os.getenv("TRIAL_MAX_CHARS", "150"))
-NONTRIAL_SEGMENT_LENGTH = int(os.getenv("NONTRIAL_SEGMENT_LENGTH", "1500"))
+WEEKLY_TIP_BATCH_SIZE = 2000  # users classified per NumPy pass when not fanning out
 
 
 # ---------- Helpers ----------
 
-def _get_twilio_client():
-    sid = os.getenv("TWILIO_ACCOUNT_SID")
-    token = os.getenv("TWILIO_AUTH_TOKEN")
-    if not sid or not token:
-        raise RuntimeError("Twilio credentials are not configured in environment.")
-    return Client(sid, token)
-
-
-def _normalize_phone(phone: str) -> str | None:
-    if not phone:
-        return None
-    p = phone.strip().replace(" ", "").replace("-", "")
-    if p.startswith("00"):
-        p = "+" + p[2:]
-    if not p.startswith("+"):
-        p = "+" + p
-    digits = ''.join(ch for ch in p if ch.isdigit())
-    return p if len(digits) >= 9 else None
-
-
 def _send_once(to: str, body: str) -> str:
-    client = _get_twilio_client()
-    from_number = os.getenv("TWILIO_PHONE_NUMBER")
-    if not from_number:
-        raise RuntimeError("TWILIO_PHONE_NUMBER not set")
-    msg = client.messages.create(body=body, from_=from_number, to=to)
-    return msg.sid
+    return sms.send(to, body)
+
 
+def _split_and_send(to: str, body: str, sent_parts: int = 0) -> tuple:
+    """
+    Send body to `to`. Optionally compacted to GSM-7 (SMS_COMPACT) when that
+    saves segments; if TRIAL_MODE truncate, otherwise split on word boundaries
+    into messages of at most SMS_MAX_SEGMENTS segments.
+    The first `sent_parts` parts are skipped (already sent by an earlier
+    attempt); an error carries the index of the part that failed as
+    `sent_parts`, so a retry resumes there. Returns (provider sids, total segments).
+    """
+    if settings.SMS_COMPACT:
+        compacted = segments.compact_if_smaller(body)
+        if compacted != body:
+            metrics.incr("sms.compacted")
+            body = compacted
 
-def _split_and_send(to: str, body: str) -> list:
-    """Send body to `to`. If TRIAL_MODE truncate; otherwise split into chunks if too long."""
-    sids = []
     if TRIAL_MODE:
         if len(body) > TRIAL_MAX_CHARS:
             logger.debug("TRIAL_MODE: truncating message from %d to %d chars", len(body), TRIAL_MAX_CHARS)
             body = body[: TRIAL_MAX_CHARS - 3] + "..."
-        sid = _send_once(to, body)
-        sids.append(sid)
-        return sids
-
-    # production: split into segments if needed
-    if len(body) <= NONTRIAL_SEGMENT_LENGTH:
-        sids.append(_send_once(to, body))
-        return sids
-
-    total = len(body)
-    chunks = math.ceil(total / NONTRIAL_SEGMENT_LENGTH)
-    for i in range(chunks):
-        start = i * NONTRIAL_SEGMENT_LENGTH
-        end = start + NONTRIAL_SEGMENT_LENGTH
-        chunk = body[start:end]
-        sids.append(_send_once(to, chunk))
-    return sids
+        parts = [body]
+    else:
+        parts = segments.split(body, settings.SMS_MAX_SEGMENTS)
 
+    sids, total = [], 0
+    for index, part in enumerate(parts[sent_parts:], sent_parts):
+        try:
+            sids.append(_send_once(to, part))
+        except Exception as e:
+            e.sent_parts = index
+            raise
+        total += _record_segments(part)
+    return sids, total
 
-# ---------- Tasks ----------
 
-@shared_task(bind=True)
-def send_sms_reminder(self, user_id, message):
-    """
-    Sends an SMS to the user if allowed. Adds a brand prefix and handles trial/prod limits.
-    Returns a status string for logging.
-    """
-    try:
-        user = User.objects.get(id=user_id)
-    except User.DoesNotExist:
-        return f"❌ User id {user_id} not found"
+def _deliver(user_id, kind, to, body, sent_parts=0):
+    """_split_and_send, recording the outcome in the delivery log. Errors are re-raised."""
+    started = time.monotonic()
+
+    def elapsed_ms():
+        return (time.monotonic() - started) * 1000
 
     try:
-        profile = UserProfile.objects.get(user=user)
-    except UserProfile.DoesNotExist:
-        return f"❌ UserProfile for {user.username} not found"
+        sids, total = _split_and_send(to, body, sent_parts)
+    except sms.SMSRateLimited as e:
+        delivery.record(user_id, kind, "rate_limited", latency_ms=elapsed_ms(), error=e)
+        raise
+    except Exception as e:
+        delivery.record(user_id, kind, "failed", latency_ms=elapsed_ms(), error=e)
+        raise
+    delivery.record(user_id, kind, "sent", segments=total, sid=sids[0] if sids else "", latency_ms=elapsed_ms())
+    return sids
 
-    if not (profile.allow_sms and profile.phone_number):
-        return f"❌ SMS disabled or missing number for {user.username}"
 
-    to = _normalize_phone(profile.phone_number)
-    if not to:
-        return f"❌ Invalid phone number for {user.username}: {profile.phone_number}"
+def _record_segments(part):
+    count = segments.segment_count(part)
+    encoding = segments.encoding(part).lower().replace("-", "")
+    metrics.incr("sms.messages")
+    metrics.incr("sms.segments", count)
+    metrics.incr(f"sms.messages.{encoding}")
+    metrics.incr(f"sms.segments.{encoding}", count)
+    logger.debug("SMS part: %d chars, %s, %d segment(s)", len(part), encoding, count)
+    return count
 
-    branded = f"💗 [{BRAND_NAME}]\n{message}"
 
+# ---------- Tasks ----------
+
+def _send_with_retry(task, user_id, kind, to, body, sent_parts=0):
+    """
+    Deliver `body` inside a send task. Rate-limited sends (429 / no token)
+    are requeued with backoff, resuming at the first part not yet sent (the
+    task's `sent_parts` argument); other failures are logged and reported.
+    """
     try:
-        sids = _split_and_send(to, branded)
+        sids = _deliver(user_id, kind, to, body, sent_parts)
         logger.info("SMS sent to %s (messages=%d)", to, len(sids))
         return f"✅ SMS sent to {to}"
+    except sms.SMSRateLimited as e:
+        if task.request.retries < task.max_retries:
+            countdown = sms.retry_countdown(task.request.retries)
+            logger.warning("SMS to %s rate limited, requeueing in %.0fs: %s", to, countdown, e)
+            kwargs = {**task.request.kwargs, "sent_parts": getattr(e, "sent_parts", sent_parts)}
+            raise task.retry(exc=e, countdown=countdown, kwargs=kwargs)
+        logger.error("SMS to %s still rate limited after %d retries", to, task.max_retries)
+        return f"❌ SMS rate limited: {e}"
     except TwilioRestException as e:
         logger.exception("Twilio error sending SMS to %s: %s", to, e)
         return f"❌ Twilio error: {getattr(e, 'code', 'N/A')} - {str(e)}"
@@ -116,92 +124,188 @@ def send_sms_reminder(self, user_id, message):
         return f"❌ SMS send failed: {e}"
 
 
-@shared_task(bind=True)
-def send_welcome_message(self, user_id, summary_message):
+@shared_task(bind=True, max_retries=5, ignore_result=True)
+def deliver_sms(self, recipient, text, kind="sms", sent_parts=0):
     """
-    Sends a warm welcome plus the user's first summary. Delegates actual sending to send_sms_reminder.
+    The SMS delivery pipeline: one task per message, no further hops.
+    `recipient` comes from tracker.recipients.resolve (number, name, opt-in
+    snapshot), so no User / UserProfile reads are needed; consent is
+    re-checked once through the cached lookup. Welcome and summary texts
+    are wrapped here (messages.compose).
     """
+    user_id = recipient["user_id"]
+    to = recipients.current_number(recipient)
+    if to is None:
+        delivery.record(user_id, kind, "skipped", error="SMS disabled since queueing")
+        return f"❌ SMS disabled for user {user_id}"
+
+    body = messages.branded(messages.compose(kind, recipient["name"], text))
+    return _send_with_retry(self, user_id, kind, to, body, sent_parts)
+
+
+def _user(user_id):
+    """The user with their profile (one query), or None."""
+    return User.objects.select_related("profile").filter(id=user_id).first()
+
+
+def _profile_of(user):
     try:
-        user = User.objects.get(id=user_id)
-        profile = UserProfile.objects.get(user=user)
-    except (User.DoesNotExist, UserProfile.DoesNotExist):
-        return f"❌ User or profile not found for id {user_id}"
+        return user.profile
+    except UserProfile.DoesNotExist:
+        return None
+
+
+@shared_task(bind=True, max_retries=5, ignore_result=True)
+def send_sms_reminder(self, user_id, message, kind="sms", sent_parts=0):
+    """
+    Sends an SMS to the user if allowed, looked up by id (one query).
+    Callers that already hold the profile should queue deliver_sms instead.
+    Every outcome goes to the delivery log as `kind`; the returned status
+    string is only logged by the worker (results are not stored).
+    """
+    user = _user(user_id)
+    if user is None:
+        delivery.record(user_id, kind, "skipped", error="user not found")
+        return f"❌ User id {user_id} not found"
+
+    profile = _profile_of(user)
+    if profile is None:
+        delivery.record(user_id, kind, "skipped", error="profile not found")
+        return f"❌ UserProfile for {user.username} not found"
 
     if not (profile.allow_sms and profile.phone_number):
+        delivery.record(user_id, kind, "skipped", error="SMS disabled or missing number")
         return f"❌ SMS disabled or missing number for {user.username}"
 
-    first_name = user.first_name or user.username
-    message = (
-        f"🌸 Welcome to {BRAND_NAME}, {first_name}!\n\n"
-        "We’re excited to support you in understanding your cycle better.\n\n"
-        f"{summary_message}\n\n"
-        "We’ll send helpful reminders before your next period and ovulation. 💕"
-    )
+    to = _normalize_phone(profile.phone_number)
+    if not to:
+        delivery.record(user_id, kind, "skipped", error="invalid phone number")
+        return f"❌ Invalid phone number for {user.username}: {profile.phone_number}"
 
-    # queue the actual SMS send (this will truncate if TRIAL_MODE)
-    send_sms_reminder.delay(user_id, message)
-    logger.info("Queued welcome message for user %s", user.username)
-    return f"✅ Welcome + summary queued for {profile.phone_number}"
+    return _send_with_retry(self, user_id, kind, to, messages.branded(message), sent_parts)
 
 
-@shared_task(bind=True)
-def schedule_cycle_reminders(self, user_id, next_period_iso, ovulation_iso):
+@shared_task(bind=True, max_retries=5, ignore_result=True)
+def send_welcome_message(self, user_id, summary_message, sent_parts=0):
     """
-    Schedules SMS reminders for period and ovulation only if reminder times are in the future.
-    next_period_iso and ovulation_iso: ISO date strings (YYYY-MM-DD or full ISO datetime).
+    Sends a warm welcome plus the user's first summary, looked up by id.
+    New code queues deliver_sms(recipient, summary, "welcome") instead;
+    this stays for messages already in the queue and sends directly.
     """
-    def _parse_iso(s: str) -> datetime:
-        try:
-            dt = datetime.fromisoformat(s)
-        except Exception:
-            # try date-only fallback
-            dt = datetime.fromisoformat(s + "T00:00:00")
-        if dt.tzinfo is None:
-            dt = timezone.make_aware(dt, timezone.get_default_timezone())
-        return dt
+    user = _user(user_id)
+    recipient = recipients.resolve(user, _profile_of(user)) if user else None
+    if recipient is None:
+        delivery.record(user_id, "welcome", "skipped", error="SMS disabled or missing number")
+        return f"❌ SMS disabled or missing number for user {user_id}"
+
+    body = messages.branded(messages.welcome(recipient["name"], summary_message))
+    return _send_with_retry(self, user_id, "welcome", recipient["to"], body, sent_parts)
+
 
+def queue_summary_sms(user, summary_text, first_cycle, profile=None):
+    """
+    Welcome + summary for a user's first cycle, otherwise just the updated summary,
+    as one deliver_sms task. Used by SmartCyclePredictor (sync mode) and
+    generate_cycle_summary (async mode); pass the profile when it is loaded.
+    """
+    if profile is None:
+        profile = UserProfile.objects.filter(user=user).first()
+    recipient = recipients.resolve(user, profile)
+    if recipient is None:
+        return
+    deliver_sms.delay(recipient, summary_text, "welcome" if first_cycle else "summary")
+
+
+@shared_task(bind=True, max_retries=2, default_retry_delay=10)
+def generate_cycle_summary(self, summary_id, send_sms=False, first_cycle=False):
+    """
+    Generates the AI summary for a CycleSummary row created by SmartCyclePredictor
+    in async mode, then chains the welcome / summary SMS off the result.
+    """
     try:
-        next_period_dt = _parse_iso(next_period_iso)
-        ovulation_dt = _parse_iso(ovulation_iso)
-    except Exception as e:
-        logger.exception("Invalid date format in schedule_cycle_reminders: %s", e)
-        return f"❌ Invalid date format: {e}"
+        summary = CycleSummary.objects.select_related("user__profile", "record").get(id=summary_id)
+    except CycleSummary.DoesNotExist:
+        return f"❌ CycleSummary {summary_id} not found"
 
-    now = timezone.now()
+    user = summary.user
+    record = summary.record
+    windows = cycle_windows(record.start_date, record.end_date, record.cycle_length)
 
     try:
-        profile = UserProfile.objects.get(user_id=user_id)
-    except UserProfile.DoesNotExist:
-        return f"❌ UserProfile not found for user {user_id}"
+        summary.message = generate_summary(user.first_name or user.username, windows)
+    except Exception as e:
+        if self.request.retries < self.max_retries:
+            logger.warning("Summary generation failed for %s, retrying: %s", summary_id, e)
+            raise self.retry(exc=e)
+        logger.exception("Summary generation failed for %s: %s", summary_id, e)
+        summary.status = "failed"
+        summary.save(update_fields=["status", "updated_at"])
+        return f"❌ Summary generation failed: {e}"
 
-    if not profile.allow_sms:
-        return f"❌ SMS disabled for user {user_id}"
+    summary.status = "ready"
+    summary.save(update_fields=["message", "status", "updated_at"])
 
-    # prepare messages
-    period_msg = (
-        "Your period is expected in 2 days. Prepare pads, rest, and stay hydrated."
-    )
-    ovulation_msg = (
-        "Your ovulation is coming in 2 days — this is a fertile window. Take care!"
-    )
+    if send_sms:
+        queue_summary_sms(user, summary.message, first_cycle, getattr(user, "profile", None))
 
-    # schedule period reminder if it's in the future
-    eta_period = next_period_dt - timedelta(days=2)
-    if eta_period > now:
-        send_sms_reminder.apply_async((user_id, period_msg), eta=eta_period)
-        logger.info("Scheduled period reminder for user %s at %s", user_id, eta_period)
-    else:
-        logger.info("Skipped scheduling past period reminder for user %s (eta %s <= now %s)", user_id, eta_period, now)
+    return f"✅ Summary {summary_id} ready"
 
-    # schedule ovulation reminder if it's in the future
-    eta_ovulation = ovulation_dt - timedelta(days=2)
-    if eta_ovulation > now:
-        send_sms_reminder.apply_async((user_id, ovulation_msg), eta=eta_ovulation)
-        logger.info("Scheduled ovulation reminder for user %s at %s", user_id, eta_ovulation)
-    else:
-        logger.info("Skipped scheduling past ovulation reminder for user %s (eta %s <= now %s)", user_id, eta_ovulation, now)
 
-    return f"✅ Scheduled future reminders for user {user_id}"
+@shared_task(bind=True, ignore_result=True)
+def schedule_cycle_reminders(self, user_id, next_period_iso=None, ovulation_iso=None):
+    """
+    No longer does anything.
+
+    Period and ovulation reminders are scheduled by check_and_send_daily_reminders
+    alone, from the user's CyclePrediction (average of the last 3 cycles).
+    This task used to schedule a second copy from the cycle just saved; it is
+    kept so calls queued before that change are acknowledged instead of failing.
+    """
+    return f"✅ Cycle reminders for user {user_id} are scheduled by the daily sweep"
+
+
+@shared_task(bind=True)
+def dispatch_due_reminders(self, at=None):
+    """
+    Claims due ScheduledReminders in batches and queues one send task per batch.
+    Runs every minute via Celery Beat (configured in celery.py); `at` (ISO
+    timestamp) claims what is due at another time.
+    """
+    now = windows.parse(at)
+    batches = 0
+    for _ in range(settings.SCHEDULED_REMINDER_MAX_BATCHES):
+        ids = reminders.claim_due(settings.SCHEDULED_REMINDER_BATCH_SIZE, now=now)
+        if not ids:
+            break
+        send_reminder_batch.delay(ids)
+        batches += 1
+    return f"✅ Dispatched {batches} reminder batches."
+
+
+@shared_task(bind=True, ignore_result=True)
+def send_reminder_batch(self, reminder_ids):
+    """Sends a batch of claimed reminders; rate-limited ones go back to the table with a delay."""
+    sent = failed = 0
+    for reminder in reminders.claimed(reminder_ids):
+        profile = getattr(reminder.user, "profile", None)
+        to = _normalize_phone(profile.phone_number) if profile and profile.allow_sms else None
+        if to is None:
+            reminders.mark_failed(reminder, "SMS disabled or invalid number", status="cancelled")
+            continue
+        try:
+            _deliver(reminder.user_id, reminder.kind, to, messages.branded(reminder.message))
+        except sms.SMSRateLimited as e:
+            reminders.requeue(reminder, sms.retry_countdown(reminder.attempts - 1), e)
+            continue
+        except Exception as e:
+            logger.warning("Reminder %s to user %s failed: %s", reminder.id, reminder.user_id, e)
+            reminders.mark_failed(reminder, e)
+            failed += 1
+            continue
+        reminders.mark_sent(reminder)
+        sent += 1
+    delivery.flush()
+    return f"✅ Reminder batch: {sent} sent, {failed} failed"
 
 
 # ============================================================
@@ -209,55 +313,68 @@ def schedule_cycle_reminders(self, user_id, next_period_iso, ovulation_iso):
 # ============================================================
 
 @shared_task(bind=True)
-def check_and_send_daily_reminders(self):
+def check_and_send_daily_reminders(self, at=None):
     """
-    Daily check to remind users of upcoming periods or ovulation.
-    Runs automatically via Celery Beat (configured in celery.py).
+    Schedules reminders of a period or ovulation two days away (in the user's
+    own time zone). Runs via Celery Beat every REMINDER_SLICE_MINUTES
+    (configured in celery.py); each run only handles the users whose reminder
+    slot falls in the current slice (tracker/windows.py). `at` (ISO timestamp)
+    sweeps another slice.
+
+    Only CyclePrediction rows whose indexed next period / ovulation date is
+    two days away are read, so the cost follows the reminders due, not the
+    number of users. Each reminder is written to ScheduledReminder at the
+    user's slot, and dispatch_due_reminders claims and sends it.
     """
-    now = timezone.now().date()
-    two_days_ahead = now + timedelta(days=2)
-
-    users = UserProfile.objects.filter(allow_sms=True, phone_number__isnull=False)
-
-    for profile in users:
-        user = profile.user
+    start, lo, hi = windows.current_slice(windows.parse(at))
+    days = windows.candidate_days(start)
+
+    due = []
+    for prediction in fanout.due_predictions(days, (lo, hi)).select_related("user__profile"):
+        user = prediction.user
+        if recipients.resolve(user, user.profile) is None:
+            continue
+        send_at = start + timedelta(minutes=user.profile.reminder_minute_utc - lo)
+        two_days_ahead = windows.local_date(user.profile, start) + timedelta(days=2)
         try:
-            # fields expected on UserProfile: next_period_date, next_ovulation_date
-            next_period = getattr(profile, "next_period_date", None)
-            ovulation = getattr(profile, "next_ovulation_date", None)
-
-            if not next_period and not ovulation:
-                continue
+            # 💗 Period / 🌸 ovulation exactly in 2 days
+            for kind, text in fanout.reminders_due(prediction, two_days_ahead):
+                due.append((user.id, kind, send_at, text))
+        except Exception as e:
+            logger.error("Error processing reminders for user %s: %s", user.id, e)
 
-            # Normalize to date only if datetimes
-            if next_period and hasattr(next_period, "date"):
-                next_period = next_period.date()
-            if ovulation and hasattr(ovulation, "date"):
-                ovulation = ovulation.date()
-
-            # 💗 If period is exactly in 2 days
-            if next_period == two_days_ahead:
-                msg = (
-                    f"Hey {user.first_name or user.username}, your period is expected in 2 days 💗\n"
-                    "Remember to rest, stay hydrated, and keep your pads ready!"
-                )
-                send_sms_reminder.delay(user.id, msg)
-                logger.info("Sent period reminder to %s", profile.phone_number)
-
-            # 🌸 If ovulation is exactly in 2 days
-            if ovulation == two_days_ahead:
-                msg = (
-                    f"Hey {user.first_name or user.username}, your ovulation is in 2 days 🌼\n"
-                    "This is your fertile phase — take care and listen to your body 💕"
-                )
-                send_sms_reminder.delay(user.id, msg)
-                logger.info("Sent ovulation reminder to %s", profile.phone_number)
+    scheduled = reminders.schedule_many(due)
+    logger.info("Reminder slice %s UTC completed (%d reminders scheduled).", f"{start:%H:%M}", scheduled)
+    return f"✅ Daily reminders processed ({scheduled} scheduled)."
 
-        except Exception as e:
-            logger.error("Error processing reminders for %s: %s", profile.phone_number, e)
 
-    logger.info("Daily reminder check completed.")
-    return "✅ Daily reminders processed."
+@shared_task(bind=True)
+def refresh_reminder_slots(self, at=None):
+    """
+    Recomputes reminder_minute_utc for users in zones with daylight saving
+    time, so a clock change doesn't move their reminder out of their window.
+    Runs nightly via Celery Beat (configured in celery.py); each slot is
+    computed for the next reminder after `at` (ISO timestamp, default now).
+    """
+    now = windows.parse(at)
+    zones = [
+        name for name in UserProfile.objects.values_list("timezone", flat=True).distinct()
+        if observes_dst(name, now.year)
+    ]
+    moved = []
+    profiles = (
+        UserProfile.objects.filter(timezone__in=zones)
+        .only("id", "user_id", "timezone", "reminder_window_start", "reminder_window_end", "reminder_minute_utc")
+    )
+    for profile in profiles.iterator(chunk_size=1000):
+        minute = reminder_minute_utc(
+            profile.user_id, profile.timezone, profile.reminder_window_start, profile.reminder_window_end, now=now,
+        )
+        if minute != profile.reminder_minute_utc:
+            profile.reminder_minute_utc = minute
+            moved.append(profile)
+    UserProfile.objects.bulk_update(moved, ["reminder_minute_utc"], batch_size=1000)
+    return f"✅ Moved {len(moved)} reminder slots in {len(zones)} time zones."
 
 
 # ============================================================
@@ -267,30 +384,129 @@ def check_and_send_daily_reminders(self):
 @shared_task(bind=True)
 def send_weekly_health_tip(self):
     """
-    Sends a motivational or educational tip about women’s health to all users.
+    Sends each user a tip for the phase of the cycle they are in today
+    (one tip per phase is picked for the whole run; users without records
+    get a general tip). Phases are classified in bulk (tracker/phases.py).
+    With SMS_FANOUT the sends are split into chunk tasks.
     """
-    tips = [
-        "💧 Stay hydrated! Drinking enough water supports hormone balance.",
-        "🌸 Gentle exercise can reduce cramps and improve mood.",
-        "🍎 Include iron-rich foods after your period to replenish energy.",
-        "🧘‍♀️ Mindfulness and rest help regulate your cycle.",
-        "💤 Prioritize sleep — it supports hormonal health.",
-    ]
-    tip = random.choice(tips)
+    tips = {phase: random.choice(pool) for phase, pool in messages.PHASE_TIPS.items()}
+    today = timezone.localdate()
+
+    if settings.SMS_FANOUT:
+        run = fanout.create_run("weekly_tip", {"tips": tips, "day": today.isoformat()})
+        return _dispatch_fanout(run)
 
-    users = UserProfile.objects.filter(allow_sms=True, phone_number__isnull=False)
     count = 0
-    for profile in users:
-        try:
-            user = profile.user
-            message = (
-                f"💗 [{BRAND_NAME} Weekly Tip]\n"
-                f"Hi {user.first_name or user.username}, here’s your health reminder:\n\n{tip}"
-            )
-            send_sms_reminder.delay(user.id, message)
-            count += 1
-        except Exception as e:
-            logger.error("Failed to queue weekly tip for %s: %s", profile.phone_number, e)
+    profiles = fanout.sms_profiles().select_related("user__cycle_prediction").order_by("user_id").iterator(
+        chunk_size=WEEKLY_TIP_BATCH_SIZE
+    )
+    while batch := list(itertools.islice(profiles, WEEKLY_TIP_BATCH_SIZE)):
+        for profile, text in fanout.phase_tips(batch, tips, today):
+            recipient = recipients.resolve(profile.user, profile)
+            if recipient is None:
+                continue
+            try:
+                deliver_sms.apply_async((recipient, text, "weekly_tip"), **queues.options("bulk"))
+                count += 1
+            except Exception as e:
+                logger.error("Failed to queue weekly tip for %s: %s", profile.phone_number, e)
 
     logger.info("Sent weekly tips to %d users.", count)
     return f"✅ Sent weekly tips to {count} users."
+
+
+# ============================================================
+# 📦 CHUNKED FAN-OUT — one task per user-id range (tracker/fanout.py)
+# ============================================================
+
+def _dispatch_fanout(run, chunk_ids=None):
+    if chunk_ids is None:
+        chunk_ids = list(run.chunks.values_list("id", flat=True))
+    if chunk_ids:
+        options = queues.options("reminders" if run.kind == "daily_reminders" else "bulk")
+        group(send_fanout_chunk.s(chunk_id).set(**options) for chunk_id in chunk_ids).apply_async()
+    logger.info("Fan-out %s %s dispatched %d chunks", run.kind, run.id, len(chunk_ids))
+    return f"✅ Fan-out {run.id} started with {len(chunk_ids)} chunks."
+
+
+def resume_fanout(run_id):
+    """Re-dispatch the chunks of a run that did not finish (failed ones resume at their cursor)."""
+    run = FanoutRun.objects.get(id=run_id)
+    return _dispatch_fanout(run, fanout.reopen_chunks(run))
+
+
+@shared_task(bind=True, max_retries=5, default_retry_delay=30, ignore_result=True)
+def send_fanout_chunk(self, chunk_id, sent_parts=0):
+    """
+    Sends the messages for one FanoutChunk. Recipients are loaded in one
+    query; a failed attempt saves its cursor so the retry skips users that
+    were already messaged, and passes on how many parts of the interrupted
+    message went out (`sent_parts`) so they are not sent again.
+    """
+    try:
+        chunk = FanoutChunk.objects.select_related("run").get(id=chunk_id)
+    except FanoutChunk.DoesNotExist:
+        return f"❌ Fan-out chunk {chunk_id} not found"
+    if chunk.status == "done":
+        return f"✅ Chunk {chunk_id} already done"
+
+    fanout.start_chunk(chunk)
+    sent = failed = 0
+    cursor = chunk.cursor
+    try:
+        for user_id, phone, kind, text in fanout.chunk_messages(chunk):
+            to = _normalize_phone(phone)
+            if to is None:
+                delivery.record(user_id, kind, "skipped", error="invalid phone number")
+                failed += 1
+            else:
+                try:
+                    _deliver(user_id, kind, to, messages.branded(text), sent_parts)
+                    sent += 1
+                except TwilioRestException as e:
+                    logger.warning("Twilio error sending to user %s: %s", user_id, e)
+                    failed += 1
+            cursor = user_id
+            sent_parts = 0
+    except Exception as e:
+        fanout.record_progress(chunk, sent, failed, cursor)
+        delivery.flush()
+        if self.request.retries < self.max_retries:
+            logger.warning("Fan-out chunk %s stopped at user %s, retrying: %s", chunk_id, cursor, e)
+            countdown = sms.retry_countdown(self.request.retries) if isinstance(e, sms.SMSRateLimited) else None
+            kwargs = {**self.request.kwargs, "sent_parts": getattr(e, "sent_parts", 0)}
+            raise self.retry(exc=e, countdown=countdown, kwargs=kwargs)
+        logger.exception("Fan-out chunk %s failed: %s", chunk_id, e)
+        fanout.close_chunk(chunk, "failed", error=str(e))
+        return f"❌ Chunk {chunk_id} failed: {e}"
+
+    fanout.record_progress(chunk, sent, failed, cursor)
+    fanout.close_chunk(chunk, "done")
+    delivery.flush()
+    return f"✅ Chunk {chunk_id}: {sent} sent, {failed} failed"
+
+
+# ============================================================
+# 📅 NIGHTLY PREDICTIONS — rebuilds CyclePrediction for every user
+# ============================================================
+
+@shared_task(bind=True)
+def rebuild_cycle_predictions(self, chunk_size=None):
+    """
+    Recomputes all users' upcoming cycle windows in vectorized batches.
+    Runs via Celery Beat (configured in celery.py) or on demand.
+    """
+    written = materialize_predictions(chunk_size=chunk_size or DEFAULT_CHUNK_SIZE)
+    return f"✅ Rebuilt predictions for {written} users."
+
+
+# ============================================================
+# 🧹 DELIVERY LOG RETENTION — purges old DeliveryLog rows nightly
+# ============================================================
+
+@shared_task(bind=True)
+def purge_delivery_log(self, days=None):
+    """Deletes delivery log rows older than DELIVERY_LOG_RETENTION_DAYS."""
+    deleted = delivery.purge(days)
+    logger.info("Purged %d delivery log rows.", deleted)
+    return f"✅ Purged {deleted} delivery log rows."
@@ -0,0 +1,73 @@
+# tracker/tests/test_async_summary.py
+from datetime import date
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from tracker.models import CycleRecord, CycleSummary
+from tracker.tasks import generate_cycle_summary
+
+
+class AsyncSummaryTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="amina", password="testpass", first_name="Amina")
+        self.client.force_authenticate(self.user)
+
+    @mock.patch("tracker.views.generate_summary")
+    @mock.patch("tracker.views.generate_cycle_summary.delay")
+    def test_async_mode_returns_prediction_with_summary_id(self, delay, sync_summary):
+        response = self.client.post(
+            reverse("smart-cycle-chat"),
+            {"message": "My period was from Oct 1 to Oct 5", "cycle_length": 28, "async_summary": True},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data["message"])
+        self.assertEqual(response.data["summary_status"], "pending")
+        sync_summary.assert_not_called()
+
+        summary = CycleSummary.objects.get(id=response.data["summary_id"])
+        delay.assert_called_once_with(str(summary.id), False, True)
+
+    @mock.patch.dict("os.environ", {"TEST_MODE": "True"})
+    @mock.patch("tracker.views.generate_cycle_summary.delay")
+    def test_test_mode_logs_the_deferred_sms(self, delay):
+        with self.assertLogs("tracker.views", "INFO") as logs:
+            response = self.client.post(
+                reverse("smart-cycle-chat"),
+                {"message": "My period was from Oct 1 to Oct 5", "cycle_length": 28, "async_summary": True,
+                 "phone_number": "+254700000001", "allow_sms": True},
+                format="json",
+            )
+
+        self.assertIn(
+            f"Would send SMS to +254700000001 once summary {response.data['summary_id']} is ready", logs.output[0],
+        )
+        self.assertNotIn("None", logs.output[0])
+
+    @mock.patch("tracker.tasks.generate_summary", return_value="Hey Amina, here’s your personalized cycle summary.")
+    def test_task_fills_summary_for_polling(self, _):
+        record = CycleRecord.objects.create(
+            user=self.user, start_date=date(2025, 10, 1), end_date=date(2025, 10, 5), cycle_length=28,
+        )
+        summary = CycleSummary.objects.create(user=self.user, record=record)
+
+        generate_cycle_summary.apply(args=(str(summary.id),))
+
+        response = self.client.get(reverse("cycle-summary", args=[summary.id]))
+        self.assertEqual(response.data["status"], "ready")
+        self.assertTrue(response.data["message"].startswith("Hey Amina"))
+
+    def test_summary_of_other_user_is_hidden(self):
+        other = User.objects.create_user(username="other", password="x")
+        record = CycleRecord.objects.create(
+            user=other, start_date=date(2025, 10, 1), end_date=date(2025, 10, 5),
+        )
+        summary = CycleSummary.objects.create(user=other, record=record)
+
+        response = self.client.get(reverse("cycle-summary", args=[summary.id]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,83 @@
+# tracker/tests/test_batch.py
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from tracker.batch import materialize_predictions, refresh_user_prediction
+from tracker.models import CycleRecord, CyclePrediction
+
+
+class MaterializePredictionsTest(TestCase):
+    def setUp(self):
+        self.regular = User.objects.create(username="regular")
+        for start, length in [(date(2025, 7, 1), 30), (date(2025, 8, 1), 26), (date(2025, 9, 1), 29),
+                              (date(2025, 10, 1), 31)]:
+            CycleRecord.objects.create(
+                user=self.regular, start_date=start, end_date=start.replace(day=5), cycle_length=length,
+            )
+        self.newcomer = User.objects.create(username="newcomer")
+        CycleRecord.objects.create(
+            user=self.newcomer, start_date=date(2025, 10, 10), end_date=date(2025, 10, 14), cycle_length=0,
+        )
+        User.objects.create(username="no-records")
+
+    def test_matches_calculate_predictions(self):
+        self.assertEqual(materialize_predictions(chunk_size=1), 2)
+
+        for user in (self.regular, self.newcomer):
+            latest = CycleRecord.objects.filter(user=user).order_by("-created_at", "-id").first()
+            expected = latest.calculate_predictions()
+            row = CyclePrediction.objects.get(user=user)
+            self.assertEqual(row.avg_cycle, expected["avg_cycle"])
+            self.assertEqual(row.next_period_date, expected["next_period"])
+            self.assertEqual(row.ovulation_date, expected["ovulation"])
+            self.assertEqual(
+                f"{row.fertile_start:%b %d} – {row.fertile_end:%b %d}", expected["fertile_window"],
+            )
+            self.assertEqual(
+                f"{row.luteal_start:%b %d} – {row.luteal_end:%b %d}", expected["phases"]["luteal"],
+            )
+
+    def test_rerun_updates_in_place(self):
+        materialize_predictions()
+        CycleRecord.objects.create(
+            user=self.newcomer, start_date=date(2025, 11, 8), end_date=date(2025, 11, 12), cycle_length=29,
+        )
+        materialize_predictions()
+
+        row = CyclePrediction.objects.get(user=self.newcomer)
+        self.assertEqual(CyclePrediction.objects.count(), 2)
+        self.assertEqual(row.next_period_date, date(2025, 12, 7))
+
+
+class RefreshOnChangeTest(TestCase):
+    def test_prediction_follows_records(self):
+        user = User.objects.create(username="tracked")
+        record = CycleRecord.objects.create(
+            user=user, start_date=date(2025, 10, 1), end_date=date(2025, 10, 5), cycle_length=30,
+        )
+        self.assertEqual(CyclePrediction.objects.get(user=user).next_period_date, date(2025, 10, 31))
+
+        record.cycle_length = 28
+        record.save()
+        self.assertEqual(CyclePrediction.objects.get(user=user).next_period_date, date(2025, 10, 29))
+
+        record.delete()
+        self.assertFalse(CyclePrediction.objects.filter(user=user).exists())
+
+    def test_new_records_match_a_full_recompute(self):
+        user = User.objects.create(username="logger")
+        for month, length in ((7, 26), (8, 0), (9, 31), (10, 29)):
+            CycleRecord.objects.create(
+                user=user, start_date=date(2025, month, 3), end_date=date(2025, month, 7), cycle_length=length,
+            )
+        CycleRecord.objects.create(  # back-filled older cycle
+            user=user, start_date=date(2025, 6, 2), end_date=date(2025, 6, 6), cycle_length=27,
+        )
+        from_stats = CyclePrediction.objects.get(user=user)
+        full = refresh_user_prediction(user.id)
+        self.assertEqual(
+            [getattr(from_stats, f) for f in ("avg_cycle", "period_start", "next_period_date", "luteal_end")],
+            [getattr(full, f) for f in ("avg_cycle", "period_start", "next_period_date", "luteal_end")],
+        )
@@ -1,3 +1,8 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import override_settings
+from django.utils import timezone
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
@@ -5,12 +10,13 @@ from django.contrib.auth.models import User
 from tracker.models import CycleRecord
 
 
+@override_settings(LLM_BACKEND="fake", FAKE_LLM_LATENCY_MS=0, FAKE_LLM_JITTER_MS=0, SMS_BACKEND="memory")
 class ChatAPITest(APITestCase):
     def setUp(self):
         self.user = User.objects.create_user(username="testuser", password="testpass")
         # ✅ Updated URL name
         self.url = reverse("smart-cycle-chat")
-        self.client.login(username="testuser", password="testpass")
+        self.client.force_authenticate(self.user)  # the API takes JWTs, not session logins
 
     def test_valid_chat_request(self):
         """POST: Valid data returns predictions"""
@@ -21,6 +27,21 @@ class ChatAPITest(APITestCase):
         self.assertIn(response.status_code, [status.HTTP_200_OK, status.HTTP_201_CREATED])
         self.assertIn("next_period", response.data)
 
+    @mock.patch("tracker.views.queue_summary_sms")
+    def test_stats_and_profile_are_read_once(self, _):
+        def message(start):
+            return f"My period was from {start:%b %d} to {start + timedelta(days=4):%b %d}"
+
+        today = timezone.localdate()
+        data = {"message": message(today - timedelta(days=40)), "cycle_length": 28,
+                "phone_number": "+254700000001", "allow_sms": True}
+        self.client.post(self.url, data, format="json")
+        data["message"] = message(today - timedelta(days=10))
+        # stats read, record insert, stats update, prediction upsert (in one transaction), profile read
+        with self.assertNumQueries(7):
+            response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
     def test_missing_message_field(self):
         """POST: Missing message should fail"""
         data = {"cycle_length": 28}
@@ -0,0 +1,86 @@
+# tracker/tests/test_delivery.py
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from tracker import delivery, sms
+from tracker.models import DeliveryLog
+from tracker.tasks import schedule_cycle_reminders, send_sms_reminder, send_welcome_message
+from users.models import UserProfile
+
+
+@override_settings(SMS_BACKEND="memory", DELIVERY_LOG_BATCH_SIZE=3)
+class DeliveryLogTest(APITestCase):
+    def setUp(self):
+        sms.outbox.clear()
+        delivery.reset()
+        self.user = User.objects.create_user(username="amina", password="testpass", first_name="Amina")
+        UserProfile.objects.create(user=self.user, phone_number="+254700000001", allow_sms=True)
+
+    def test_send_tasks_do_not_store_results(self):
+        for task in (send_sms_reminder, send_welcome_message, schedule_cycle_reminders):
+            self.assertTrue(task.ignore_result, task.name)
+
+    def test_each_delivery_is_logged(self):
+        send_sms_reminder.apply(args=(self.user.id, "Your period is expected in 2 days.", "period"))
+        send_sms_reminder.apply(args=(self.user.id + 100, "Hi"))
+        self.assertFalse(DeliveryLog.objects.exists())  # waiting for a full batch
+
+        self.assertEqual(delivery.flush(), 2)
+        sent, skipped = DeliveryLog.objects.order_by("id")
+        self.assertEqual((sent.user_id, sent.kind, sent.status, sent.segments), (self.user.id, "period", "sent", 1))
+        self.assertEqual(sent.provider_sid, sms.outbox[0]["sid"])
+        self.assertEqual((skipped.kind, skipped.status, skipped.error), ("sms", "skipped", "user not found"))
+
+    def test_rows_are_written_in_batches(self):
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(7):
+                delivery.record(self.user.id, "weekly_tip", "sent", segments=1)
+        self.assertEqual(len(queries), 2)  # two full batches of 3
+        self.assertEqual(DeliveryLog.objects.count(), 6)
+        self.assertEqual(delivery.flush(), 1)
+        self.assertEqual(DeliveryLog.objects.count(), 7)
+
+    @override_settings(DELIVERY_LOG_FLUSH_SECONDS=10)
+    def test_rows_wait_at_most_the_flush_interval(self):
+        with mock.patch("tracker.delivery.time.monotonic", return_value=0):
+            send_sms_reminder.apply(args=(self.user.id, "One"))
+        with mock.patch("tracker.delivery.time.monotonic", return_value=5):
+            send_sms_reminder.apply(args=(self.user.id, "Two"))
+        self.assertFalse(DeliveryLog.objects.exists())
+        with mock.patch("tracker.delivery.time.monotonic", return_value=10):
+            send_sms_reminder.apply(args=(self.user.id, "Three"))
+        self.assertEqual(DeliveryLog.objects.count(), 3)
+
+    def test_purge_keeps_recent_rows(self):
+        DeliveryLog.objects.bulk_create([
+            DeliveryLog(kind="sms", status="sent", created_at=timezone.now() - timedelta(days=age))
+            for age in (1, 89, 91, 200)
+        ])
+        self.assertEqual(delivery.purge(days=90, batch_size=1), 2)
+        self.assertEqual(DeliveryLog.objects.count(), 2)
+
+    def test_stats_endpoint_aggregates_for_staff(self):
+        for segments, latency in ((1, 100), (3, 300)):
+            delivery.record(self.user.id, "weekly_tip", "sent", segments=segments, latency_ms=latency)
+        delivery.record(self.user.id, "weekly_tip", "failed")
+        delivery.flush()
+
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(reverse("delivery-stats")).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse("delivery-stats"), {"kind": "weekly_tip"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        failed, sent = response.data["rows"]
+        self.assertEqual((failed["status"], failed["count"]), ("failed", 1))
+        self.assertEqual((sent["count"], sent["segments"], sent["avg_latency_ms"]), (2, 4, 200))
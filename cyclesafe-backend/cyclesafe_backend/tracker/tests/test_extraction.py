@@ -0,0 +1,100 @@
+# tracker/tests/test_extraction.py
+from datetime import date
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from cyclesafe_backend import metrics
+from tracker.extraction import ExtractionError, parse_period_message, extract_period_data
+
+TODAY = date(2025, 10, 20)  # a Monday
+
+
+class ParsePeriodMessageTest(SimpleTestCase):
+    def assertParsed(self, message, start, end, cycle_length=None):
+        self.assertEqual(
+            parse_period_message(message, TODAY),
+            {"start_date": start, "end_date": end, "cycle_length": cycle_length},
+        )
+
+    def test_month_name_range(self):
+        self.assertParsed("My period was from Oct 1 to Oct 5", "2025-10-01", "2025-10-05")
+        self.assertParsed("Oct 1-5", "2025-10-01", "2025-10-05")
+        self.assertParsed("1st to 5th of October", "2025-10-01", "2025-10-05")
+
+    def test_iso_dates_and_cycle_length(self):
+        self.assertParsed(
+            "period started 2025-10-01 and ended 2025-10-06, my cycle is 30 days",
+            "2025-10-01", "2025-10-06", 30,
+        )
+        self.assertParsed("Sept 30 - Oct 4, 28-day cycle", "2025-09-30", "2025-10-04", 28)
+
+    def test_relative_dates(self):
+        self.assertParsed("started 3 days ago and lasted 5 days", "2025-10-17", "2025-10-21")
+        self.assertParsed("It began last Monday and lasted 4 days", "2025-10-13", "2025-10-16")
+
+    def test_year_rollover(self):
+        self.assertParsed("from Dec 28 to Jan 2", "2024-12-28", "2025-01-02")
+        self.assertParsed("Oct 18 to Oct 22", "2025-10-18", "2025-10-22")
+
+    def test_not_confident(self):
+        for message in [
+            "hello",
+            "03/04 to 07/04",          # day/month order ambiguous
+            "started yesterday",        # no end date or duration
+            "Oct 1 to Oct 30",          # too long for a period
+            "Oct 1 to Oct 5, cycle 99 days",
+        ]:
+            self.assertIsNone(parse_period_message(message, TODAY), message)
+
+
+class ExtractPeriodDataTest(SimpleTestCase):
+    def setUp(self):
+        metrics.reset("tracker.extraction.")
+
+    @mock.patch("tracker.extraction._extract_with_ai")
+    def test_local_hit_skips_ai(self, ai):
+        data = extract_period_data("My period was from Oct 1 to Oct 5")
+        self.assertEqual(data["end_date"][5:], "10-05")
+        ai.assert_not_called()
+        self.assertEqual(metrics.get("tracker.extraction.local_hit"), 1)
+
+    @mock.patch("tracker.extraction._extract_with_ai", return_value={"start_date": "2025-10-01"})
+    def test_miss_falls_back_to_ai(self, ai):
+        extract_period_data("it came around the start of the month")
+        ai.assert_called_once()
+        self.assertEqual(metrics.get("tracker.extraction.local_miss"), 1)
+
+
+class StructuredExtractionTest(SimpleTestCase):
+    def setUp(self):
+        metrics.reset("tracker.extraction.")
+
+    @mock.patch("tracker.extraction.llm.complete", return_value=(
+        '{"start_date": "2025-10-01", "end_date": "2025-10-05", "cycle_length": null}'
+    ))
+    def test_schema_constrained_call(self, complete):
+        data = extract_period_data("it came around the start of the month")
+
+        self.assertEqual(data, {"start_date": "2025-10-01", "end_date": "2025-10-05", "cycle_length": None})
+        self.assertEqual(complete.call_args.kwargs["response_format"]["type"], "json_schema")
+        self.assertEqual(metrics.get("tracker.extraction.parse_failure"), 0)
+
+    @mock.patch("tracker.extraction.llm.complete", side_effect=[
+        '{"start_date": "Oct 1", "end_date": "2025-10-05", "cycle_length": null}',
+        '```json\n{"start_date": "2025-10-01", "end_date": "2025-10-05", "cycle_length": 29}\n```',
+    ])
+    def test_one_repair_attempt(self, complete):
+        data = extract_period_data("it came around the start of the month")
+
+        self.assertEqual(data["cycle_length"], 29)
+        self.assertIn("start_date", complete.call_args.args[1][-1]["content"])
+        self.assertEqual(metrics.get("tracker.extraction.parse_failure"), 1)
+        self.assertEqual(metrics.get("tracker.extraction.repair_success"), 1)
+
+    @mock.patch("tracker.extraction.llm.complete", return_value="not json")
+    def test_gives_up_after_repair(self, complete):
+        with self.assertRaises(ExtractionError):
+            extract_period_data("it came around the start of the month")
+        self.assertEqual(complete.call_count, 2)
+        self.assertEqual(metrics.get("tracker.extraction.repair_failure"), 1)
@@ -0,0 +1,85 @@
+from datetime import timedelta
+from unittest import mock
+
+from celery import current_app
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from tracker import delivery, fanout, sms
+from tracker.models import CycleRecord, DeliveryLog, FanoutRun
+from tracker.tasks import (
+    _send_once, check_and_send_daily_reminders, dispatch_due_reminders, resume_fanout, send_weekly_health_tip,
+)
+from users.models import UserProfile
+
+
+@override_settings(SMS_FANOUT=True, SMS_FANOUT_CHUNK_SIZE=2, SMS_BACKEND="memory", SMS_COMPACT=False)
+class FanoutTest(TestCase):
+    def setUp(self):
+        sms.outbox.clear()
+        delivery.reset()
+        self._eager = current_app.conf.task_always_eager
+        current_app.conf.task_always_eager = True
+        self.users = []
+        for i in range(5):
+            user = User.objects.create(username=f"fan{i}")
+            UserProfile.objects.create(user=user, phone_number=f"+25470000000{i}", allow_sms=i != 3)
+            self.users.append(user)
+
+    def tearDown(self):
+        current_app.conf.task_always_eager = self._eager
+
+    def test_weekly_tip_is_sent_in_chunks(self):
+        send_weekly_health_tip.apply()
+
+        run = FanoutRun.objects.get()
+        self.assertEqual((run.kind, run.status), ("weekly_tip", "done"))
+        self.assertEqual(run.total_chunks, 3)
+        self.assertEqual(run.progress, 1.0)
+        self.assertEqual(run.sent, 4)
+        self.assertEqual(sorted(m["to"] for m in sms.outbox), ["+254700000000", "+254700000001",
+                                                               "+254700000002", "+254700000004"])
+        self.assertIn(run.payload["tips"]["unknown"], sms.outbox[0]["body"])  # no cycle records yet
+        self.assertEqual(DeliveryLog.objects.filter(kind="weekly_tip").count(), 4)  # written per chunk
+
+    def test_chunk_loads_recipients_in_one_query(self):
+        run = fanout.create_run("weekly_tip", {"tip": "Drink water"})
+        chunk = run.chunks.order_by("lo_id").first()
+        with self.assertNumQueries(1):
+            self.assertEqual(len(list(fanout.chunk_messages(chunk))), 2)
+
+    def test_daily_reminders_go_through_the_reminder_table(self):
+        start = timezone.localdate() + timedelta(days=2 - 28)
+        CycleRecord.objects.create(user=self.users[1], start_date=start, end_date=start + timedelta(days=4))
+
+        slot = self.users[1].profile.reminder_time(timezone.localdate())
+        check_and_send_daily_reminders.apply(args=(slot.isoformat(),))
+        dispatch_due_reminders.apply(args=(slot.isoformat(),))
+
+        self.assertFalse(FanoutRun.objects.exists())
+        self.assertEqual(len(sms.outbox), 1)
+        self.assertIn("period is expected in 2 days", sms.outbox[0]["body"])
+
+    def test_failed_chunk_resumes_after_its_cursor(self):
+        broken = {"+254700000001"}
+
+        def flaky_send(to, body):
+            if to in broken:
+                raise RuntimeError("carrier down")
+            return _send_once(to, body)
+
+        with mock.patch("tracker.tasks._send_once", side_effect=flaky_send):
+            send_weekly_health_tip.apply()
+            run = FanoutRun.objects.get()
+            self.assertEqual(run.status, "failed")
+            self.assertEqual(run.failed_chunks, 1)
+
+            broken.clear()
+            resume_fanout(run.id)
+
+        run.refresh_from_db()
+        self.assertEqual((run.status, run.failed_chunks, run.done_chunks), ("done", 0, 3))
+        recipients = [m["to"] for m in sms.outbox]
+        self.assertEqual(len(recipients), len(set(recipients)))  # nobody messaged twice
+        self.assertEqual(run.sent, 4)
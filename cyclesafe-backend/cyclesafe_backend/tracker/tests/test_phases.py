@@ -0,0 +1,59 @@
+# tracker/tests/test_phases.py
+from datetime import date, timedelta
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from tracker import fanout, phases
+from tracker.models import CycleRecord
+from users.models import UserProfile
+
+
+class ClassifyTest(SimpleTestCase):
+    def test_phases_over_one_cycle(self):
+        start = date(2025, 3, 1)  # 28-day cycle, 5 days of bleeding: ovulation on day 14
+        days = [start + timedelta(days=d) for d in range(28)]
+        result = [phases.classify([start], [start + timedelta(days=4)], [28], day)[0] for day in days]
+
+        self.assertEqual(result[:5], ["menstrual"] * 5)
+        self.assertEqual(result[5:9], ["follicular"] * 4)
+        self.assertEqual(result[9:16], ["ovulation"] * 7)  # fertile window
+        self.assertEqual(result[16:], ["luteal"] * 12)
+
+    def test_old_periods_are_projected_forward(self):
+        start = np.array(["2025-01-01", "2025-01-01"], dtype="datetime64[D]")
+        end = start + np.timedelta64(4, "D")
+        today = date(2025, 1, 1) + timedelta(days=30 * 3 + 2)  # day 2 of a 30-day cycle, day 8 of a 21-day one
+        self.assertEqual(list(phases.classify(start, end, [30, 21], today)), ["menstrual", "ovulation"])
+
+    def test_vectorized_over_many_users(self):
+        n = 100_000
+        start = np.datetime64("2025-01-01") + np.arange(n) % 28
+        result = phases.classify(start, start + 4, np.full(n, 28), date(2025, 2, 1))
+        self.assertEqual(len(result), n)
+        self.assertEqual(set(result), set(phases.PHASES))
+
+
+@override_settings(SMS_COMPACT=False)
+class PhaseTipTest(TestCase):
+    def test_chunk_tips_follow_each_users_phase_in_one_query(self):
+        today = date.today()
+        for name, days_ago in (("bleeding", 1), ("luteal", 20), ("new", None)):
+            user = User.objects.create(username=name, first_name=name.title())
+            UserProfile.objects.create(user=user, phone_number="+254700000001", allow_sms=True)
+            if days_ago is not None:
+                start = today - timedelta(days=days_ago)
+                CycleRecord.objects.create(user=user, start_date=start, end_date=start + timedelta(days=4))
+
+        tips = {phase: f"{phase} tip" for phase in ("menstrual", "follicular", "ovulation", "luteal", "unknown")}
+        run = fanout.create_run("weekly_tip", {"tips": tips, "day": today.isoformat()}, chunk_size=100)
+        chunk = run.chunks.select_related("run").get()
+        with self.assertNumQueries(1):
+            texts = [text for _, _, _, text in fanout.chunk_messages(chunk)]
+
+        self.assertIn("menstrual phase", texts[0])
+        self.assertTrue(texts[0].endswith("menstrual tip"))
+        self.assertTrue(texts[1].endswith("luteal tip"))
+        self.assertTrue(texts[2].endswith("unknown tip"))
+        self.assertNotIn("phase", texts[2])
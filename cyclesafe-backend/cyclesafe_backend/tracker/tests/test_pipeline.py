@@ -0,0 +1,79 @@
+# tracker/tests/test_pipeline.py
+from unittest import mock
+
+from celery import current_app
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from tracker import delivery, recipients, sms
+from tracker.models import DeliveryLog
+from tracker.tasks import deliver_sms, queue_summary_sms
+from users.models import UserProfile
+
+
+@override_settings(SMS_BACKEND="memory", SMS_COMPACT=False)
+class DeliveryPipelineTest(TestCase):
+    def setUp(self):
+        sms.outbox.clear()
+        cache.clear()
+        delivery.reset()
+        self.user = User.objects.create_user(username="amina", password="testpass", first_name="Amina")
+        self.profile = UserProfile.objects.create(user=self.user, phone_number="0700 000 001", allow_sms=True)
+
+    def test_welcome_is_one_task_with_the_resolved_recipient(self):
+        with mock.patch("tracker.tasks.deliver_sms.delay") as delay:
+            queue_summary_sms(self.user, "Your cycle is 28 days.", True, self.profile)
+
+        (recipient, text, kind), = [call.args for call in delay.call_args_list]
+        self.assertEqual(recipient, {"user_id": self.user.id, "to": "+0700000001", "name": "Amina", "allow_sms": True})
+        self.assertEqual((text, kind), ("Your cycle is 28 days.", "welcome"))
+
+    def test_send_composes_welcome_and_logs_it(self):
+        eager = current_app.conf.task_always_eager
+        current_app.conf.task_always_eager = True
+        try:
+            queue_summary_sms(self.user, "Your cycle is 28 days.", True, self.profile)
+        finally:
+            current_app.conf.task_always_eager = eager
+
+        sent, = sms.outbox
+        self.assertEqual(sent["to"], "+0700000001")
+        self.assertIn("Welcome to", sent["body"])
+        self.assertIn("Amina", sent["body"])
+        self.assertIn("Your cycle is 28 days.", sent["body"])
+        delivery.flush()
+        self.assertEqual(DeliveryLog.objects.get().kind, "welcome")
+
+    def test_consent_is_cached_between_sends(self):
+        recipient = recipients.resolve(self.user, self.profile)
+        deliver_sms.apply(args=(recipient, "Tip one", "weekly_tip"))
+        with CaptureQueriesContext(connection) as queries:
+            deliver_sms.apply(args=(recipient, "Tip two", "weekly_tip"))
+        reads = [q["sql"] for q in queries if q["sql"].startswith("SELECT")]
+        self.assertEqual(reads, [])
+        self.assertEqual(len(sms.outbox), 2)
+
+    def test_opt_out_after_queueing_is_respected(self):
+        recipient = recipients.resolve(self.user, self.profile)
+        recipients.consent(self.user.id)  # warm the cache
+        self.profile.allow_sms = False
+        self.profile.save()
+
+        deliver_sms.apply(args=(recipient, "Your period is expected in 2 days.", "period"))
+
+        self.assertEqual(sms.outbox, [])
+        delivery.flush()
+        skipped = DeliveryLog.objects.get()
+        self.assertEqual((skipped.kind, skipped.status), ("period", "skipped"))
+
+    def test_changed_number_is_used(self):
+        recipient = recipients.resolve(self.user, self.profile)
+        self.profile.phone_number = "+254711111111"
+        self.profile.save()
+
+        deliver_sms.apply(args=(recipient, "Hi", "sms"))
+
+        self.assertEqual(sms.outbox[0]["to"], "+254711111111")
@@ -0,0 +1,151 @@
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from unittest import mock
+from zoneinfo import ZoneInfo
+
+from celery import current_app
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from tracker.models import CycleRecord, ScheduledReminder
+from tracker import sms, windows
+from tracker.tasks import check_and_send_daily_reminders, dispatch_due_reminders, refresh_reminder_slots
+from users.models import UserProfile, reminder_minute_utc
+
+
+@override_settings(SMS_FANOUT=False)
+class DailyReminderSweepTest(TestCase):
+    def _user(self, name, next_period_in, allow_sms=True, phone="+254700000001", tz="Africa/Nairobi"):
+        user = User.objects.create(username=name, first_name=name.title())
+        UserProfile.objects.create(
+            user=user, phone_number=phone, allow_sms=allow_sms, timezone=tz,
+            reminder_window_start=time(8, 0), reminder_window_end=time(8, 1),  # everyone at 08:00 local
+        )
+        start = timezone.localdate() + timedelta(days=next_period_in - 28)
+        CycleRecord.objects.create(user=user, start_date=start, end_date=start + timedelta(days=4), cycle_length=28)
+        return user
+
+    def test_only_due_users_are_loaded(self):
+        due = self._user("due", next_period_in=2)
+        ovulating = self._user("ovulating", next_period_in=16)  # ovulation 14 days before the next period
+        self._user("later", next_period_in=10)
+        self._user("opted-out", next_period_in=2, allow_sms=False)
+        self._user("no-phone", next_period_in=2, phone="")
+
+        at = datetime.combine(timezone.localdate(), time(8, 0), ZoneInfo("Africa/Nairobi"))
+        with self.assertNumQueries(3):
+            result = check_and_send_daily_reminders.apply(args=(at.isoformat(),)).result
+
+        self.assertIn("2 scheduled", result)
+        scheduled = {r.user_id: r for r in ScheduledReminder.objects.all()}
+        self.assertEqual(set(scheduled), {due.id, ovulating.id})
+        self.assertEqual((scheduled[due.id].kind, scheduled[ovulating.id].kind), ("period", "ovulation"))
+        self.assertIn("period is expected in 2 days", scheduled[due.id].message)
+        self.assertIn("ovulation is in 2 days", scheduled[ovulating.id].message)
+        self.assertEqual({r.send_at for r in scheduled.values()}, {at})
+        self.assertEqual({r.status for r in scheduled.values()}, {"pending"})
+
+    def test_sweeping_a_slice_twice_schedules_once(self):
+        self._user("due", next_period_in=2)
+        at = datetime.combine(timezone.localdate(), time(8, 0), ZoneInfo("Africa/Nairobi"))
+        check_and_send_daily_reminders.apply(args=(at.isoformat(),))
+        ScheduledReminder.objects.update(status="sent")
+
+        result = check_and_send_daily_reminders.apply(args=(at.isoformat(),)).result
+
+        self.assertIn("0 scheduled", result)
+        self.assertEqual(ScheduledReminder.objects.get().status, "sent")
+
+    def test_users_are_reminded_in_their_own_window(self):
+        lagos = self._user("lagos", next_period_in=2, tz="Africa/Lagos")  # UTC+1, two hours after Nairobi
+        nairobi_8am = datetime.combine(timezone.localdate(), time(8, 0), ZoneInfo("Africa/Nairobi"))
+
+        check_and_send_daily_reminders.apply(args=(nairobi_8am.isoformat(),))
+        self.assertFalse(ScheduledReminder.objects.exists())
+
+        check_and_send_daily_reminders.apply(args=((nairobi_8am + timedelta(hours=2)).isoformat(),))
+        reminder = ScheduledReminder.objects.get()
+        self.assertEqual((reminder.user_id, reminder.send_at), (lagos.id, nairobi_8am + timedelta(hours=2)))
+
+    def test_slots_are_spread_over_the_window(self):
+        users = [User.objects.create(username=f"spread{i}") for i in range(12)]
+        profiles = [UserProfile.objects.create(user=u, reminder_window_start=time(7, 0)) for u in users]
+        minutes = {p.reminder_minute_utc for p in profiles}
+        self.assertEqual(len(minutes), 12)
+        self.assertTrue(all(4 * 60 <= m < 7 * 60 for m in minutes))  # 07:00-10:00 Nairobi in UTC
+        slices = {windows.current_slice(p.reminder_time(timezone.localdate()))[1] for p in profiles}
+        self.assertGreater(len(slices), 1)
+
+
+class DaylightSavingTest(TestCase):
+    def _profile(self, name, tz):
+        return UserProfile.objects.create(
+            user=User.objects.create(username=name), timezone=tz,
+            reminder_window_start=time(8, 0), reminder_window_end=time(8, 1),
+        )
+
+    def test_slot_stays_at_8am_local_across_the_clock_change(self):
+        new_york = self._profile("new-york", "America/New_York")
+        nairobi = self._profile("nairobi", "Africa/Nairobi")
+        before = datetime(2026, 3, 6, 14, 0, tzinfo=dt_timezone.utc)  # EST (UTC-5); clocks go forward on Mar 8
+        UserProfile.objects.filter(pk=new_york.pk).update(reminder_minute_utc=reminder_minute_utc(
+            new_york.user_id, new_york.timezone, time(8, 0), time(8, 1), now=before,
+        ))
+        UserProfile.objects.filter(pk=nairobi.pk).update(reminder_minute_utc=1)  # no DST: never recomputed
+        self.assertEqual(UserProfile.objects.get(pk=new_york.pk).reminder_minute_utc, 13 * 60)
+
+        # after the Mar 7 reminder, the next one (Mar 8) is at 08:00 EDT = 12:00 UTC
+        result = refresh_reminder_slots.apply(args=("2026-03-07T14:00:00+00:00",)).result
+        self.assertIn("Moved 1 reminder slots", result)
+        self.assertEqual(UserProfile.objects.get(pk=new_york.pk).reminder_minute_utc, 12 * 60)
+        self.assertEqual(UserProfile.objects.get(pk=nairobi.pk).reminder_minute_utc, 1)
+
+        # and back to 13:00 UTC when the clocks go back on Nov 1
+        refresh_reminder_slots.apply(args=("2026-10-31T14:00:00+00:00",))
+        self.assertEqual(UserProfile.objects.get(pk=new_york.pk).reminder_minute_utc, 13 * 60)
+        self.assertIn("Moved 0", refresh_reminder_slots.apply(args=("2026-10-31T15:00:00+00:00",)).result)
+
+
+@override_settings(SMS_FANOUT=False, SMS_BACKEND="memory")
+class OneReminderPerEventTest(APITestCase):
+    def setUp(self):
+        sms.outbox.clear()
+        self._eager = current_app.conf.task_always_eager
+        current_app.conf.task_always_eager = True
+        self.user = User.objects.create_user(username="wanjiru", password="testpass", first_name="Wanjiru")
+        UserProfile.objects.create(
+            user=self.user, phone_number="+254700000002", allow_sms=True, timezone="Africa/Nairobi",
+            reminder_window_start=time(8, 0), reminder_window_end=time(8, 1),
+        )
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        current_app.conf.task_always_eager = self._eager
+
+    @mock.patch("tracker.views.queue_summary_sms")
+    @mock.patch("tracker.views.generate_summary", return_value="Summary")
+    @mock.patch("tracker.views.extract_period_data")
+    def test_each_event_is_reminded_once_from_the_prediction(self, extract, *_):
+        today = timezone.localdate()
+        for days_ago in (78, 52):
+            start = today - timedelta(days=days_ago)
+            CycleRecord.objects.create(user=self.user, start_date=start, end_date=start + timedelta(days=4), cycle_length=26)
+        # this cycle says 32 days, but the prediction averages the last 3 (28): next period in 2 days
+        start = today - timedelta(days=26)
+        extract.return_value = {"start_date": str(start), "end_date": str(start + timedelta(days=4))}
+
+        self.client.post(
+            reverse("smart-cycle-chat"),
+            {"message": "period", "cycle_length": 32, "phone_number": "+254700000002", "allow_sms": True},
+            format="json",
+        )
+        at = datetime.combine(today, time(8, 0), ZoneInfo("Africa/Nairobi"))
+        check_and_send_daily_reminders.apply(args=(at.isoformat(),))
+        dispatch_due_reminders.apply(args=(at.isoformat(),))
+
+        bodies = [m["body"] for m in sms.outbox if m["to"] == "+254700000002"]
+        self.assertEqual(sum("period is expected in 2 days" in b for b in bodies), 1)
+        self.assertEqual(sum("ovulation" in b for b in bodies), 0)
+        self.assertEqual(ScheduledReminder.objects.get(user=self.user).status, "sent")
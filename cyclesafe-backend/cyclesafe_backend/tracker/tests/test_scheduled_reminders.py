@@ -0,0 +1,64 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from tracker import reminders, sms
+from tracker.models import ScheduledReminder
+from tracker.tasks import dispatch_due_reminders, schedule_cycle_reminders, send_reminder_batch
+from users.models import UserProfile
+
+
+@override_settings(SMS_BACKEND="memory", SCHEDULED_REMINDER_LEASE=600)
+class ScheduledReminderTest(TestCase):
+    def setUp(self):
+        sms.outbox.clear()
+        self.user = User.objects.create(username="planner")
+        UserProfile.objects.create(user=self.user, phone_number="+254700000010", allow_sms=True)
+
+    def test_cycle_reminders_are_left_to_the_daily_sweep(self):
+        today = timezone.localdate()
+        from_sweep = reminders.schedule(self.user.id, "period", timezone.now() + timedelta(minutes=5), "Soon")
+
+        schedule_cycle_reminders.apply(args=(self.user.id, str(today + timedelta(days=20)), str(today + timedelta(days=6))))
+
+        from_sweep.refresh_from_db()
+        self.assertEqual(from_sweep.status, "pending")
+        self.assertEqual(ScheduledReminder.objects.count(), 1)
+
+    def test_due_rows_are_claimed_once(self):
+        now = timezone.now()
+        due = reminders.schedule(self.user.id, "period", now - timedelta(minutes=1), "Soon")
+        later = reminders.schedule(self.user.id, "ovulation", now + timedelta(days=3), "Later")
+
+        self.assertEqual(reminders.claim_due(10, now=now), [due.id])
+        self.assertEqual(reminders.claim_due(10, now=now), [])
+        # a claim whose worker died is picked up again after the lease
+        self.assertEqual(reminders.claim_due(10, now=now + timedelta(minutes=11)), [due.id])
+        later.refresh_from_db()
+        self.assertEqual(later.status, "pending")
+
+    @mock.patch("tracker.tasks.send_reminder_batch.delay", side_effect=lambda ids: send_reminder_batch.apply(args=(ids,)))
+    def test_dispatch_sends_due_reminders(self, delay):
+        reminders.schedule(self.user.id, "period", timezone.now() - timedelta(minutes=1), "Your period is close")
+
+        dispatch_due_reminders.apply()
+
+        reminder = ScheduledReminder.objects.get(user=self.user)
+        self.assertEqual(reminder.status, "sent")
+        self.assertIsNotNone(reminder.sent_at)
+        self.assertEqual(len(sms.outbox), 1)
+        self.assertIn("Your period is close", sms.outbox[0]["body"])
+
+    @mock.patch("tracker.tasks._split_and_send", side_effect=sms.SMSRateLimited("429"))
+    def test_rate_limited_reminder_is_requeued(self, send):
+        reminder = reminders.schedule(self.user.id, "period", timezone.now() - timedelta(minutes=1), "Hi")
+        ids = reminders.claim_due(10)
+
+        send_reminder_batch.apply(args=(ids,))
+
+        reminder.refresh_from_db()
+        self.assertEqual(reminder.status, "pending")
+        self.assertGreater(reminder.send_at, timezone.now())
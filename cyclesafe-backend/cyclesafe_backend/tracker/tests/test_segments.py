@@ -0,0 +1,56 @@
+from django.test import SimpleTestCase, override_settings
+
+from cyclesafe_backend import metrics
+from tracker import segments, sms
+from tracker.messages import branded, period_reminder
+from tracker.tasks import _split_and_send
+
+
+class SegmentMathTest(SimpleTestCase):
+    def test_encoding_and_counts(self):
+        self.assertEqual(segments.encoding("Hello [you]"), "GSM-7")
+        self.assertEqual(segments.units("a{b}"), 6)  # extended characters take two septets
+        self.assertEqual(segments.segment_count("a" * 160), 1)
+        self.assertEqual(segments.segment_count("a" * 161), 2)
+        self.assertEqual(segments.segment_count("a" * 307), 3)
+
+        self.assertEqual(segments.encoding("Hi 💗"), "UCS-2")
+        self.assertEqual(segments.units("💗"), 2)  # surrogate pair
+        self.assertEqual(segments.segment_count("é" * 150 + "💗"), 1 + 2)  # 152 units > 70 -> ceil(152 / 67)
+
+    def test_compaction_only_when_it_saves_segments(self):
+        user = type("U", (), {"first_name": "Amina", "username": "amina"})()
+        message = branded(period_reminder(user))
+        self.assertEqual(segments.segment_count(message), 2)
+
+        compacted = segments.compact_if_smaller(message)
+        self.assertEqual(segments.encoding(compacted), "GSM-7")
+        self.assertEqual(segments.segment_count(compacted), 1)
+        self.assertIn("Hey Amina, your period is expected in 2 days", compacted)
+
+        greek = "Привет 💗"  # stays UCS-2 either way
+        self.assertEqual(segments.compact_if_smaller(greek), greek)
+
+    def test_split_on_word_boundaries(self):
+        text = " ".join(f"word{i}" for i in range(100))
+        parts = segments.split(text, max_segments=1)
+        self.assertTrue(all(segments.units(p) <= 160 for p in parts))
+        self.assertEqual(" ".join(parts), text)
+
+        self.assertEqual(segments.split("short", max_segments=1), ["short"])
+        long_word = segments.split("x" * 400, max_segments=2)
+        self.assertEqual([len(p) for p in long_word], [306, 94])
+
+
+@override_settings(SMS_BACKEND="memory", SMS_COMPACT=True, SMS_MAX_SEGMENTS=1)
+class SplitAndSendTest(SimpleTestCase):
+    def setUp(self):
+        sms.outbox.clear()
+        metrics.reset("sms.")
+
+    def test_parts_and_segment_metrics(self):
+        _split_and_send("+254700000001", "💗 " + "tip " * 60)
+        self.assertEqual(len(sms.outbox), 2)
+        self.assertEqual(metrics.get("sms.compacted"), 1)
+        self.assertEqual(metrics.get("sms.messages.gsm7"), 2)
+        self.assertEqual(metrics.get("sms.segments"), 2)
@@ -0,0 +1,99 @@
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from twilio.base.exceptions import TwilioRestException
+
+from tracker import sms
+from tracker.tasks import send_sms_reminder
+from users.models import UserProfile
+
+
+class SMSBackendTest(TestCase):
+    def setUp(self):
+        sms.outbox.clear()
+
+    @override_settings(SMS_BACKEND="memory")
+    def test_reminder_goes_to_memory_outbox(self):
+        user = User.objects.create_user(username="smsuser", password="testpass")
+        UserProfile.objects.create(user=user, phone_number="0712 345 678", allow_sms=True)
+
+        result = send_sms_reminder.apply(args=(user.id, "Your period is expected in 2 days.")).result
+
+        self.assertTrue(result.startswith("✅"))
+        self.assertEqual(len(sms.outbox), 1)
+        self.assertEqual(sms.outbox[0]["to"], "+0712345678")
+        self.assertIn("Your period is expected in 2 days.", sms.outbox[0]["body"])
+
+    @override_settings(SMS_BACKEND="memory", SMS_COMPACT=False, SMS_MAX_SEGMENTS=1)
+    def test_rate_limited_part_resumes_without_resending(self):
+        user = User.objects.create_user(username="longsms", password="testpass")
+        UserProfile.objects.create(user=user, phone_number="+254700000008", allow_sms=True)
+        calls = []
+
+        def send_once(to, body):
+            calls.append(body)
+            if len(calls) == 2:
+                raise sms.SMSRateLimited("429")
+            return sms.send(to, body)
+
+        with mock.patch("tracker.tasks._send_once", side_effect=send_once):
+            send_sms_reminder.apply(args=(user.id, " ".join(f"tip{i}" for i in range(100))))
+
+        bodies = [m["body"] for m in sms.outbox]
+        self.assertGreater(len(bodies), 2)
+        self.assertEqual(len(bodies), len(set(bodies)))  # every part went out once
+        self.assertEqual(calls[1], calls[2])  # the retry started at the part that was refused
+
+    def test_file_backend_appends_json_lines(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "outbox.jsonl")
+            with override_settings(SMS_BACKEND="file", SMS_FILE_PATH=path):
+                sms.send("+254700000001", "one")
+                sms.send("+254700000002", "two")
+            with open(path, encoding="utf-8") as f:
+                lines = [json.loads(line) for line in f]
+        self.assertEqual([line["body"] for line in lines], ["one", "two"])
+
+    @override_settings(SMS_BACKEND="carrier-pigeon")
+    def test_unknown_backend(self):
+        with self.assertRaises(RuntimeError):
+            sms.send("+254700000001", "hi")
+
+
+TWILIO_ENV = {"TWILIO_ACCOUNT_SID": "AC123", "TWILIO_AUTH_TOKEN": "secret", "TWILIO_PHONE_NUMBER": "+15550000000"}
+
+
+@override_settings(SMS_BACKEND="twilio", SMS_RATE_LIMIT=0)
+@mock.patch.dict(os.environ, TWILIO_ENV)
+class TwilioBackendTest(TestCase):
+    def setUp(self):
+        sms._client = None
+
+    def test_client_is_reused(self):
+        self.assertIs(sms._get_twilio_client(), sms._get_twilio_client())
+
+    @mock.patch("tracker.sms._get_twilio_client")
+    def test_429_is_requeued(self, get_client):
+        create = get_client.return_value.messages.create
+        create.side_effect = [
+            TwilioRestException(429, "https://api.twilio.com", "Too Many Requests"),
+            mock.Mock(sid="SM1"),
+        ]
+        user = User.objects.create_user(username="busy", password="testpass")
+        UserProfile.objects.create(user=user, phone_number="+254700000009", allow_sms=True)
+
+        send_sms_reminder.apply(args=(user.id, "Hi"))
+
+        self.assertEqual(create.call_count, 2)
+
+    @override_settings(SMS_RATE_LIMIT=1, SMS_RATE_BURST=1, SMS_RATE_LIMIT_WAIT=0)
+    @mock.patch("tracker.sms._get_twilio_client")
+    def test_no_token_raises_rate_limited(self, get_client):
+        sms.send("+254700000009", "one")
+        with self.assertRaises(sms.SMSRateLimited):
+            sms.send("+254700000009", "two")
+        self.assertEqual(get_client.return_value.messages.create.call_count, 1)
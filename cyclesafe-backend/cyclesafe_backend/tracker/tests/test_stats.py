@@ -0,0 +1,58 @@
+# tracker/tests/test_stats.py
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from tracker.models import CycleRecord, CycleStats
+from tracker.stats import rebuild_all_stats
+
+
+def log_cycle(user, start, cycle_length=28):
+    return CycleRecord.objects.create(
+        user=user, start_date=start, end_date=start + timedelta(days=4), cycle_length=cycle_length,
+    )
+
+
+class CycleStatsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="wanjiru")
+
+    def test_incremental_update_on_create(self):
+        log_cycle(self.user, date(2025, 7, 1), 30)
+        log_cycle(self.user, date(2025, 7, 29), 28)
+        log_cycle(self.user, date(2025, 8, 28), 29)
+        log_cycle(self.user, date(2025, 9, 26), 31)
+
+        stats = CycleStats.objects.get(user=self.user)
+        self.assertEqual(stats.record_count, 4)
+        self.assertEqual(stats.last_start_date, date(2025, 9, 26))
+        self.assertEqual(stats.average_cycle_length, 29)  # mean of 28, 29, 31
+        self.assertEqual(stats.recent_interval_average(), 30)  # gaps 30, 29
+        self.assertEqual(stats.interval_count, 3)
+        self.assertAlmostEqual(stats.interval_mean, 29)
+        self.assertAlmostEqual(stats.interval_variance, 1)
+        self.assertEqual(stats.regularity_score, 0.9)
+        self.assertEqual(CycleRecord.get_average_cycle_length(self.user), 29)
+
+    def test_delete_and_backfill_match_rebuild(self):
+        log_cycle(self.user, date(2025, 9, 1))
+        middle = log_cycle(self.user, date(2025, 9, 30))
+        log_cycle(self.user, date(2025, 7, 5))  # back-filled older cycle
+        middle.delete()
+
+        stats = CycleStats.objects.get(user=self.user)
+        incremental = [getattr(stats, f) for f in ("record_count", "recent_start_dates", "interval_mean")]
+
+        CycleStats.objects.all().delete()
+        self.assertEqual(rebuild_all_stats(), 1)
+        stats = CycleStats.objects.get(user=self.user)
+        self.assertEqual(
+            incremental, [getattr(stats, f) for f in ("record_count", "recent_start_dates", "interval_mean")],
+        )
+        self.assertEqual(stats.recent_start_dates, ["2025-09-01", "2025-07-05"])
+
+    def test_no_history(self):
+        self.assertEqual(CycleRecord.get_average_cycle_length(self.user), 28)
+        log_cycle(self.user, date(2025, 9, 1))
+        self.assertIsNone(CycleStats.objects.get(user=self.user).recent_interval_average())
@@ -0,0 +1,44 @@
+# tracker/tests/test_summaries.py
+from datetime import date
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from tracker.summaries import cycle_windows, generate_summary
+
+TEMPLATE = (
+    "Hey [NAME], here’s your personalized cycle summary. "
+    "Your next period should start around [NEXT_PERIOD] and ovulation around [OVULATION]."
+)
+
+
+class SummaryTemplateCacheTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    @mock.patch("tracker.summaries.llm.complete", return_value=TEMPLATE)
+    def test_same_shape_reuses_template(self, complete):
+        first = generate_summary("Amina", cycle_windows(date(2025, 10, 1), date(2025, 10, 5), 28))
+        second = generate_summary("Zawadi", cycle_windows(date(2025, 9, 3), date(2025, 9, 7), 28))
+
+        complete.assert_called_once()
+        self.assertEqual(
+            first,
+            "Hey Amina, here’s your personalized cycle summary. "
+            "Your next period should start around October 29 and ovulation around October 15.",
+        )
+        self.assertIn("Hey Zawadi", second)
+        self.assertIn("October 1 ", second)
+
+    @mock.patch("tracker.summaries.llm.complete", return_value=TEMPLATE)
+    def test_different_duration_bucket_is_a_new_shape(self, complete):
+        generate_summary("Amina", cycle_windows(date(2025, 10, 1), date(2025, 10, 5), 28))
+        generate_summary("Amina", cycle_windows(date(2025, 10, 1), date(2025, 10, 8), 28))
+        self.assertEqual(complete.call_count, 2)
+
+    @mock.patch("tracker.summaries.llm.complete", side_effect=["Hey [NAME], see you on [BIRTHDAY].", "Personal text"])
+    def test_invalid_template_falls_back_to_personal_summary(self, complete):
+        text = generate_summary("Amina", cycle_windows(date(2025, 10, 1), date(2025, 10, 5), 28))
+        self.assertEqual(text, "Personal text")
+        self.assertEqual(complete.call_args.args[0], "tracker.summary")
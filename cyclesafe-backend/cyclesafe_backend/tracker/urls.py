@@ -1,7 +1,9 @@
 from django.urls import path
-from .views import SmartCyclePredictor
+from .views import SmartCyclePredictor, CycleSummaryView, DeliveryStatsView
 
 urlpatterns = [
     path('chat/', SmartCyclePredictor.as_view(), name='smart-cycle-chat'),
+    path('summary/<uuid:summary_id>/', CycleSummaryView.as_view(), name='cycle-summary'),
+    path('deliveries/stats/', DeliveryStatsView.as_view(), name='delivery-stats'),
     
 ]
@@ -1,20 +1,31 @@
+import logging
 import os
-import json
 import random
-import openai
-from datetime import datetime, timedelta
+from datetime import datetime
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from dotenv import load_dotenv
+from django.conf import settings
 from django.contrib.auth.models import User
-from .models import CycleRecord
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from .models import CycleRecord, CycleStats, CycleSummary
+from . import delivery
+from .extraction import extract_period_data, ExtractionError
+from cyclesafe_backend.llm import LLMUnavailable
 from users.models import UserProfile  # ✅ user profile with phone and sms fields
-from .tasks import send_sms_reminder, send_welcome_message, schedule_cycle_reminders  # ✅ Celery tasks
+from .summaries import cycle_windows, generate_summary
+from .tasks import (  # ✅ Celery tasks
+    generate_cycle_summary,
+    queue_summary_sms,
+)
 
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
+
+logger = logging.getLogger(__name__)
 
 
 class SmartCyclePredictor(APIView):
@@ -23,6 +34,10 @@ class SmartCyclePredictor(APIView):
     Stores cycle data, cycle length, and optional phone info for SMS reminders.
     Produces clean, readable AI summaries that address the user by name.
     Sends welcome and summary messages on first use.
+
+    With "async_summary": true (or TRACKER_ASYNC_SUMMARY=True) the prediction is
+    returned immediately with a summary_id; the AI summary is generated by the
+    generate_cycle_summary task and fetched from CycleSummaryView.
     """
 
     permission_classes = [IsAuthenticated]
@@ -34,6 +49,9 @@ class SmartCyclePredictor(APIView):
             manual_cycle = request.data.get("cycle_length")
             phone_number = request.data.get("phone_number")
             allow_sms = request.data.get("allow_sms", False)
+            async_summary = request.data.get("async_summary", settings.TRACKER_ASYNC_SUMMARY)
+            if isinstance(async_summary, str):
+                async_summary = async_summary.lower() in ("1", "true", "yes")
 
             if not user_message:
                 return Response(
@@ -41,37 +59,19 @@ class SmartCyclePredictor(APIView):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            # 🧠 STEP 1: Extract structured data with GPT
-            extract_prompt = f"""
-            You are a women's health assistant.
-            Extract structured period data from this message:
-            "{user_message}"
-
-            Return only valid JSON in this exact format:
-            {{
-              "start_date": "YYYY-MM-DD",
-              "end_date": "YYYY-MM-DD",
-              "cycle_length": 28
-            }}
-
-            If the user did not mention their cycle length, leave it null.
-            """
-
-            ai_response = openai.chat.completions.create(
-                model="gpt-4.1",
-                messages=[{"role": "system", "content": extract_prompt}],
-            )
-
-            raw_output = ai_response.choices[0].message.content.strip()
-
+            # 🧠 STEP 1: Extract structured data (local parser first, GPT on a miss)
             try:
-                cleaned_output = raw_output.strip().split("```")[-1].strip()
-                ai_data = json.loads(cleaned_output)
-            except json.JSONDecodeError:
+                ai_data = extract_period_data(user_message)
+            except ExtractionError as e:
                 return Response(
-                    {"error": "AI returned invalid JSON.", "raw_output": raw_output},
+                    {"error": str(e), "raw_output": e.raw_output},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
+            except LLMUnavailable:
+                return Response(
+                    {"error": "We couldn’t read your dates right now. Please try again shortly."},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                )
 
             start_str = ai_data.get("start_date")
             end_str = ai_data.get("end_date")
@@ -92,130 +92,134 @@ class SmartCyclePredictor(APIView):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            # 🧮 STEP 2: Determine cycle length intelligently
-            if manual_cycle:
-                cycle_length = int(manual_cycle)
-            elif ai_cycle_length:
-                cycle_length = int(ai_cycle_length)
-            else:
-                prev_cycles = CycleRecord.objects.filter(user=user).order_by("-start_date")[:3]
-                if len(prev_cycles) >= 2:
-                    diffs = [
-                        (prev_cycles[i].start_date - prev_cycles[i + 1].start_date).days
-                        for i in range(len(prev_cycles) - 1)
-                        if (prev_cycles[i].start_date - prev_cycles[i + 1].start_date).days > 0
-                    ]
-                    cycle_length = round(sum(diffs) / len(diffs)) if diffs else random.randint(25, 28)
+            with transaction.atomic():
+                # 🧮 STEP 2: Determine cycle length intelligently
+                # (history comes from the user's CycleStats row, read before this cycle is saved)
+                stats = CycleStats.objects.select_for_update().filter(user=user).first()
+                first_cycle = stats is None or stats.record_count == 0
+                if manual_cycle:
+                    cycle_length = int(manual_cycle)
+                elif ai_cycle_length:
+                    cycle_length = int(ai_cycle_length)
                 else:
-                    cycle_length = random.randint(25, 28)
-
-            # 💾 STEP 3: Save cycle record
-            record = CycleRecord.objects.create(
-                user=user,
-                start_date=start_date,
-                end_date=end_date,
-                cycle_length=cycle_length,
-            )
+                    recent_average = stats.recent_interval_average() if stats else None
+                    cycle_length = recent_average or random.randint(25, 28)
+
+                # 💾 STEP 3: Save cycle record
+                # (the post_save signal updates the stats row read above instead of reading it again)
+                record = CycleRecord(
+                    user=user,
+                    start_date=start_date,
+                    end_date=end_date,
+                    cycle_length=cycle_length,
+                )
+                record.preloaded_stats = stats
+                record.save()
 
-            # 🧍‍♀️ STEP 4: Save user profile info
+            # 🧍‍♀️ STEP 4: Save user profile info (only when it changed)
             profile, _ = UserProfile.objects.get_or_create(user=user)
-            if phone_number:
+            changed = []
+            if phone_number and profile.phone_number != phone_number:
                 profile.phone_number = phone_number
-            profile.allow_sms = bool(allow_sms)
-            profile.save()
+                changed.append("phone_number")
+            if profile.allow_sms != bool(allow_sms):
+                profile.allow_sms = bool(allow_sms)
+                changed.append("allow_sms")
+            if changed:
+                profile.save(update_fields=changed)
 
             # 📅 STEP 5: Predict main phases
-            next_period = start_date + timedelta(days=cycle_length)
-            ovulation_day = start_date + timedelta(days=cycle_length - 14)
-            fertile_start = ovulation_day - timedelta(days=5)
-            fertile_end = ovulation_day + timedelta(days=1)
-            fertile_window = f"{fertile_start.strftime('%b %d')} – {fertile_end.strftime('%b %d')}"
-
-            menstrual_end = end_date
-            follicular_start = end_date + timedelta(days=1)
-            follicular_end = ovulation_day - timedelta(days=1)
-            luteal_start = ovulation_day + timedelta(days=1)
-            luteal_end = next_period - timedelta(days=1)
+            w = cycle_windows(start_date, end_date, cycle_length)
+            next_period = w["next_period"]
+            ovulation_day = w["ovulation"]
 
-            # 🤖 STEP 6: Personalized AI summary
             user_name = user.first_name or user.username
-            summary_prompt = f"""
-            You are a kind and professional women's health assistant.
-            The user's name is {user_name}.
-            Their last period was from {start_date} to {end_date}.
-            Cycle length: {cycle_length} days.
-            Next period: {next_period}.
-            Ovulation: {ovulation_day}.
-            Fertile window: {fertile_window}.
-
-            Phases:
-            Menstrual Phase: {start_date} to {menstrual_end}
-            Follicular Phase: {follicular_start} to {follicular_end}
-            Ovulation Phase: {ovulation_day}
-            Luteal Phase: {luteal_start} to {luteal_end}
-
-            Write a warm, personalized summary beginning with:
-            "Hey {user_name}, here’s your personalized cycle summary."
-            Then describe what’s happening in each phase using clear, natural paragraphs.
-            Include how energy, mood, fertility, and hormones change.
-            Avoid emojis, markdown, bullet points, or complex formatting.
-            Keep it concise and suitable for mobile app display.
-            """
-
-            ai_summary = openai.chat.completions.create(
-                model="gpt-4.1",
-                messages=[
-                    {"role": "system", "content": "You are a supportive, concise, and accurate women's health guide."},
-                    {"role": "user", "content": summary_prompt},
-                ],
-            )
-
-            summary_text = ai_summary.choices[0].message.content.strip()
-
-            # 📲 STEP 7: Send Welcome or Summary SMS + Schedule Reminders
-            if profile.allow_sms:
-                previous_records = CycleRecord.objects.filter(user=user).count()
+            test_mode = os.getenv("TEST_MODE", "False").lower() == "true"
+            notify_sms = profile.allow_sms and not test_mode
 
-                test_mode = os.getenv("TEST_MODE", "False").lower() == "true"
+            # 🤖 STEP 6: Personalized AI summary
+            # In async mode the summary (and the SMS that carries it) is produced
+            # by a Celery task; the client polls summary_url for the text.
+            summary = None
+            if async_summary:
+                summary = CycleSummary.objects.create(user=user, record=record)
+                generate_cycle_summary.delay(str(summary.id), notify_sms, first_cycle)
+                summary_text = None
+            else:
+                summary_text = generate_summary(user_name, w)
+
+            # 📲 STEP 7: Send Welcome or Summary SMS
+            # (period / ovulation reminders come from the daily sweep over CyclePrediction)
+            if profile.allow_sms:
                 phone = profile.phone_number
 
                 if test_mode:
-                    print(f"[TEST MODE] Would send SMS to {phone}: {summary_text}")
-                else:
-                    if previous_records <= 1:
-                        # Send welcome + summary message
-                        send_welcome_message.delay(user.id, summary_text)
+                    if async_summary:
+                        logger.info("[TEST MODE] Would send SMS to %s once summary %s is ready", phone, summary.id)
                     else:
-                        # Returning user — send only summary
-                        summary_message = (
-                            f"Hey {user_name}, here’s your updated cycle summary 🌼\n\n{summary_text}"
-                        )
-                        send_sms_reminder.delay(user.id, summary_message)
-
-                    # Schedule reminders for period and ovulation
-                    schedule_cycle_reminders.delay(user.id, str(next_period), str(ovulation_day))
+                        logger.info("[TEST MODE] Would send SMS to %s: %s", phone, summary_text)
+                else:
+                    if not async_summary:
+                        queue_summary_sms(user, summary_text, first_cycle, profile)
 
             # ✅ STEP 8: Return structured clean response
-            return Response(
-                {
-                    "user": user.username,
-                    "cycle_length": cycle_length,
-                    "next_period": next_period,
-                    "ovulation": ovulation_day,
-                    "fertile_window": fertile_window,
-                    "phases": {
-                        "menstrual": f"{start_date} – {menstrual_end}",
-                        "follicular": f"{follicular_start} – {follicular_end}",
-                        "ovulation": str(ovulation_day),
-                        "luteal": f"{luteal_start} – {luteal_end}",
-                    },
-                    "message": summary_text,
-                    "phone_number": profile.phone_number,
-                    "allow_sms": profile.allow_sms,
+            response_data = {
+                "user": user.username,
+                "cycle_length": cycle_length,
+                "next_period": next_period,
+                "ovulation": ovulation_day,
+                "fertile_window": w["fertile_window"],
+                "phases": {
+                    "menstrual": f"{start_date} – {w['menstrual_end']}",
+                    "follicular": f"{w['follicular_start']} – {w['follicular_end']}",
+                    "ovulation": str(ovulation_day),
+                    "luteal": f"{w['luteal_start']} – {w['luteal_end']}",
                 },
-                status=status.HTTP_200_OK,
-            )
+                "message": summary_text,
+                "phone_number": profile.phone_number,
+                "allow_sms": profile.allow_sms,
+            }
+            if summary is not None:
+                response_data["summary_id"] = str(summary.id)
+                response_data["summary_status"] = summary.status
+                response_data["summary_url"] = reverse("cycle-summary", args=[summary.id])
+
+            return Response(response_data, status=status.HTTP_200_OK)
 
         except Exception as e:
             print("❌ Error in SmartCyclePredictor:", str(e))
             return Response({"error": str(e)}, status=500)
+
+
+class CycleSummaryView(APIView):
+    """
+    Polling endpoint for summaries generated in async mode.
+    GET /api/tracker/summary/<summary_id>/
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, summary_id):
+        summary = get_object_or_404(CycleSummary, id=summary_id, user=request.user)
+        return Response({
+            "summary_id": str(summary.id),
+            "status": summary.status,
+            "message": summary.message or None,
+        })
+
+
+class DeliveryStatsView(APIView):
+    """
+    SMS delivery dashboard data from the delivery log (staff only).
+    GET /api/tracker/deliveries/stats/?days=7&kind=weekly_tip
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        try:
+            days = min(max(int(request.query_params.get("days", 7)), 1), 90)
+        except ValueError:
+            return Response({"error": "days must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+        rows = delivery.daily_stats(days=days, kind=request.query_params.get("kind"))
+        return Response({"days": days, "rows": rows})
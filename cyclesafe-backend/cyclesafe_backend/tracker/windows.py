@@ -0,0 +1,46 @@
+# tracker/windows.py
+"""
+Time-sliced reminder sweeps.
+
+Each user has a reminder slot inside their own delivery window and time
+zone (UserProfile.reminder_time), stored as a minute of the UTC day
+(refreshed nightly where daylight saving time moves it). The daily
+reminder sweep runs every REMINDER_SLICE_MINUTES and only handles the
+users whose slot falls in the current slice, so the morning burst becomes
+a steady trickle spread over the day.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def current_slice(at=None):
+    """(start of the slice containing `at`, first minute, end minute) in UTC minutes of the day."""
+    at = (at or timezone.now()).astimezone(dt_timezone.utc)
+    size = settings.REMINDER_SLICE_MINUTES
+    minute = at.hour * 60 + at.minute
+    lo = minute - minute % size
+    start = at.replace(hour=lo // 60, minute=lo % 60, second=0, microsecond=0)
+    return start, lo, min(lo + size, MINUTES_PER_DAY)
+
+
+def candidate_days(at, days_ahead=2):
+    """Every local date `days_ahead` from now somewhere on Earth (UTC-12 to UTC+14) at `at`."""
+    at = at.astimezone(dt_timezone.utc)
+    return sorted({(at + timedelta(hours=h)).date() + timedelta(days=days_ahead) for h in range(-12, 15)})
+
+
+def local_date(profile, at):
+    """The user's calendar date at `at`."""
+    return at.astimezone(profile.zone()).date()
+
+
+def parse(at):
+    """An ISO timestamp argument (from beat, a test or a backfill) as an aware datetime."""
+    if not at:
+        return timezone.now()
+    value = datetime.fromisoformat(at)
+    return value if timezone.is_aware(value) else timezone.make_aware(value)
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:52
+
+import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Frozen copy of users.models.reminder_minute_utc as of this migration
+def reminder_minute_utc(user_id, timezone_name, window_start, window_end):
+    try:
+        zone = ZoneInfo(timezone_name)
+    except (ZoneInfoNotFoundError, ValueError):
+        zone = ZoneInfo(settings.TIME_ZONE)
+    local_now = datetime.datetime.now(datetime.timezone.utc).astimezone(zone)
+
+    def slot(day):
+        start = datetime.datetime.combine(day, window_start)
+        end = datetime.datetime.combine(day, window_end)
+        window = int((end - start).total_seconds() // 60) % (24 * 60) or 1
+        return (start + datetime.timedelta(minutes=(user_id or 0) % window)).replace(tzinfo=zone)
+
+    next_slot = slot(local_now.date())
+    if next_slot < local_now:
+        next_slot = slot(local_now.date() + datetime.timedelta(days=1))
+    next_slot = next_slot.astimezone(datetime.timezone.utc)
+    return next_slot.hour * 60 + next_slot.minute
+
+
+def assign_slots(apps, schema_editor):
+    # Existing profiles get the default window and zone; their slot is computed like UserProfile.save() does
+    UserProfile = apps.get_model("users", "UserProfile")
+    profiles = list(UserProfile.objects.only("id", "user_id", "timezone", "reminder_window_start", "reminder_window_end"))
+    for profile in profiles:
+        profile.reminder_minute_utc = reminder_minute_utc(
+            profile.user_id, profile.timezone, profile.reminder_window_start, profile.reminder_window_end,
+        )
+    UserProfile.objects.bulk_update(profiles, ["reminder_minute_utc"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='reminder_minute_utc',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='reminder_window_end',
+            field=models.TimeField(default=datetime.time(10, 0)),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='reminder_window_start',
+            field=models.TimeField(default=datetime.time(8, 0)),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='timezone',
+            field=models.CharField(default=settings.TIME_ZONE, max_length=64),
+        ),
+        migrations.RunPython(assign_slots, migrations.RunPython.noop),
+    ]
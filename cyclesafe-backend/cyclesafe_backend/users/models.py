@@ -1,10 +1,82 @@
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
 
+def reminder_zone(name):
+    """ZoneInfo for an IANA name, or settings.TIME_ZONE when it is unknown."""
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(settings.TIME_ZONE)
+
+
+def reminder_slot(day, user_id, window_start, window_end, zone):
+    """
+    Aware datetime of a user's reminder slot on local date `day`.
+    Users are spread over the window by id, so sends don't all start at once.
+    """
+    start = datetime.combine(day, window_start)
+    end = datetime.combine(day, window_end)
+    window = int((end - start).total_seconds() // 60) % (24 * 60) or 1  # a window may pass midnight
+    return (start + timedelta(minutes=(user_id or 0) % window)).replace(tzinfo=zone)
+
+
+def reminder_minute_utc(user_id, timezone_name, window_start, window_end, now=None):
+    """
+    Minute of the UTC day of a user's next reminder slot after `now`.
+    It moves when their zone changes offset (daylight saving time), so
+    tracker.tasks.refresh_reminder_slots recomputes it every night.
+    """
+    zone = reminder_zone(timezone_name)
+    local_now = (now or datetime.now(dt_timezone.utc)).astimezone(zone)
+    slot = reminder_slot(local_now.date(), user_id, window_start, window_end, zone)
+    if slot < local_now:
+        slot = reminder_slot(local_now.date() + timedelta(days=1), user_id, window_start, window_end, zone)
+    slot = slot.astimezone(dt_timezone.utc)
+    return slot.hour * 60 + slot.minute
+
+
+def observes_dst(timezone_name, year):
+    """Whether the zone's UTC offset changes during `year`."""
+    zone = reminder_zone(timezone_name)
+    offsets = {datetime(year, month, 1, tzinfo=zone).utcoffset() for month in range(1, 13)}
+    return len(offsets) > 1
+
+
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="profile")
     phone_number = models.CharField(max_length=20, blank=True, null=True)
     allow_sms = models.BooleanField(default=False)
 
+    # ✅ When reminders may arrive, in the user's own time zone
+    timezone = models.CharField(max_length=64, default=settings.TIME_ZONE)  # IANA name
+    reminder_window_start = models.TimeField(default=time(8, 0))
+    reminder_window_end = models.TimeField(default=time(10, 0))
+    # Minute of the UTC day of this user's slot in the window; set by save(),
+    # refreshed nightly for zones with daylight saving time
+    reminder_minute_utc = models.PositiveSmallIntegerField(default=0, db_index=True)
+
     def __str__(self):
         return f"{self.user.username}'s profile"
+
+    def zone(self):
+        return reminder_zone(self.timezone)
+
+    def reminder_time(self, day):
+        """Aware datetime of this user's reminder slot on local date `day`."""
+        return reminder_slot(day, self.user_id, self.reminder_window_start, self.reminder_window_end, self.zone())
+
+    def assign_reminder_slot(self):
+        self.reminder_minute_utc = reminder_minute_utc(
+            self.user_id, self.timezone, self.reminder_window_start, self.reminder_window_end,
+        )
+
+    def save(self, *args, **kwargs):
+        self.assign_reminder_slot()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "reminder_minute_utc" not in update_fields:
+            kwargs["update_fields"] = [*update_fields, "reminder_minute_utc"]
+        super().save(*args, **kwargs)
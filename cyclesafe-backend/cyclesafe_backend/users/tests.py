@@ -1,3 +1,44 @@
-from django.test import TestCase
+import importlib
+from datetime import time
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth.models import User
+from rest_framework.test import APITestCase
+
+from users.models import UserProfile
+
+
+class NotificationSettingsTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="amina", password="testpass")
+        self.client.force_authenticate(self.user)
+
+    def test_window_and_time_zone_move_the_reminder_slot(self):
+        response = self.client.post("/api/auth/notifications/", {
+            "phone_number": "+254700000001", "allow_sms": True,
+            "timezone": "Africa/Lagos", "reminder_window_start": "18:00", "reminder_window_end": "18:01",
+        }, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["reminder_window_start"], "18:00")
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual(profile.reminder_window_start, time(18, 0))
+        self.assertEqual(profile.reminder_minute_utc, 17 * 60)  # Lagos is UTC+1
+
+    def test_rejects_unknown_time_zone(self):
+        response = self.client.post("/api/auth/notifications/", {"timezone": "Mars/Olympus"}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+
+class ReminderSlotMigrationTest(APITestCase):
+    def test_existing_profiles_get_the_slot_save_would_give_them(self):
+        profiles = [
+            UserProfile.objects.create(user=User.objects.create(username=f"m{i}"), timezone=tz)
+            for i, tz in enumerate(("Africa/Nairobi", "Africa/Lagos", "America/New_York"))
+        ]
+        UserProfile.objects.update(reminder_minute_utc=0)
+
+        importlib.import_module("users.migrations.0002_reminder_window").assign_slots(apps, None)
+
+        for profile in profiles:
+            self.assertEqual(UserProfile.objects.get(pk=profile.pk).reminder_minute_utc, profile.reminder_minute_utc)
@@ -1,3 +1,6 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
 from rest_framework import generics, permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -35,16 +38,27 @@ class PasswordResetView(APIView):
             return Response({"detail": "User not found"}, status=404)
 
 
+def _notification_settings(profile):
+    return {
+        "phone_number": profile.phone_number,
+        "allow_sms": profile.allow_sms,
+        "timezone": profile.timezone,
+        "reminder_window_start": profile.reminder_window_start.strftime("%H:%M"),
+        "reminder_window_end": profile.reminder_window_end.strftime("%H:%M"),
+    }
+
+
 # ✅ Manage SMS notifications (Authenticated)
 class NotificationSettingsView(APIView):
+    """
+    Phone number, SMS opt-in and when reminders may arrive: an IANA time
+    zone plus a "HH:MM" delivery window in that zone.
+    """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         profile, _ = UserProfile.objects.get_or_create(user=request.user)
-        return Response({
-            "phone_number": profile.phone_number,
-            "allow_sms": profile.allow_sms
-        })
+        return Response(_notification_settings(profile))
 
     def post(self, request):
         profile, _ = UserProfile.objects.get_or_create(user=request.user)
@@ -54,10 +68,21 @@ class NotificationSettingsView(APIView):
         if phone_number:
             profile.phone_number = phone_number
         profile.allow_sms = allow_sms
+
+        tz = request.data.get("timezone")
+        if tz:
+            try:
+                ZoneInfo(tz)
+            except (ZoneInfoNotFoundError, ValueError):
+                return Response({"error": f"Unknown time zone: {tz}"}, status=400)
+            profile.timezone = tz
+        for field in ("reminder_window_start", "reminder_window_end"):
+            value = request.data.get(field)
+            if value:
+                try:
+                    setattr(profile, field, datetime.strptime(value, "%H:%M").time())
+                except ValueError:
+                    return Response({"error": f"{field} must be HH:MM"}, status=400)
         profile.save()
 
-        return Response({
-            "message": "Notification settings updated successfully",
-            "phone_number": profile.phone_number,
-            "allow_sms": profile.allow_sms
-        })
\ No newline at end of file
+        return Response({"message": "Notification settings updated successfully", **_notification_settings(profile)})
\ No newline at end of file